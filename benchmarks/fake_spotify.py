@@ -0,0 +1,319 @@
+"""A local stand-in for the Spotify Web API, for load tests.
+
+Usage: python benchmarks/fake_spotify.py [--port PORT] [--latency SECONDS]
+                                         [--throttle RATE]
+
+It answers the calls spin2spot makes: the current user, track search
+with pagination and totals, and creating, listing, reading, adding to
+and removing from playlists, with Spotify's 100-item limit. Every
+request waits `latency` seconds first, and a `throttle` share of them
+are answered 429 with a Retry-After header. It also serves synthetic
+episode pages under /pages/, so whole runs stay off the network.
+"""
+import argparse
+import collections
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import generate_page  # noqa: E402
+
+MAX_ITEMS = 100  # the most tracks Spotify takes, or lists, per request
+QUERY = re.compile(r'artist:"(?P<artist>[^"]*)" track:"(?P<title>[^"]*)"')
+VARIANTS = ('', ' (Live)', ' - Remastered', ' (Demo)', ' (Radio Edit)')
+PLAYLIST_TRACKS = re.compile(
+    r'^(?:users/[^/]+/)?playlists/(?P<playlist_id>\w+)/(?:tracks|items)$',
+    )
+USER_PLAYLISTS = re.compile(r'^users/(?P<user>[^/]+)/playlists$')
+
+
+def spotify_id(*parts):
+    """Return a stable, base-62-safe 22 character ID for the parts."""
+    digest = hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    return digest[:22]
+
+
+@functools.lru_cache(maxsize=None)
+def episode_page(page, spins):
+    """Return the HTML of a synthetic page, generating it only once."""
+    return generate_page(page, spins)[1].encode('utf-8')
+
+
+class SpotifyError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class FakeSpotify:
+    """The state behind the fake API: playlists, catalog and call counts.
+
+    Every search finds `results` versions of the track it asked for, so
+    pagination and totals behave like Spotify's."""
+
+    def __init__(self, user='loadtest', results=3, latency=0.0,
+                 throttle=0.0, retry_after=1, seed=None):
+        self.user = user
+        self.results = results
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.calls = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._playlists = collections.OrderedDict()
+
+    def handle(self, method, path, query, body):
+        """Answer one API request, returning its JSON response."""
+        if self.latency:
+            time.sleep(self.latency)
+        endpoint = self._endpoint(method, path)
+        with self._lock:
+            self.calls[endpoint] += 1
+            throttled = self._random.random() < self.throttle
+            self.calls['429'] += throttled
+        if throttled:
+            raise SpotifyError(429, 'API rate limit exceeded',
+                               {'Retry-After': str(self.retry_after)})
+        if endpoint == 'current_user':
+            return {'id': self.user}
+        if endpoint == 'search':
+            return self.search(query)
+        match = USER_PLAYLISTS.match(path)
+        if match and method == 'POST':
+            return self.create_playlist(match['user'], body)
+        if match:
+            return self.list_playlists(match['user'], query)
+        match = PLAYLIST_TRACKS.match(path)
+        playlist = self._playlist(match['playlist_id'])
+        if method == 'POST':
+            return self.add_tracks(playlist, query, body)
+        if method == 'DELETE':
+            return self.remove_tracks(playlist, body)
+        return self.list_tracks(playlist, query)
+
+    @staticmethod
+    def _endpoint(method, path):
+        """Return the name the request is counted under."""
+        if path == 'me':
+            return 'current_user'
+        if path == 'search':
+            return 'search'
+        if USER_PLAYLISTS.match(path):
+            return 'create' if method == 'POST' else 'playlists'
+        if PLAYLIST_TRACKS.match(path):
+            return {'POST': 'add', 'DELETE': 'remove'}.get(method, 'tracks')
+        raise SpotifyError(404, f'Unknown endpoint {method} {path}')
+
+    def _playlist(self, playlist_id):
+        with self._lock:
+            playlist = self._playlists.get(playlist_id)
+        if playlist is None:
+            raise SpotifyError(404, 'Not found.')
+        return playlist
+
+    @staticmethod
+    def _page(items, query, default_limit, max_limit):
+        """Return a Spotify paging object for the requested slice."""
+        limit = int(query.get('limit', default_limit))
+        offset = int(query.get('offset', 0))
+        if not 1 <= limit <= max_limit:
+            raise SpotifyError(400, 'Invalid limit')
+        end = offset + limit
+        return {
+            'items': items[offset:end],
+            'total': len(items),
+            'limit': limit,
+            'offset': offset,
+            'next': f'offset={end}' if end < len(items) else None,
+            }
+
+    def search(self, query):
+        match = QUERY.search(query.get('q', ''))
+        items = []
+        if match is not None:
+            items = [
+                {
+                    'id': spotify_id(match['artist'], match['title'], variant),
+                    'name': match['title'] + variant,
+                    'artists': [{'name': match['artist']}],
+                    'album': {'name': match['title']},
+                    'duration_ms': 180000,
+                    }
+                for variant in VARIANTS[:self.results]
+                ]
+        return {'tracks': self._page(items, query, 10, 50)}
+
+    def create_playlist(self, user, body):
+        if user != self.user:
+            raise SpotifyError(403, 'You cannot create a playlist for '
+                                    'another user.')
+        with self._lock:
+            playlist_id = spotify_id('playlist', str(len(self._playlists)))
+            playlist = {
+                'id': playlist_id,
+                'name': body['name'],
+                'description': body.get('description', ''),
+                'public': body.get('public', True),
+                'owner': {'id': user},
+                'tracks': [],
+                }
+            self._playlists[playlist_id] = playlist
+        return {key: value for key, value in playlist.items()
+                if key != 'tracks'}
+
+    def list_playlists(self, user, query):
+        with self._lock:
+            playlists = [
+                {key: value for key, value in playlist.items()
+                 if key != 'tracks'}
+                for playlist in self._playlists.values()
+                if playlist['owner']['id'] == user
+                ]
+        return self._page(playlists, query, 20, 50)
+
+    def add_tracks(self, playlist, query, body):
+        uris = body['uris'] if isinstance(body, dict) else body
+        if len(uris) > MAX_ITEMS:
+            raise SpotifyError(400, 'You can add a maximum of 100 tracks '
+                                    'per request.')
+        position = query.get('position')
+        if position is None and isinstance(body, dict):
+            position = body.get('position')
+        with self._lock:
+            tracks = playlist['tracks']
+            position = len(tracks) if position is None else int(position)
+            tracks[position:position] = [uri.split(':')[-1] for uri in uris]
+        return {'snapshot_id': spotify_id('snapshot', *playlist['tracks'])}
+
+    def remove_tracks(self, playlist, body):
+        removals = body.get('tracks') or body.get('items') or []
+        if len(removals) > MAX_ITEMS:
+            raise SpotifyError(400, 'You can remove a maximum of 100 '
+                                    'tracks per request.')
+        with self._lock:
+            tracks = playlist['tracks']
+            positions = sorted(
+                (position
+                 for removal in removals
+                 for position in removal['positions']),
+                reverse=True,
+                )
+            for position in positions:
+                del tracks[position]
+        return {'snapshot_id': spotify_id('snapshot', *playlist['tracks'])}
+
+    def list_tracks(self, playlist, query):
+        with self._lock:
+            items = [{'track': {'id': track_id}}
+                     for track_id in playlist['tracks']]
+        return self._page(items, query, 100, MAX_ITEMS)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Route HTTP requests to the server's FakeSpotify."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, content, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self):
+        url = urllib.parse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or 'null')
+        if url.path.startswith('/pages/'):
+            return self._page(url.path[len('/pages/'):])
+        query = dict(urllib.parse.parse_qsl(url.query))
+        path = url.path[len('/v1/'):].strip('/')
+        try:
+            result = self.server.spotify.handle(self.command, path, query,
+                                                body)
+        except SpotifyError as error:
+            status, headers = error.status, error.headers
+            result = {'error': {'status': status, 'message': str(error)}}
+        else:
+            status, headers = 200, {}
+        content = json.dumps(result).encode('utf-8')
+        self._respond(status, content, 'application/json', headers)
+
+    def _page(self, path):
+        """Serve a synthetic page, from /pages/<page>/load/<spins>/<n>."""
+        page, _, rest = path.partition('/load/')
+        spins = int(rest.split('/')[0])
+        self._respond(200, episode_page(page, spins), 'text/html')
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class FakeSpotifyServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, spotify, port=0):
+        super().__init__(('127.0.0.1', port), Handler)
+        self.spotify = spotify
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def serve(spotify, port=0):
+    """Start a server for the FakeSpotify on a background thread."""
+    server = FakeSpotifyServer(spotify, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def parse_args(args):
+    """Parse the CLI arguments for the fake server."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8888,
+                        help='The port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds to wait before answering a request')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='The share of requests answered with a 429')
+    parser.add_argument('--results', type=int, default=3,
+                        choices=range(1, len(VARIANTS) + 1),
+                        help='The search results found for each track')
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    spotify = FakeSpotify(results=args.results, latency=args.latency,
+                          throttle=args.throttle)
+    server = FakeSpotifyServer(spotify, args.port)
+    print(f'Serving a fake Spotify API at {server.url}/v1/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+"""Load-test spin2spot against the local fake Spotify API.
+
+Usage: python benchmarks/load.py [--mode create_playlist|run_module]
+                                 [--episodes N] [--concurrency N] ...
+
+Episode pages and API calls are both answered by benchmarks/fake_spotify.py
+on localhost, so nothing goes over the network. Reports the episodes and
+tracks finished per second, the latency percentiles of an episode and the
+API calls made per episode.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import spotipy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from spin2spot import __main__ as main_module  # noqa: E402
+from spin2spot import pipeline  # noqa: E402
+from spin2spot import profiling, retrieval, spotify, throttle  # noqa: E402
+from fake_spotify import FakeSpotify, serve  # noqa: E402
+from synthetic import PAGES  # noqa: E402
+
+MODES = ('create_playlist', 'run_module')
+PERCENTILES = (50, 90, 99)
+
+
+def parse_args(args):
+    """Parse the CLI arguments for the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--mode', choices=MODES, default='create_playlist',
+                        help='The entry point to drive')
+    parser.add_argument('--episodes', type=int, default=20,
+                        help='The number of episodes to create playlists for')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='The number of episodes to work on at once')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='The number of track searches to run at once')
+    parser.add_argument('--page', choices=sorted(PAGES),
+                        default='spinitron.com/v2',
+                        help='The page type to generate')
+    parser.add_argument('--spins', type=int, default=100,
+                        help='The number of spins on each page')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Seconds the fake API waits per request')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='The share of API requests answered with a 429')
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help='The Retry-After seconds sent with each 429')
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Requests per second allowed by spin2spot's "
+                             'scheduler (by default, its usual rate)')
+    return parser.parse_args(args)
+
+
+class LocalAdapter(requests.adapters.HTTPAdapter):
+    """Send episode page requests to the fake server instead."""
+
+    def __init__(self, server_url, **kwargs):
+        super().__init__(**kwargs)
+        self.server_url = server_url
+
+    def send(self, request, **kwargs):
+        url = requests.utils.urlparse(request.url)
+        request.url = f'{self.server_url}/pages/{url.netloc}{url.path}'
+        return super().send(request, **kwargs)
+
+
+def route_pages(server, domain):
+    """Answer the domain's episode pages from the fake server."""
+    session = retrieval.get_session(domain)
+    adapter = LocalAdapter(server.url, pool_maxsize=retrieval.POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+
+def build_client(server):
+    """Return a spotipy client that talks to the fake server."""
+    client = spotipy.Spotify(
+        auth='load-test',
+        requests_session=spotify.build_session(),
+        status_forcelist=spotify.RETRY_STATUSES,
+        )
+    client.prefix = f'{server.url}/v1/'
+    return client
+
+
+def episode_urls(page, spins, episodes):
+    """Return the URLs of the synthetic episodes to load-test with."""
+    return [f'https://{page}/load/{spins}/{episode}'
+            for episode in range(episodes)]
+
+
+def percentile(values, percent):
+    """Return the given percentile of the values, by nearest rank."""
+    ordered = sorted(values)
+    rank = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[rank]
+
+
+def drive_create_playlist(client, urls, concurrency, workers):
+    """Create each episode's playlist with create_playlist; time each."""
+    def create(url):
+        start = time.perf_counter()
+        try:
+            spotify.create_playlist(client, url, workers=workers)
+        except Exception as error:
+            return time.perf_counter() - start, error
+        return time.perf_counter() - start, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(create, urls))
+
+
+def drive_run_module(client, urls, concurrency, workers):
+    """Create the playlists in one run_module call; time each episode.
+
+    An episode is timed from the start of its download to the end of its
+    playlist writes."""
+    started = {}
+    finished = {}
+    retrieve = pipeline.retrieve_episode
+    create = pipeline.create_playlist_from_parser
+
+    def timed_retrieve(url, **kwargs):
+        started[url] = time.perf_counter()
+        return retrieve(url, **kwargs)
+
+    def timed_create(*args, **kwargs):
+        try:
+            return create(*args, **kwargs)
+        finally:
+            finished[profiling.current_url.get()] = time.perf_counter()
+    pipeline.retrieve_episode = timed_retrieve
+    pipeline.create_playlist_from_parser = timed_create
+    main_module.build_client = lambda username=None: client
+    results = main_module.run_module(urls, username='load-test',
+                                     workers=workers, use_cache=False,
+                                     jobs=concurrency)
+    return [
+        (finished.get(result.url, started[result.url])
+         - started[result.url], result.error)
+        for result in results
+        ]
+
+
+def report(outcomes, elapsed, fake, profiler, tracks):
+    """Print the throughput, latency and API calls of the run."""
+    latencies = [latency for latency, _ in outcomes]
+    failures = [error for _, error in outcomes if error is not None]
+    episodes = len(outcomes)
+    print(f'episodes: {episodes} ({len(failures)} failed) in {elapsed:.2f}s')
+    print(f'throughput: {episodes / elapsed:.2f} episodes/s, '
+          f'{episodes * tracks / elapsed:.1f} tracks/s')
+    print('episode latency: ' + ', '.join(
+        f'p{percent} {percentile(latencies, percent):.3f}s'
+        for percent in PERCENTILES
+        ) + f', mean {statistics.mean(latencies):.3f}s')
+    print('API calls per episode:')
+    for endpoint, count in sorted(fake.calls.items()):
+        print(f'  {endpoint:<14}{count / episodes:>10.1f}')
+    searches = [stages['search']['calls']
+                for stages in profiler.report()['urls'].values()
+                if 'search' in stages]
+    if searches:
+        print(f'track searches per episode: min {min(searches)}, '
+              f'max {max(searches)}')
+    for error in failures[:5]:
+        print(f'failure: {error!r}')
+
+
+def main(args):
+    args = parse_args(args)
+    if args.rate is not None:
+        spotify.scheduler = throttle.Scheduler(rate=args.rate,
+                                               burst=args.rate)
+    fake = FakeSpotify(latency=args.latency, throttle=args.throttle,
+                       retry_after=args.retry_after)
+    server = serve(fake)
+    route_pages(server, retrieval.parse_domain(f'https://{args.page}'))
+    client = build_client(server)
+    urls = episode_urls(args.page, args.spins, args.episodes)
+    drive = {
+        'create_playlist': drive_create_playlist,
+        'run_module': drive_run_module,
+        }[args.mode]
+    profiler = profiling.Profiler()
+    profiling.install(profiler)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ['SPIN2SPOT_CACHE_DIR'] = cache_dir
+        start = time.perf_counter()
+        outcomes = drive(client, urls, args.concurrency, args.workers)
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+    report(outcomes, elapsed, fake, profiler, args.spins)
+    return 1 if any(error is not None for _, error in outcomes) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,75 @@
+"""Measure the memory held by parsed tracks, as dicts and as Tracks.
+
+Usage: python benchmarks/memory.py [--tracks N] [--artists N]
+
+Builds a season's worth of tracks the way the parsers do, with fresh
+strings for every field, and reports what each representation keeps
+alive once they're all built. Artists and albums repeat like they do
+across a station's episodes, which is what interning saves on.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from spin2spot.models import Track  # noqa: E402
+
+
+def parse_args(args):
+    """Parse the CLI arguments for the memory benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=100000,
+                        help='The number of tracks to build')
+    parser.add_argument('--artists', type=int, default=5000,
+                        help='The number of distinct artists among them')
+    return parser.parse_args(args)
+
+
+def fields(tracks, artists):
+    """Yield the artist, title and album of each track, as new strings."""
+    for number in range(tracks):
+        artist = number % artists
+        yield (
+            f'Artist Number {artist}',
+            f'A Song Called {number}',
+            f'The Album of Artist {artist}, Volume {number % 3}',
+            )
+
+
+def as_dict(artist, title, album):
+    """Return the track as the dict parsers used to return."""
+    return {'artist': artist, 'title': title, 'album': album}
+
+
+REPRESENTATIONS = {
+    'dict': as_dict,
+    'Track': Track,
+    }
+
+
+def measure(build, tracks, artists):
+    """Return the bytes still allocated after building every track."""
+    tracemalloc.start()
+    try:
+        kept = [build(*track) for track in fields(tracks, artists)]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(args):
+    args = parse_args(args)
+    print(f'{"representation":<16}{"total MB":>10}{"bytes/track":>13}')
+    for name, build in REPRESENTATIONS.items():
+        size = measure(build, args.tracks, args.artists)
+        print(f'{name:<16}{size / 2 ** 20:>10.1f}'
+              f'{size / args.tracks:>13.0f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
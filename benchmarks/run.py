@@ -0,0 +1,241 @@
+"""Time spin2spot's parse, resolve and create stages on synthetic pages.
+
+`first` is the time from raw HTML to the first finished track search,
+with the tracks streamed out of the parser. `full` parses the whole page
+instead of only the sections each parser reads, for comparison with
+`parse`, and the MB columns are the peak memory allocated by each.
+
+Usage: python benchmarks/run.py [--sizes 10 100 ...] [--latency SECONDS]
+                                [--features lxml|html.parser]
+
+Each run is appended to a JSON-lines results file and compared against
+the previous run with the same settings, so regressions stand out.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from spin2spot import parsers, spotify, throttle  # noqa: E402
+from spin2spot.descriptions import (  # noqa: E402
+    playlist_description,
+    playlist_title,
+    )
+from stub import StubClient  # noqa: E402
+from synthetic import PAGES, generate_page  # noqa: E402
+
+SIZES = [10, 100, 500, 2000]
+STAGES = ('parse', 'full', 'first', 'resolve', 'create')
+RESULTS = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+
+
+def parse_args(args):
+    """Parse the CLI arguments for the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='The numbers of spins to generate per page')
+    parser.add_argument('--pages', nargs='+', default=sorted(PAGES),
+                        choices=sorted(PAGES), help='The page types to run')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds the stub client waits per API call')
+    parser.add_argument('--features', default=parsers.FEATURES,
+                        choices=['lxml', 'html.parser'],
+                        help='The tree builder BeautifulSoup parses with')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='The number of track searches to run at once')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per measurement; the fastest is kept')
+    parser.add_argument('--results', default=RESULTS,
+                        help='The JSON-lines file to append results to')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown ratio reported as a regression')
+    return parser.parse_args(args)
+
+
+def best_of(repeat, function):
+    """Return the fastest of several timed runs, and the last result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def peak_memory(function):
+    """Return the most memory, in MB, allocated while the function runs."""
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def full_tree(sections):
+    """Stand in for parsers.strainer, so that the whole page is parsed."""
+    return None
+
+
+@contextlib.contextmanager
+def unstrained():
+    """Parse whole pages, rather than only the sections parsers read."""
+    strainer = parsers.strainer
+    parsers.strainer = full_tree
+    try:
+        yield
+    finally:
+        parsers.strainer = strainer
+
+
+def measure(page, spins, latency=0.0, workers=8, repeat=3):
+    """Return the timings of each stage for one synthetic page."""
+    domain, html = generate_page(page, spins)
+
+    def parse():
+        return parsers.parse_episode(domain, html)
+
+    def parse_full():
+        with unstrained():
+            return parsers.parse_episode(domain, html)
+
+    parse_time, episode = best_of(repeat, parse)
+    full, _ = best_of(repeat, parse_full)
+    client = StubClient(latency)
+    resolve, track_ids = best_of(repeat, lambda: list(
+        spotify.resolve_track_ids(client, episode['tracks'], workers)
+        ))
+    searches = client.calls['search'] // repeat
+
+    def first_search():
+        episode = parsers.parse_episode(domain, html, stream=True)
+        track_ids = spotify.resolve_track_ids(
+            StubClient(latency),
+            episode['tracks'],
+            workers,
+            )
+        next(track_ids, None)
+        track_ids.close()
+
+    first, _ = best_of(repeat, first_search)
+
+    def create():
+        client = StubClient(latency)
+        user = client.current_user()['id']
+        playlist = client.user_playlist_create(
+            user=user,
+            name=playlist_title(episode),
+            description=playlist_description(episode),
+            )
+        spotify.add_tracks(client, user, playlist['id'], track_ids)
+
+    create, _ = best_of(repeat, create)
+    return {
+        'page': page,
+        'spins': spins,
+        'bytes': len(html),
+        'tracks': len(episode['tracks']),
+        'parse': parse_time,
+        'full': full,
+        'first': first,
+        'resolve': resolve,
+        'create': create,
+        'searches': searches,
+        'parse_mb': peak_memory(parse),
+        'full_mb': peak_memory(parse_full),
+        }
+
+
+def git_revision():
+    """Return the current git commit, if there is one."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+            ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(path, settings):
+    """Return the last recorded run with the same settings, if any."""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, 'r') as results_file:
+        for line in results_file:
+            run = json.loads(line)
+            if run['settings'] == settings:
+                previous = run
+    return previous
+
+
+def regressions(run, previous, threshold):
+    """Yield a message for every stage that got slower than the threshold."""
+    if previous is None:
+        return
+    before = {(row['page'], row['spins']): row for row in previous['rows']}
+    for row in run['rows']:
+        old = before.get((row['page'], row['spins']))
+        if old is None:
+            continue
+        for stage in STAGES:
+            if old.get(stage) and row[stage] / old[stage] > threshold:
+                yield (f'{row["page"]} @ {row["spins"]} spins: {stage} '
+                       f'{old[stage]:.4f}s -> {row[stage]:.4f}s')
+
+
+def main(args):
+    args = parse_args(args)
+    parsers.FEATURES = args.features
+    # Keep the shared rate limiter out of the timings.
+    spotify.scheduler = throttle.Scheduler(rate=1e9, burst=1e9)
+    settings = {
+        'latency': args.latency,
+        'workers': args.workers,
+        'python': platform.python_version(),
+        'features': args.features,
+        }
+    rows = []
+    print(f'{"page":<18}{"spins":>6}{"parse":>10}{"full":>10}'
+          f'{"first":>10}{"resolve":>10}{"create":>10}{"searches":>10}'
+          f'{"parse MB":>10}{"full MB":>10}')
+    for page in args.pages:
+        for spins in args.sizes:
+            row = measure(page, spins, args.latency, args.workers,
+                          args.repeat)
+            rows.append(row)
+            print(f'{page:<18}{spins:>6}{row["parse"]:>10.4f}'
+                  f'{row["full"]:>10.4f}{row["first"]:>10.4f}'
+                  f'{row["resolve"]:>10.4f}{row["create"]:>10.4f}'
+                  f'{row["searches"]:>10}{row["parse_mb"]:>10.1f}'
+                  f'{row["full_mb"]:>10.1f}')
+    run = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'settings': settings,
+        'rows': rows,
+        }
+    found = list(regressions(
+        run,
+        previous_run(args.results, settings),
+        args.threshold,
+        ))
+    with open(args.results, 'a') as results_file:
+        results_file.write(json.dumps(run) + '\n')
+    for message in found:
+        print(f'Regression: {message}')
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,77 @@
+"""Time how long spin2spot's CLI takes to start, and what it imports.
+
+Usage: python benchmarks/startup.py [--repeat N]
+
+Runs `python -m spin2spot --help` and a run with no URLs, which fails
+argument validation, in fresh interpreters, next to a bare interpreter
+for comparison. Exits with status 1 if either imported a dependency that
+only a later stage needs.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+HEAVY = ('asyncio', 'bs4', 'dateutil', 'lxml', 'requests', 'spotipy')
+COMMANDS = {
+    'python': ['-c', 'pass'],
+    '--help': ['-m', 'spin2spot', '--help'],
+    'bad arguments': ['-m', 'spin2spot'],
+    }
+
+
+def parse_args(args):
+    """Parse the CLI arguments for the startup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Runs per command; the median is reported')
+    return parser.parse_args(args)
+
+
+def run(arguments):
+    """Run Python with the arguments; return its time and -X importtime."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *arguments],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=env,
+        cwd=ROOT,
+        universal_newlines=True,
+        )
+    return time.perf_counter() - start, process.stderr
+
+
+def imported(importtime):
+    """Return the top-level packages named in -X importtime output."""
+    packages = set()
+    for line in importtime.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            name = line.rsplit('|', 1)[1].strip()
+            packages.add(name.split('.')[0])
+    return packages
+
+
+def main(args):
+    args = parse_args(args)
+    print(f'{"command":<16}{"median":>10}{"min":>10}  heavy imports')
+    failed = False
+    for name, arguments in COMMANDS.items():
+        timings = []
+        heavy = set()
+        for _ in range(args.repeat):
+            elapsed, importtime = run(arguments)
+            timings.append(elapsed)
+            heavy |= imported(importtime).intersection(HEAVY)
+        failed |= bool(heavy)
+        print(f'{name:<16}{statistics.median(timings):>10.3f}'
+              f'{min(timings):>10.3f}  {", ".join(sorted(heavy)) or "-"}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
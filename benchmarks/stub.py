@@ -0,0 +1,59 @@
+import collections
+import re
+import threading
+import time
+
+QUERY = re.compile(r'artist:"(?P<artist>[^"]*)" track:"(?P<title>[^"]*)"')
+
+
+class StubClient:
+    """A stand-in for spotipy.Spotify that answers from memory.
+
+    Every call sleeps for `latency` seconds to stand in for the network.
+    Searches find a single track named after the query, and calls are
+    counted by method."""
+
+    def __init__(self, latency=0.0, user='benchmark'):
+        self.latency = latency
+        self.user = user
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._playlists = 0
+
+    def _call(self, method):
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def current_user(self):
+        self._call('current_user')
+        return {'id': self.user}
+
+    def search(self, q, limit=10, offset=0, type='track', market=None):
+        self._call('search')
+        match = QUERY.search(q)
+        if match is None:
+            return {'tracks': {'total': 0, 'items': []}}
+        item = {
+            'id': f'{hash(q) & 0xffffffffffff:022x}',
+            'name': match['title'],
+            'artists': [{'name': match['artist']}],
+            'album': {'name': ''},
+            'duration_ms': 180000,
+            }
+        return {'tracks': {'total': 1, 'items': [item]}}
+
+    def user_playlist_create(self, user, name, public=True,
+                             collaborative=False, description=''):
+        self._call('user_playlist_create')
+        with self._lock:
+            self._playlists += 1
+            return {'id': f'playlist{self._playlists}', 'name': name}
+
+    def user_playlist_add_tracks(self, user, playlist_id, tracks,
+                                 position=None):
+        self._call('user_playlist_add_tracks')
+        if len(tracks) > 100:
+            raise ValueError('Spotify accepts at most 100 tracks per call.')
+        return {'snapshot_id': 'snapshot'}
@@ -0,0 +1,62 @@
+import copy
+import os
+from bs4 import BeautifulSoup
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, 'tests',
+                        'fixtures')
+
+
+def _wkdu_rows(soup):
+    return soup.find('table', class_='views-table').find('tbody')('tr')
+
+
+PAGES = {
+    'setlist.fm': (
+        'setlist.fm',
+        'setlist_fm.html',
+        lambda soup: soup('li', class_='song'),
+        ),
+    'spinitron.com/v1': (
+        'spinitron.com',
+        'spinitron_v1.html',
+        lambda soup: soup('div', class_='f2row'),
+        ),
+    'spinitron.com/v2': (
+        'spinitron.com',
+        'spinitron_v2.html',
+        lambda soup: soup('tr', class_='spin-item'),
+        ),
+    'wkdu.org': (
+        'wkdu.org',
+        'wkdu.html',
+        _wkdu_rows,
+        ),
+    'wprb.com': (
+        'wprb.com',
+        'wprb.html',
+        lambda soup: soup('tr', class_='playlist-row'),
+        ),
+    }
+
+
+def fixture(filename):
+    """Return the contents of the given test fixture."""
+    with open(os.path.join(FIXTURES, filename), 'r') as fixture_file:
+        return fixture_file.read()
+
+
+def generate_page(page, spins):
+    """Return the domain and HTML of a synthetic page with the given spins.
+
+    Pages are built from the real fixture for the page type, with its
+    playlist rows cycled until the playlist has the requested length, so
+    everything around the playlist (navigation, scripts, ads) is real."""
+    domain, filename, find_rows = PAGES[page]
+    soup = BeautifulSoup(fixture(filename), 'html.parser')
+    rows = find_rows(soup)
+    anchor = rows[0]
+    for spin in range(spins):
+        anchor.insert_before(copy.copy(rows[spin % len(rows)]))
+    for row in rows:
+        row.extract()
+    return domain, str(soup)
@@ -1,8 +1,44 @@
 import pytest
+import threading
+from concurrent.futures import Future
 from unittest.mock import MagicMock
+from spin2spot import throttle
 from tests.unit import fixtures
 
 
+class FutureWaiters:
+    """Count the callers waiting on SingleFlight's shared futures."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._count = 0
+
+    def arrived(self):
+        with self._condition:
+            self._count += 1
+            self._condition.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        """Block until count callers are waiting for a shared result."""
+        with self._condition:
+            assert self._condition.wait_for(
+                lambda: self._count >= count,
+                timeout,
+                )
+
+
+@pytest.fixture
+def future_waiters(mocker):
+    waiters = FutureWaiters()
+
+    class CountedFuture(Future):
+        def result(self, timeout=None):
+            waiters.arrived()
+            return super().result(timeout)
+    mocker.patch('spin2spot.coalesce.Future', CountedFuture)
+    return waiters
+
+
 @pytest.fixture(scope='session')
 def html():
     return fixtures.contents('spinitron_v1.html')
@@ -10,8 +46,24 @@ def html():
 
 @pytest.fixture(autouse=True)
 def mock_requests(mocker, html):
+    mocker.patch('spin2spot.retrieval._sessions', {})
     patch = mocker.patch('spin2spot.retrieval.requests')
-    patch.get.return_value.content = html
+    response = patch.Session.return_value.get.return_value
+    response.status_code = 200
+    response.headers = {}
+    response.content = html
+    return patch
+
+
+@pytest.fixture
+def mock_session(mock_requests):
+    return mock_requests.Session.return_value
+
+
+@pytest.fixture(autouse=True)
+def mock_cache_dir(mocker, tmp_path):
+    patch = mocker.patch('spin2spot.cache.cache_dir')
+    patch.return_value = str(tmp_path)
     return patch
 
 
@@ -48,6 +100,13 @@ def mock_spotipy(mocker, mock_client):
     return patch
 
 
+@pytest.fixture(autouse=True)
+def mock_scheduler(mocker):
+    scheduler = throttle.Scheduler(rate=1000, burst=1000, backoff=0)
+    mocker.patch('spin2spot.spotify.scheduler', scheduler)
+    return scheduler
+
+
 @pytest.fixture(autouse=True)
 def mock_util(mocker):
     patch = mocker.patch('spin2spot.spotify.util')
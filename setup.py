@@ -7,6 +7,7 @@ setuptools.setup(
     description='Creates Spotify playlists from Spinitron playlists',
     author='Erik Didriksen',
     packages=setuptools.find_packages(exclude=['ez_setup', 't', 't.*']),
+    python_requires='>=3.7',
     dependency_links=[
         'git+https://git@github.com/plamere/spotipy.git@master#egg=spotipy'
         ],
@@ -16,4 +17,7 @@ setuptools.setup(
         'requests',
         'spotipy',
         ],
+    extras_require={
+        'lxml': ['lxml'],
+        },
     )
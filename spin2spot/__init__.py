@@ -1,2 +1,10 @@
-from .spotify import build_client
-from .spotify import create_playlist
+__all__ = ['build_client', 'create_playlist']
+
+
+def __getattr__(name):
+    # The client functions are only imported when asked for, so importing
+    # the package, or running its CLI with --help, stays quick.
+    if name in __all__:
+        from . import spotify
+        return getattr(spotify, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
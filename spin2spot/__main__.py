@@ -1,20 +1,151 @@
+import contextlib
+import itertools
+import json
 import sys
+from . import crawler
+from . import profiling
+from .cache import EpisodeCache, MarkCache, PageCache, TrackCache
 from .cli import parse_args
-from .spotify import build_client, create_playlist
+from .journal import Journal
+from .parsers import date_stats
+from .pipeline import process_episodes
+from .queries import DEFAULT_TIERS, stats
+from .scoring import THRESHOLD
+from .spotify import build_client
 
 
-def run_module(urls, username=None, public=False):
-    """Create Spotify playlists from the given URLs."""
+def open_caches(use_cache=True, clear_cache=False):
+    """Open the track, page and episode caches, emptying them if requested."""
+    if not (use_cache or clear_cache):
+        return None, None, None
+    caches = TrackCache(), PageCache(), EpisodeCache()
+    if clear_cache:
+        for cache in caches:
+            cache.clear()
+    return caches if use_cache else (None, None, None)
+
+
+def print_stats(report):
+    """Print the searches and hit rate of each query tier."""
+    for tier, counts in report.items():
+        print('{tier}: {hits}/{searches} searches found matches '
+              '({rate:.0%})'.format(
+                  tier=tier,
+                  hits=counts['hits'],
+                  searches=counts['searches'],
+                  rate=counts['hit_rate'],
+                  ))
+
+
+def print_date_stats(report):
+    """Print how many of each parser's dates didn't match its format."""
+    for parser, counts in report.items():
+        print('{parser}: {fallbacks}/{parsed} dates fell back to dateutil '
+              '({rate:.0%})'.format(
+                  parser=parser,
+                  fallbacks=counts['fallbacks'],
+                  parsed=counts['parsed'],
+                  rate=counts['fallback_rate'],
+                  ))
+
+
+@contextlib.contextmanager
+def profiled(path=None):
+    """Profile the work done inside, writing its timings to path as JSON."""
+    if path is None:
+        yield
+        return
+    profiler = profiling.Profiler()
+    previous = profiling.install(profiler)
+    try:
+        yield
+    finally:
+        profiling.install(previous)
+        with open(path, 'w') as file:
+            json.dump(profiler.report(), file, indent=2)
+
+
+def open_journal(path=None, resume=False):
+    """Open the run's journal, or nothing if it doesn't keep one.
+
+    Only runs given a journal path, or resuming, keep a journal, so runs
+    started side by side don't start each other's journals over."""
+    if path is None and not resume:
+        return contextlib.nullcontext()
+    return Journal(path, resume=resume)
+
+
+def crawl_archives(archives, marks):
+    """Return the new episodes of each archive, skipping any that fail."""
+    episodes = {}
+    for archive in archives:
+        try:
+            episodes[archive] = crawler.crawl(archive, marks.get(archive))
+        except Exception as error:
+            print(f'Could not crawl {archive}: {error}')
+    return episodes
+
+
+def run_module(urls, username=None, public=False, workers=1, use_cache=True,
+               clear_cache=False, tiers=DEFAULT_TIERS, threshold=THRESHOLD,
+               show_stats=False, profile=None, resume=False, journal=None,
+               sync=False, jobs=None, archives=()):
+    """Create Spotify playlists from the given URLs.
+
+    If a journal path is given, progress is kept in it; with resume=True,
+    the run picks up where the one journaled there (by default, in the
+    cache directory) stopped. With sync=True, episodes that already
+    have a playlist update it instead of getting another. If a profile
+    path is given, the timings of each stage are written to it as JSON.
+    With jobs, that many episodes are worked on at once.
+    Each archive is crawled for the episodes newer than its high-water
+    mark, which then moves past the ones that got their playlists."""
     client = build_client(username)
-    for url in urls:
-        create_playlist(client, url, public=public)
+    cache, pages, parsed = open_caches(use_cache, clear_cache)
+    episodes = {}
+    if archives:
+        marks = MarkCache()
+        episodes = crawl_archives(archives, marks)
+        urls = itertools.chain(urls, (
+            episode.url
+            for found in episodes.values()
+            for episode in found
+            ))
+    limits = {'resolve': workers}
+    with open_journal(journal, resume) as log, profiled(profile):
+        results = process_episodes(
+            client,
+            urls,
+            public=public,
+            cache=cache,
+            pages=pages,
+            episodes=parsed,
+            tiers=tiers,
+            threshold=threshold,
+            journal=log,
+            sync=sync,
+            jobs=jobs,
+            **limits,
+            )
+    for archive, found in episodes.items():
+        crawler.advance(marks, archive, found, results)
+    for result in results:
+        if result.error is not None:
+            print(f'Could not create a playlist for {result.url}: '
+                  f'{result.error}')
+    if show_stats:
+        print_stats(stats.report())
+        print_date_stats(date_stats.report())
+    count = sum(1 for result in results if result.error is None)
     print('Created {count} playlist{s} for user {user}.'.format(
-        count=len(urls),
-        s='' if len(urls) == 1 else 's',
+        count=count,
+        s='' if count == 1 else 's',
         user=client.current_user()['id'],
         ))
+    return results
 
 
 if __name__ == '__main__':
     params = parse_args(sys.argv[1:])
-    run_module(**params)
+    results = run_module(**params)
+    sys.exit(0 if all(result.error is None for result in results) else 1)
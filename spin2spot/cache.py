@@ -0,0 +1,230 @@
+import collections
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from .models import Episode, Track
+from .normalize import canonical
+from .queries import DEFAULT_TIERS
+from .scoring import SCORING_VERSION, THRESHOLD
+
+DAY = 24 * 60 * 60
+MISSING = object()
+
+Page = collections.namedtuple('Page', ['etag', 'last_modified', 'content'])
+
+
+def cache_dir():
+    """Return the directory where spin2spot keeps its local caches."""
+    path = os.environ.get('SPIN2SPOT_CACHE_DIR')
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.cache', 'spin2spot')
+
+
+def track_key(artist, title, album=None, cover_of=None, tiers=DEFAULT_TIERS,
+              threshold=THRESHOLD):
+    """Return the cache key for the given track.
+
+    The key includes the scoring version, the query tiers and the match
+    threshold, so a search is only reused by runs that would have found
+    the same match."""
+    fields = (artist, title, album, cover_of)
+    scoring = f'v{SCORING_VERSION}:{",".join(tiers)}:{float(threshold)!r}'
+    return '\x1f'.join([scoring] + [canonical(field) for field in fields])
+
+
+class SQLiteCache:
+    """The base class for spin2spot's persistent SQLite caches.
+
+    Subclasses name their FILENAME and TABLE and give the table's
+    COLUMNS; every table has a `key` primary key and a `stored` time."""
+
+    def __init__(self, path=None, max_entries=100000):
+        if path is None:
+            path = os.path.join(cache_dir(), self.FILENAME)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._execute(
+            f'CREATE TABLE IF NOT EXISTS {self.TABLE} ('
+            f'key TEXT PRIMARY KEY, {self.COLUMNS}, stored REAL NOT NULL)'
+            )
+        self._execute(
+            f'CREATE INDEX IF NOT EXISTS {self.TABLE}_stored '
+            f'ON {self.TABLE} (stored)'
+            )
+        self.evict()
+
+    def _execute(self, sql, parameters=()):
+        """Run the statement in its own transaction; return the rows."""
+        with self._lock, self._connection:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def evict(self):
+        """Drop the oldest entries beyond max_entries."""
+        self._execute(
+            f'DELETE FROM {self.TABLE} WHERE key IN ('
+            f'SELECT key FROM {self.TABLE} ORDER BY stored DESC '
+            'LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+            )
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        self._execute(f'DELETE FROM {self.TABLE}')
+
+    def __len__(self):
+        return self._execute(f'SELECT COUNT(*) FROM {self.TABLE}')[0][0]
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._connection.close()
+
+
+class TrackCache(SQLiteCache):
+    """A persistent SQLite cache of resolved Spotify track IDs.
+
+    Misses are cached too, with a shorter TTL, so that tracks Spotify
+    doesn't carry aren't searched for on every run."""
+    FILENAME = 'tracks.sqlite'
+    TABLE = 'tracks'
+    COLUMNS = 'track_id TEXT, expires REAL NOT NULL'
+
+    def __init__(self, path=None, hit_ttl=30 * DAY, miss_ttl=DAY,
+                 max_entries=100000):
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        super().__init__(path, max_entries)
+
+    def get(self, key):
+        """Return the cached track ID (or None for a cached miss).
+
+        Returns MISSING if the key isn't cached or has expired."""
+        rows = self._execute(
+            'SELECT track_id FROM tracks WHERE key = ? AND expires > ?',
+            (key, time.time()),
+            )
+        return rows[0][0] if rows else MISSING
+
+    def set(self, key, track_id):
+        """Cache the track ID (or None, for a miss) for the given key."""
+        now = time.time()
+        ttl = self.hit_ttl if track_id is not None else self.miss_ttl
+        self._execute(
+            'INSERT OR REPLACE INTO tracks (key, track_id, expires, stored) '
+            'VALUES (?, ?, ?, ?)',
+            (key, track_id, now + ttl, now),
+            )
+
+    def evict(self):
+        """Drop expired entries, then the oldest beyond max_entries."""
+        self._execute('DELETE FROM tracks WHERE expires <= ?', (time.time(),))
+        super().evict()
+
+
+class PageCache(SQLiteCache):
+    """A persistent SQLite cache of downloaded episode pages.
+
+    Pages are stored with their ETag and Last-Modified validators, so a
+    later download can be answered with a 304 Not Modified."""
+    FILENAME = 'pages.sqlite'
+    TABLE = 'pages'
+    COLUMNS = 'etag TEXT, last_modified TEXT, content BLOB'
+
+    def get(self, url):
+        """Return the cached Page for the URL, or None."""
+        rows = self._execute(
+            'SELECT etag, last_modified, content FROM pages WHERE key = ?',
+            (url,),
+            )
+        return Page(*rows[0]) if rows else None
+
+    def set(self, url, etag, last_modified, content):
+        """Cache the page content and its validators for the URL."""
+        self._execute(
+            'INSERT OR REPLACE INTO pages '
+            '(key, etag, last_modified, content, stored) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (url, etag, last_modified, content, time.time()),
+            )
+
+
+class MarkCache(SQLiteCache):
+    """The high-water mark of each crawled archive, kept between runs.
+
+    A mark is the number of the newest episode processed from the
+    archive, so the next crawl can stop at the episodes it has seen."""
+    FILENAME = 'marks.sqlite'
+    TABLE = 'marks'
+    COLUMNS = 'number INTEGER NOT NULL'
+
+    def get(self, archive_url):
+        """Return the archive's high-water mark, or 0 if it has none."""
+        rows = self._execute(
+            'SELECT number FROM marks WHERE key = ?',
+            (archive_url,),
+            )
+        return rows[0][0] if rows else 0
+
+    def set(self, archive_url, number):
+        """Store the archive's high-water mark."""
+        self._execute(
+            'INSERT OR REPLACE INTO marks (key, number, stored) '
+            'VALUES (?, ?, ?)',
+            (archive_url, number, time.time()),
+            )
+
+
+class EpisodeCache(SQLiteCache):
+    """A persistent SQLite cache of parsed episodes.
+
+    Each URL keeps the episode parsed from its latest content, stored as
+    compressed JSON along with a hash of that content and the version of
+    the parsers that read it. An entry is only used while both match."""
+    FILENAME = 'episodes.sqlite'
+    TABLE = 'episodes'
+    COLUMNS = ('digest TEXT NOT NULL, version INTEGER NOT NULL, '
+               'episode BLOB NOT NULL')
+
+    @staticmethod
+    def _encode(episode):
+        episode = dict(
+            episode,
+            datetime=episode['datetime'].isoformat(),
+            tracks=[dict(track) for track in episode['tracks']],
+            )
+        return zlib.compress(json.dumps(episode).encode('utf-8'))
+
+    @staticmethod
+    def _decode(blob):
+        episode = json.loads(zlib.decompress(blob).decode('utf-8'))
+        episode['datetime'] = datetime.datetime.fromisoformat(
+            episode['datetime'],
+            )
+        episode['tracks'] = [Track(**track) for track in episode['tracks']]
+        return Episode(**episode)
+
+    def get(self, url, digest, version):
+        """Return the episode parsed from the content, or None."""
+        rows = self._execute(
+            'SELECT episode FROM episodes '
+            'WHERE key = ? AND digest = ? AND version = ?',
+            (url, digest, version),
+            )
+        return self._decode(rows[0][0]) if rows else None
+
+    def set(self, url, digest, version, episode):
+        """Cache the episode parsed from the URL's content."""
+        self._execute(
+            'INSERT OR REPLACE INTO episodes '
+            '(key, digest, version, episode, stored) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (url, digest, version, self._encode(episode), time.time()),
+            )
@@ -1,4 +1,33 @@
 import argparse
+import itertools
+import sys
+from .crawler import check_archive
+from .queries import DEFAULT_TIERS, TIERS
+from .scoring import THRESHOLD
+
+
+def _lines(path):
+    """Yield the lines of the file, or of stdin if the path is "-"."""
+    if path == '-':
+        yield from sys.stdin
+        return
+    with open(path) as file:
+        yield from file
+
+
+def read_urls(urls, files=()):
+    """Yield the given URLs, then those listed in the files, once each.
+
+    The files are read lazily, a line at a time. Blank lines and lines
+    starting with "#" are skipped."""
+    seen = set()
+    lines = (line for path in files for line in _lines(path))
+    for url in itertools.chain(urls, lines):
+        url = url.strip()
+        if not url or url.startswith('#') or url in seen:
+            continue
+        seen.add(url)
+        yield url
 
 
 def parse_args(args):
@@ -10,9 +39,37 @@ def parse_args(args):
     parser.add_argument(
         'urls',
         action='store',
-        nargs='+',
+        nargs='*',
         help='The URLs of Spinitron episodes',
         )
+    parser.add_argument(
+        '-f', '--file',
+        action='append',
+        default=[],
+        required=False,
+        help='A file listing URLs one per line, or "-" for stdin; '
+             'may be given more than once',
+        dest='files',
+        )
+    parser.add_argument(
+        '-a', '--archive',
+        action='append',
+        default=[],
+        required=False,
+        help='A Spinitron show or station archive, or a WKDU program '
+             'page, to crawl for episodes newer than the last crawl; may '
+             'be given more than once',
+        dest='archives',
+        )
+    parser.add_argument(
+        '-j', '--jobs',
+        action='store',
+        type=int,
+        default=None,
+        required=False,
+        help='The number of episodes to work on at once',
+        dest='jobs',
+        )
     parser.add_argument(
         '-p', '--public',
         action='store_true',
@@ -29,4 +86,115 @@ def parse_args(args):
         help='The Spotify username to create the playlist with',
         dest='username',
         )
-    return vars(parser.parse_args(args))
+    parser.add_argument(
+        '-w', '--workers',
+        action='store',
+        type=int,
+        default=1,
+        required=False,
+        help='The number of track searches to run at once',
+        dest='workers',
+        )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        default=True,
+        required=False,
+        help='Skips the local caches of track searches and pages',
+        dest='use_cache',
+        )
+    parser.add_argument(
+        '--clear-cache',
+        action='store_true',
+        default=False,
+        required=False,
+        help='Empties the local caches before running',
+        dest='clear_cache',
+        )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        required=False,
+        help='Skips the URLs the last run finished and continues the '
+             'episodes it was partway through',
+        dest='resume',
+        )
+    parser.add_argument(
+        '--journal',
+        action='store',
+        default=None,
+        required=False,
+        help='Keeps a journal of the run at this path, for --resume',
+        dest='journal',
+        )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        default=False,
+        required=False,
+        help='Updates the existing playlists of episodes instead of '
+             'creating new ones',
+        dest='sync',
+        )
+    parser.add_argument(
+        '--tiers',
+        action='store',
+        nargs='+',
+        choices=list(TIERS),
+        default=DEFAULT_TIERS,
+        required=False,
+        help='The query rewrites to try for each track, in order',
+        dest='tiers',
+        )
+    parser.add_argument(
+        '--threshold',
+        action='store',
+        type=float,
+        default=THRESHOLD,
+        required=False,
+        help='The lowest match score, from 0 to 1, accepted for a track',
+        dest='threshold',
+        )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        default=False,
+        required=False,
+        help='Prints the searches and hit rate of each query tier, and '
+             'how often each parser fell back to guessing dates',
+        dest='show_stats',
+        )
+    parser.add_argument(
+        '--profile',
+        action='store',
+        default=None,
+        required=False,
+        help='Writes the timings of each stage, per URL and overall, '
+             'as JSON to the given file',
+        dest='profile',
+        )
+    params = vars(parser.parse_args(args))
+    if not (params['urls'] or params['files'] or params['archives']):
+        parser.error('no URLs, URL files or archives given')
+    if params['jobs'] is not None and params['jobs'] < 1:
+        parser.error('--jobs must be at least 1')
+    if params['workers'] < 1:
+        parser.error('--workers must be at least 1')
+    for archive in params['archives']:
+        try:
+            check_archive(archive)
+        except ValueError as error:
+            parser.error(str(error))
+    # Open each file once up front, so a bad path fails before any work
+    # starts; the URLs in them are still only read as they're needed.
+    for path in params['files']:
+        if path == '-':
+            continue
+        try:
+            with open(path):
+                pass
+        except OSError as error:
+            parser.error(f"can't open '{path}': {error.strerror}")
+    params['urls'] = read_urls(params['urls'], params.pop('files'))
+    return params
@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Share one call between every caller asking for the same key at once.
+
+    The first caller for a key makes the call; anyone asking for that key
+    before it finishes waits for, and gets, the same result (or error)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        """Return function(*args, **kwargs), sharing calls in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
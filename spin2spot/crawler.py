@@ -0,0 +1,118 @@
+import collections
+import re
+import urllib.parse
+from .parsers import FEATURES, bs4
+from .retrieval import parse_domain, retrieve_episode_html
+
+MAX_PAGES = 20  # archive pages read per crawl
+
+EpisodeLink = collections.namedtuple('EpisodeLink', ['url', 'number'])
+
+# The episode links of each site, and the URL each is fetched from.
+EPISODE_LINKS = [
+    (
+        re.compile(r'//(?:www\.)?spinitron\.com/(?P<station>\w+)/pl/'
+                   r'(?P<number>\d+)'),
+        'https://spinitron.com/{station}/pl/{number}',
+        ),
+    (
+        re.compile(r'//(?:www\.)?spinitron\.com/radio/playlist\.php\?'
+                   r'(?=[^#]*\bstation=(?P<station>\w+))'
+                   r'(?=[^#]*\bplaylist=(?P<number>\d+))'),
+        'https://spinitron.com/radio/playlist.php?station={station}'
+        '&playlist={number}',
+        ),
+    (
+        re.compile(r'//(?:www\.)?wkdu\.org/playlist/(?P<number>\d+)'),
+        'https://wkdu.org/playlist/{number}',
+        ),
+    ]
+ARCHIVE_DOMAINS = ('spinitron.com', 'wkdu.org')  # sites EPISODE_LINKS covers
+NEXT_TEXT = re.compile(r'^\s*(?:next|older)\b|^\s*[›»]\s*$', re.IGNORECASE)
+
+
+def check_archive(archive_url):
+    """Raise a ValueError unless the archive is on a site we can crawl.
+
+    Other sites' episode links aren't known, so crawling them would only
+    page through the archive to find nothing."""
+    domain = parse_domain(archive_url)
+    if domain not in ARCHIVE_DOMAINS:
+        raise ValueError(
+            f'Cannot crawl archives on {domain or archive_url}; only '
+            f'{" and ".join(ARCHIVE_DOMAINS)} archives are supported.'
+            )
+
+
+def episode_links(page_url, html):
+    """Return the episodes linked from the archive page, once each."""
+    soup = bs4.BeautifulSoup(html, FEATURES,
+                             parse_only=bs4.SoupStrainer('a'))
+    links = collections.OrderedDict()
+    for anchor in soup.find_all('a', href=True):
+        url = urllib.parse.urljoin(page_url, anchor['href'])
+        for pattern, template in EPISODE_LINKS:
+            match = pattern.search(url)
+            if match is not None:
+                number = int(match['number'])
+                links.setdefault(number, EpisodeLink(
+                    template.format(**match.groupdict()),
+                    number,
+                    ))
+                break
+    return list(links.values())
+
+
+def next_page(page_url, html):
+    """Return the URL of the archive's next (older) page, if it has one."""
+    soup = bs4.BeautifulSoup(
+        html,
+        FEATURES,
+        parse_only=bs4.SoupStrainer(['a', 'link', 'li']),
+        )
+    link = soup.find(['a', 'link'], rel='next', href=True)
+    if link is None:
+        item = soup.find('li', class_=re.compile('next'))
+        link = item and item.find('a', href=True)
+    if link is None:
+        link = soup.find('a', string=NEXT_TEXT, href=True)
+    if link is None:
+        return None
+    return urllib.parse.urljoin(page_url, link['href'])
+
+
+def crawl(archive_url, since=0, max_pages=MAX_PAGES):
+    """Return the episodes in a show or station archive newer than since.
+
+    Episode numbers only ever grow, so paging back through the archive
+    stops at the first page whose episodes are all at or below since.
+    Returns EpisodeLinks, oldest first."""
+    check_archive(archive_url)
+    found = {}
+    page_url = archive_url
+    for _ in range(max_pages):
+        html = retrieve_episode_html(page_url)
+        links = episode_links(page_url, html)
+        newer = [link for link in links if link.number > since]
+        found.update((link.number, link) for link in newer)
+        if links and not newer:
+            break
+        page_url = next_page(page_url, html)
+        if page_url is None:
+            break
+    return [found[number] for number in sorted(found)]
+
+
+def advance(marks, archive_url, episodes, results):
+    """Raise the archive's high-water mark past the processed episodes.
+
+    The mark stops short of the oldest episode that failed, so it's
+    tried again by the next crawl."""
+    failed = {result.url for result in results if result.error is not None}
+    mark = marks.get(archive_url)
+    for episode in episodes:
+        if episode.url in failed:
+            break
+        mark = max(mark, episode.number)
+    marks.set(archive_url, mark)
+    return mark
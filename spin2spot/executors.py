@@ -0,0 +1,19 @@
+import collections
+import contextvars
+
+
+def map_ahead(executor, function, items, window):
+    """Like executor.map, but only reads `window` items ahead.
+
+    executor.map consumes its whole input before yielding anything, which
+    would stall a streamed episode until its last track was extracted.
+    Each call runs in a copy of the caller's context, so its work is
+    profiled against the caller's URL."""
+    pending = collections.deque()
+    for item in items:
+        context = contextvars.copy_context()
+        pending.append(executor.submit(context.run, function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+from . import cache
+
+
+class Checkpoint:
+    """The journaled progress of a single episode.
+
+    Records the playlist created for the episode and how many of its
+    parsed tracks have been written to it, so a resumed run can carry on
+    from there rather than starting the episode over."""
+
+    def __init__(self, journal, url, playlist_id=None, position=0):
+        self._journal = journal
+        self.url = url
+        self.playlist_id = playlist_id
+        self.position = position
+
+    def created(self, playlist_id):
+        """Record the playlist created for the episode."""
+        self.playlist_id = playlist_id
+        self._journal.write('created', self.url, playlist_id=playlist_id)
+
+    def wrote(self, count):
+        """Record that another count of parsed tracks have been written."""
+        self.position += count
+        self._journal.write('wrote', self.url, position=self.position)
+
+    def finished(self):
+        """Record that every track of the episode has been written."""
+        self._journal.write('finished', self.url,
+                            playlist_id=self.playlist_id)
+
+
+class Journal:
+    """An append-only record of a batch run's progress, one JSON per line.
+
+    A new run starts the journal over. With resume=True, the entries of
+    the run before are read back first and added to, so finished URLs
+    can be skipped and partial episodes picked up where they stopped. A
+    line cut short by a crash is ignored, and cut off before the journal
+    is added to."""
+    FILENAME = 'journal.jsonl'
+
+    def __init__(self, path=None, resume=False):
+        if path is None:
+            path = os.path.join(cache.cache_dir(), self.FILENAME)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._episodes = {}
+        self._finished = {}
+        if resume and os.path.exists(path):
+            self._replay(path)
+            self._trim(path)
+        self._file = open(path, 'a' if resume else 'w')
+
+    def _replay(self, path):
+        """Rebuild the progress of each URL from the journal's entries."""
+        with open(path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                url = entry['url']
+                if entry['event'] == 'finished':
+                    self._finished[url] = entry['playlist_id']
+                    self._episodes.pop(url, None)
+                elif entry['event'] == 'created':
+                    self._episodes[url] = {
+                        'playlist_id': entry['playlist_id'],
+                        'position': 0,
+                        }
+                elif entry['event'] == 'wrote' and url in self._episodes:
+                    self._episodes[url]['position'] = entry['position']
+
+    @staticmethod
+    def _trim(path):
+        """Cut the journal back to the end of its last whole line."""
+        with open(path, 'rb+') as file:
+            content = file.read()
+            end = content.rfind(b'\n') + 1
+            if end < len(content):
+                file.truncate(end)
+
+    def write(self, event, url, **fields):
+        """Append an entry to the journal, flushing it to disk at once."""
+        line = json.dumps(dict(event=event, url=url, **fields))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def finished(self, url):
+        """Return the playlist ID for a finished URL, or None."""
+        return self._finished.get(url)
+
+    def checkpoint(self, url):
+        """Return the Checkpoint to continue the URL's episode from."""
+        progress = self._episodes.get(url, {})
+        return Checkpoint(self, url, **progress)
+
+    def close(self):
+        """Close the underlying journal file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
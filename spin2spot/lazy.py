@@ -0,0 +1,36 @@
+import importlib
+
+
+class LazyModule:
+    """A stand-in for a module that isn't imported until it's first used.
+
+    Each stage names its heavy dependencies at the top as usual, but a
+    run that never reaches the stage, like --help or one with bad
+    arguments, doesn't pay to import them. Attributes are read from, and
+    set on, the real module."""
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            # import_module is thread-safe and returns the same module
+            # to every caller, so a race here only repeats a lookup.
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, '_module', module)
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._load(), name)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
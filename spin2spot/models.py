@@ -0,0 +1,89 @@
+import collections.abc
+import sys
+
+
+def _intern(value):
+    """Return the string interned, so repeated ones share a single copy."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record(collections.abc.Mapping):
+    """The base class for the slotted, immutable records parsers return.
+
+    Fields can be read as attributes, or as keys by code written for the
+    dicts parsers used to return. Fields left as None aren't among the
+    keys, just as they were missing from those dicts."""
+    __slots__ = FIELDS = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"can't set {type(self).__name__}.{name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"can't delete {type(self).__name__}.{name}")
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and getattr(self, key) is not None
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+
+    def __len__(self):
+        return sum(getattr(self, name) is not None for name in self.FIELDS)
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, name) for name in self.FIELDS)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={self[name]!r}' for name in self)
+        return f'{type(self).__name__}({fields})'
+
+    def replace(self, **changes):
+        """Return a copy of the record with the given fields changed."""
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        fields.update(changes)
+        return type(self)(**fields)
+
+
+class Track(Record):
+    """A track played in an episode."""
+    __slots__ = FIELDS = ('artist', 'title', 'album', 'cover_of')
+
+    def __init__(self, artist, title, album=None, cover_of=None):
+        set_field = object.__setattr__
+        set_field(self, 'artist', _intern(artist))
+        set_field(self, 'title', _intern(title))
+        set_field(self, 'album', _intern(album))
+        set_field(self, 'cover_of', _intern(cover_of))
+
+    def __hash__(self):
+        return hash((self.artist, self.title, self.album, self.cover_of))
+
+
+class Episode(Record):
+    """An episode's details, and its tracks in the order they were played.
+
+    The tracks are a list, or an iterator when they're streamed."""
+    __slots__ = FIELDS = (
+        'title', 'datetime', 'tracks', 'station', 'dj', 'venue',
+        )
+
+    def __init__(self, title, datetime, tracks, station=None, dj=None,
+                 venue=None):
+        set_field = object.__setattr__
+        set_field(self, 'title', _intern(title))
+        set_field(self, 'datetime', datetime)
+        set_field(self, 'tracks', tracks)
+        set_field(self, 'station', _intern(station))
+        set_field(self, 'dj', _intern(dj))
+        set_field(self, 'venue', _intern(venue))
+
+    __hash__ = None
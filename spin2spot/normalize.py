@@ -0,0 +1,49 @@
+import functools
+import re
+import sys
+import unicodedata
+from .queries import FEATURING
+
+CACHE_SIZE = 65536  # distinct strings remembered by each normalizer
+
+INVALID_CHARACTERS = re.compile(
+    r'''
+    [^        # ignore everything except
+    \w\s      # words and whitespace
+    \.\:\/    # periods, colons, slashes
+    \-\=      # hyphens, equal signs
+    ]''',
+    re.VERBOSE,
+    )
+APOSTROPHES = re.compile(r"['’`]")
+PUNCTUATION = re.compile(r'[^\w\s]|_')
+ARTICLE = re.compile(r'^(?:the|a|an)\s+(?=\S)')
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def query_text(string):
+    """Strip the characters Spotify's search can't take from a query field."""
+    return sys.intern(INVALID_CHARACTERS.sub('', string))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _canonical(string):
+    folded = unicodedata.normalize('NFKD', string)
+    folded = ''.join(
+        character for character in folded
+        if not unicodedata.combining(character)
+        ).casefold()
+    folded = FEATURING.sub('', folded).replace('&', ' and ')
+    folded = PUNCTUATION.sub(' ', APOSTROPHES.sub('', folded))
+    folded = ARTICLE.sub('', ' '.join(folded.split()))
+    return sys.intern(folded)
+
+
+def canonical(string):
+    """Return the canonical form of an artist, title or album.
+
+    Accents and case are folded, "feat." credits, punctuation and a
+    leading article are dropped, and "&" is spelled out, so differently
+    logged names for the same thing compare equal. Results are memoized
+    and interned, so names repeated across a run are normalized once."""
+    return _canonical(string) if string else ''
@@ -1,38 +1,257 @@
-import dateutil.parser
-from bs4 import BeautifulSoup as Soup
+import datetime
+import functools
+import hashlib
+import importlib.util
+import re
+from . import profiling
+from .lazy import LazyModule
+from .models import Episode, Track
+from .tally import Tally
 
+PARSER_VERSION = 1  # bump whenever a parser's output changes
+FALLBACK_CACHE_SIZE = 1024  # distinct dates remembered by the fallback
+CHUNK_SIZE = 64 * 1024  # characters of a page pulled through lxml at once
+STRAIN_LIMIT = 256 * 1024  # characters; longer pages are parsed whole
 
-def ensure_is_soup(html):
-    """Ensure the incoming HTML is parsed as a BeautifulSoup object."""
-    return html if isinstance(html, Soup) else Soup(html, 'html.parser')
+
+def default_features():
+    """Return the fastest tree builder installed for BeautifulSoup.
+
+    lxml is only looked for here; it's imported along with bs4, when
+    parsing."""
+    if importlib.util.find_spec('lxml') is not None:
+        return 'lxml'
+    return 'html.parser'
+
+
+FEATURES = default_features()
+
+bs4 = LazyModule('bs4')
+dateutil_parser = LazyModule('dateutil.parser')
+etree = LazyModule('lxml.etree')
+
+
+class DateStats(Tally):
+    """Count the dates each parser read, and how many needed dateutil.
+
+    A site's dates only stop matching its format when the site changes
+    them, so a rising fallback count is the sign to update the format."""
+
+    FIELDS = ('parsed', 'fallbacks', 'fallback_rate')
+
+
+date_stats = DateStats()
+
+
+@functools.lru_cache(maxsize=FALLBACK_CACHE_SIZE)
+def _guess_datetime(text):
+    """Parse a date in an unexpected format, trying dateutil's guesses."""
+    return dateutil_parser.parse(text)
+
+
+def _read_datetime(text, fmt, parser_name):
+    """Parse the page's date with the site's strptime format.
+
+    Runs of whitespace are collapsed first. Dates that don't match are
+    handed to dateutil instead, and counted in date_stats."""
+    text = ' '.join(text.split())
+    try:
+        value = datetime.datetime.strptime(text, fmt)
+    except ValueError:
+        date_stats.record(parser_name, True)
+        return _guess_datetime(text)
+    date_stats.record(parser_name, False)
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def strainer(sections):
+    """Return a SoupStrainer keeping only elements with the given classes.
+
+    Class attributes are still raw strings while the page is being parsed,
+    so elements are matched with a pattern rather than a list of names."""
+    if not sections:
+        return None
+    names = '|'.join(re.escape(section) for section in sections)
+    pattern = re.compile(rf'(?:^|\s)(?:{names})(?:\s|$)')
+    return bs4.SoupStrainer(class_=pattern)
+
+
+def iter_elements(soup, name, class_):
+    """Yield the matching elements one at a time, in document order.
+
+    Unlike find_all, nothing past the element being handled is searched
+    until the caller asks for the next one."""
+    element = soup.find(name, class_=class_)
+    while element is not None:
+        yield element
+        element = element.find_next(name, class_=class_)
+
+
+def ensure_is_soup(html, sections=()):
+    """Ensure the incoming HTML is parsed as a BeautifulSoup object.
+
+    If sections are given, only the elements with those classes (and
+    everything inside them) are parsed from pages shorter than
+    STRAIN_LIMIT. Longer pages are mostly the playlist, which is kept
+    anyway, so checking every tag against the sections only costs time
+    there (see benchmarks/run.py)."""
+    if isinstance(html, bs4.BeautifulSoup):
+        return html
+    if len(html) >= STRAIN_LIMIT:
+        sections = ()
+    return bs4.BeautifulSoup(html, FEATURES,
+                             parse_only=strainer(tuple(sections)))
+
+
+def can_pull(html):
+    """Return whether the page can be parsed a piece at a time.
+
+    That takes raw HTML, and lxml's pull parser."""
+    return isinstance(html, (str, bytes)) and FEATURES == 'lxml'
+
+
+def _classes(element):
+    return (element.get('class') or '').split()
+
+
+def _markup(element):
+    return etree.tostring(element, encoding='unicode', method='html',
+                          with_tail=False)
+
+
+class PulledPage:
+    """A raw page parsed with lxml's pull parser as its rows are needed.
+
+    The elements with the section classes are kept as they're closed,
+    for the page's header. Each row, given as a (tag, class) pair, is
+    handed out as soon as its end tag is read, and then dropped from the
+    tree, so the header and first track don't wait for the rest of the
+    page, and the tree never holds more than one row."""
+
+    def __init__(self, html, sections, rows):
+        self._rows = frozenset(rows)
+        row_classes = {class_ for _, class_ in self._rows}
+        self._sections = frozenset(sections) - row_classes
+        self._events = self._pull(html)
+        self._kept = []
+        self._row = None
+
+    @staticmethod
+    def _pull(html):
+        parser = etree.HTMLPullParser(events=('end',))
+        for start in range(0, len(html), CHUNK_SIZE):
+            parser.feed(html[start:start + CHUNK_SIZE])
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    def find(self, pairs):
+        """Return the next element matching a (tag, class) pair, or None.
+
+        A row found on the way ends the search; it's the next of rows()."""
+        if self._row is not None:
+            return None
+        for _, element in self._events:
+            classes = _classes(element)
+            if not self._sections.isdisjoint(classes):
+                self._kept.append(element)
+            if any((element.tag, class_) in self._rows for class_ in classes):
+                self._row = element
+            if any((element.tag, class_) in pairs for class_ in classes):
+                return element
+            if self._row is not None:
+                return None
+        return None
+
+    def header(self):
+        """Return a soup of the sections that close before the first row."""
+        self.find(self._rows)
+        kept = set(self._kept)
+        html = ''.join(
+            _markup(element)
+            for element in self._kept
+            if kept.isdisjoint(element.iterancestors())
+            )
+        return bs4.BeautifulSoup(html, FEATURES)
+
+    def rows(self):
+        """Yield a soup of each row in turn, reading on as they're taken."""
+        self.find(self._rows)
+        while self._row is not None:
+            row, self._row = self._row, None
+            fragment = bs4.BeautifulSoup(_markup(row), FEATURES)
+            row.getparent().remove(row)
+            yield fragment
+            self.find(self._rows)
 
 
 class RadioParser:
-    """The base class for episode-page parsers."""
-
-    def __new__(cls, html):
-        soup = ensure_is_soup(html)
-        return {
-            'title': cls.parse_title(soup).strip(),
-            'station': cls.parse_station(soup).strip(),
-            'dj': cls.parse_dj(soup).strip(),
-            'datetime': cls.parse_datetime(soup),
-            'tracks': cls.parse_tracks(soup),
-            }
+    """The base class for episode-page parsers.
+
+    Subclasses list the classes of the page SECTIONS they read from, so
+    the rest of the page can be skipped when parsing raw HTML, and the
+    (tag, class) MARKERS that only their kind of page has.
+
+    With stream=True, the tracks are a generator that extracts each track
+    as it's consumed, so searches can start before the last track has
+    been read. When lxml is installed, raw pages whose tracks each sit in
+    one of the (tag, class) ROWS, after the header, are parsed a piece at
+    a time as well."""
+    SECTIONS = ()
+    MARKERS = ()
+    ROWS = ()
+
+    def __new__(cls, html, stream=False):
+        if stream and cls.ROWS and can_pull(html):
+            return cls.from_page(PulledPage(html, cls.SECTIONS, cls.ROWS))
+        soup = ensure_is_soup(html, cls.SECTIONS)
+        return cls.from_soup(soup, cls.iter_tracks(soup) if stream
+                             else cls.parse_tracks(soup))
+
+    @classmethod
+    def from_page(cls, page):
+        """Return the episode of a PulledPage, streaming its tracks."""
+        return cls.from_soup(page.header(), map(cls.parse_track, page.rows()))
+
+    @classmethod
+    def from_soup(cls, soup, tracks):
+        return Episode(
+            title=cls.parse_title(soup).strip(),
+            station=cls.parse_station(soup).strip(),
+            dj=cls.parse_dj(soup).strip(),
+            datetime=cls.parse_datetime(soup),
+            tracks=tracks,
+            )
+
+    @classmethod
+    def parse_tracks(cls, soup):
+        return list(cls.iter_tracks(soup))
 
 
 class SetlistFMParser:
     """Parse a Setlist.FM page."""
-
-    def __new__(cls, html):
-        soup = ensure_is_soup(html)
-        artist = cls.parse_artist(soup)
-        return {
-            'title': artist,
-            'venue': cls.parse_venue(soup),
-            'datetime': cls.parse_datetime(soup),
-            'tracks': cls.parse_tracks(soup, artist),
-            }
+    SECTIONS = ('setlistHeadline', 'dateBlock', 'song')
+    ROWS = (('li', 'song'),)
+    DATETIME_FORMAT = '%b %d %Y'  # May 4 2019
+
+    def __new__(cls, html, stream=False):
+        if stream and can_pull(html):
+            page = PulledPage(html, cls.SECTIONS, cls.ROWS)
+            soup = page.header()
+            artist = cls.parse_artist(soup)
+            tracks = cls.parse_rows(page.rows(), artist)
+        else:
+            soup = ensure_is_soup(html, cls.SECTIONS)
+            artist = cls.parse_artist(soup)
+            tracks = (cls.iter_tracks(soup, artist) if stream
+                      else cls.parse_tracks(soup, artist))
+        return Episode(
+            title=artist,
+            venue=cls.parse_venue(soup),
+            datetime=cls.parse_datetime(soup),
+            tracks=tracks,
+            )
 
     @staticmethod
     def parse_artist(soup):
@@ -42,33 +261,45 @@ class SetlistFMParser:
     def parse_venue(soup):
         return soup.find('h1').findAll('a')[1].text.strip()
 
-    @staticmethod
-    def parse_datetime(soup):
+    @classmethod
+    def parse_datetime(cls, soup):
         date = soup.find('div', class_='dateBlock').text
-        return dateutil.parser.parse(date)
+        return _read_datetime(date, cls.DATETIME_FORMAT, cls.__name__)
 
     @classmethod
     def parse_tracks(cls, soup, artist):
-        tracks = soup.findAll('li', class_='song')
-        tracks = [cls.parse_track(track, artist) for track in tracks]
-        return [track for track in tracks if track is not None]
+        return list(cls.iter_tracks(soup, artist))
+
+    @classmethod
+    def iter_tracks(cls, soup, artist):
+        return cls.parse_rows(iter_elements(soup, 'li', 'song'), artist)
+
+    @classmethod
+    def parse_rows(cls, rows, artist):
+        for track in rows:
+            track = cls.parse_track(track, artist)
+            if track is not None:
+                yield track
 
     @staticmethod
     def parse_track(track, artist):
         if track.find('span', class_='unknownSong'):
             return None
         title = track.find('a').text
-        payload = {'artist': artist, 'title': title}
         links = track.findAll('a')
         if len(links) < 3:
-            return payload
+            return Track(artist, title)
         cover_of = links[1].text
-        payload['cover_of'] = cover_of
-        return payload
+        return Track(artist, title, cover_of=cover_of)
 
 
 class SpinitronV1Parser(RadioParser):
     """Parse an old-style Spinitron episode page."""
+    SECTIONS = ('plhead', 'part', 'infoblock', 'plheadsub', 'f2row')
+    MARKERS = (('div', 'f2row'), ('p', 'plhead'))
+    ROWS = (('div', 'f2row'),)
+    DATETIME_FORMAT = '%a %b %d %Y %I:%M%p'  # Tue Nov 10 2015 11:00am
+    ORDINAL = re.compile(r'(?<=\d)(?:st|nd|rd|th)\b')
 
     @staticmethod
     def parse_title(soup):
@@ -82,17 +313,18 @@ class SpinitronV1Parser(RadioParser):
     def parse_dj(soup):
         return soup.find('div', class_='infoblock').find('a').text
 
-    @staticmethod
-    def parse_datetime(soup):
+    @classmethod
+    def parse_datetime(cls, soup):
         date = soup.find('p', class_='plheadsub').text
         date = date[:date.find('–')]  # remove ending time
         date = date.replace('.', ':')
-        return dateutil.parser.parse(date)
+        date = cls.ORDINAL.sub('', date)  # 10th
+        return _read_datetime(date, cls.DATETIME_FORMAT, cls.__name__)
 
     @classmethod
-    def parse_tracks(cls, soup):
-        tracks = soup.findAll('div', class_='f2row')
-        return [cls._parse_track(track) for track in tracks]
+    def iter_tracks(cls, soup):
+        for track in iter_elements(soup, 'div', 'f2row'):
+            yield cls.parse_track(track)
 
     @staticmethod
     def parse_track(track):
@@ -100,11 +332,17 @@ class SpinitronV1Parser(RadioParser):
         title = track.find('span', class_='sn').text[1:-1]  # quotes
         album = track.find('span', class_='dn')
         album = album.text if album else ''
-        return {'artist': artist, 'title': title, 'album': album}
+        return Track(artist, title, album)
 
 
 class SpinitronV2Parser(RadioParser):
     """Parse a new-style Spinitron episode page."""
+    SECTIONS = (
+        'station-title', 'show-title', 'dj-name', 'timeslot', 'spin-item',
+        )
+    MARKERS = (('tr', 'spin-item'), ('h3', 'show-title'))
+    ROWS = (('tr', 'spin-item'),)
+    DATETIME_FORMAT = '%b %d, %Y %I:%M %p'  # Aug 2, 2016 2:00 PM
 
     @staticmethod
     def parse_title(soup):
@@ -118,16 +356,16 @@ class SpinitronV2Parser(RadioParser):
     def parse_dj(soup):
         return soup.find('p', class_='dj-name').find('a').text
 
-    @staticmethod
-    def parse_datetime(soup):
+    @classmethod
+    def parse_datetime(cls, soup):
         date = soup.find('p', class_='timeslot').text
         date = date[:date.find('–')]  # remove ending time
-        return dateutil.parser.parse(date)
+        return _read_datetime(date, cls.DATETIME_FORMAT, cls.__name__)
 
     @classmethod
-    def parse_tracks(cls, soup):
-        tracks = soup.findAll('tr', class_='spin-item')
-        return [cls.parse_track(track) for track in tracks]
+    def iter_tracks(cls, soup):
+        for track in iter_elements(soup, 'tr', 'spin-item'):
+            yield cls.parse_track(track)
 
     @staticmethod
     def parse_track(track):
@@ -135,11 +373,16 @@ class SpinitronV2Parser(RadioParser):
         title = track.find('span', class_='song').text
         album = track.find('span', class_='release')
         album = album.text if album else ''
-        return {'artist': artist, 'title': title, 'album': album}
+        return Track(artist, title, album)
 
 
 class WKDUParser(RadioParser):
     """Parse a WKDU episode page."""
+    SECTIONS = (
+        'panel-col-last', 'field-field-station-program-dj',
+        'pane-node-content', 'views-table',
+        )
+    DATETIME_FORMAT = '%m/%d/%y'  # 10/1/13
 
     @staticmethod
     def parse_title(soup):
@@ -155,29 +398,35 @@ class WKDUParser(RadioParser):
         div = soup.find('div', class_='field-field-station-program-dj')
         return div.find('a').text
 
-    @staticmethod
-    def parse_datetime(soup):
+    @classmethod
+    def parse_datetime(cls, soup):
         panel = soup.find('div', class_='pane-node-content')
         title = panel.find('h2').text
         date = title.split(' ')[-1]
-        return dateutil.parser.parse(date)
+        return _read_datetime(date, cls.DATETIME_FORMAT, cls.__name__)
 
     @classmethod
-    def parse_tracks(cls, soup):
+    def iter_tracks(cls, soup):
         table = soup.find('table', class_='views-table').find('tbody')
-        tracks = table.findAll('tr')
-        return [cls.parse_track(track) for track in tracks]
+        for track in table.children:
+            if track.name == 'tr':
+                yield cls.parse_track(track)
 
     @staticmethod
     def parse_track(track):
         artist = track.find('td', class_='views-field-artist').text.strip()
         title = track.find('td', class_='views-field-title').text.strip()
         album = track.find('td', class_='views-field-album').text.strip()
-        return {'artist': artist, 'title': title, 'album': album}
+        return Track(artist, title, album)
 
 
 class WPRBParser(RadioParser):
     """Parse a WPRB episode page."""
+    SECTIONS = (
+        'playlist-title-text', 'dj-name', 'playlist-time', 'playlist-row',
+        )
+    ROWS = (('tr', 'playlist-row'),)
+    DATETIME_FORMAT = '%A, %B %d, %Y %H:%M'  # Tuesday, November 10, 2015 14:00
 
     @staticmethod
     def parse_title(soup):
@@ -192,30 +441,44 @@ class WPRBParser(RadioParser):
         dj = soup.find('h3', class_='dj-name').text.strip()
         return dj[5:]  # "with "
 
-    @staticmethod
-    def parse_datetime(soup):
+    @classmethod
+    def parse_datetime(cls, soup):
         date = soup.find('span', class_='playlist-time').text
         date = ' '.join(date.split('\n')[:2])  # one line
         date = date.split(' to ')[0]  # remove ending time
-        return dateutil.parser.parse(date)
+        return _read_datetime(date, cls.DATETIME_FORMAT, cls.__name__)
 
     @classmethod
-    def parse_tracks(cls, soup):
-        tracks = soup.findAll('tr', class_='playlist-row')
-        return [cls._parse_track(track) for track in tracks]
+    def iter_tracks(cls, soup):
+        for track in iter_elements(soup, 'tr', 'playlist-row'):
+            yield cls.parse_track(track)
 
     @staticmethod
     def parse_track(track):
         artist = track.find('td', class_='playlist-artist').text
         title = track.find('td', class_='playlist-song').text
         album = track.find('td', class_='playlist-album').text
-        return {'artist': artist, 'title': title, 'album': album}
+        return Track(artist, title, album)
 
 
 class BaseMultiparser:
-    """The base class for a parser with subparsers."""
-    def __new__(cls, html):
-        soup = ensure_is_soup(html)
+    """The base class for a parser with subparsers.
+
+    The subparser whose markers turn up first in the page is used
+    directly. Only pages without any markers fall back to trying every
+    subparser in turn, and always parse their tracks up front."""
+    def __new__(cls, html, stream=False):
+        sections = [section
+                    for subparser in cls.SUBPARSERS
+                    for section in subparser.SECTIONS]
+        if stream and can_pull(html):
+            episode = cls.pull(html, sections)
+            if episode is not None:
+                return episode
+        soup = ensure_is_soup(html, sections)
+        subparser = cls.detect(soup)
+        if subparser is not None:
+            return subparser(soup, stream=stream)
         for subparser in cls.SUBPARSERS:
             try:
                 return subparser(soup)
@@ -223,6 +486,47 @@ class BaseMultiparser:
                 pass
         raise ValueError(f'Cannot parse non-{cls.NAME} content.')
 
+    @classmethod
+    def pull(cls, html, sections):
+        """Return the episode of raw HTML parsed a piece at a time.
+
+        The subparser is the one whose marker closes first; returns None
+        if no marker turns up at all."""
+        markers = {
+            marker: subparser
+            for subparser in cls.SUBPARSERS
+            for marker in subparser.MARKERS
+            }
+        rows = [row for subparser in cls.SUBPARSERS for row in subparser.ROWS]
+        page = PulledPage(html, sections, rows)
+        tag = page.find(markers)
+        if tag is None:
+            return None
+        for class_ in _classes(tag):
+            if (tag.tag, class_) in markers:
+                return markers[tag.tag, class_].from_page(page)
+
+    @classmethod
+    def detect(cls, soup):
+        """Return the subparser for the page, or None if it's unclear.
+
+        Searches for every subparser's markers in a single pass."""
+        markers = {
+            marker: subparser
+            for subparser in cls.SUBPARSERS
+            for marker in subparser.MARKERS
+            }
+
+        def is_marker(tag):
+            classes = tag.get('class') or ()
+            return any((tag.name, class_) in markers for class_ in classes)
+        tag = soup.find(is_marker)
+        if tag is None:
+            return None
+        for class_ in tag['class']:
+            if (tag.name, class_) in markers:
+                return markers[tag.name, class_]
+
 
 class SpinitronParser(BaseMultiparser):
     NAME = 'Spinitron'
@@ -237,10 +541,54 @@ DOMAIN_TO_PARSER = {
     }
 
 
-def parse_episode(domain, html):
-    """Parse the given episode HTML."""
+def content_digest(html):
+    """Return a hash of the page content, for caching what's parsed from it."""
+    if not isinstance(html, bytes):
+        html = str(html).encode('utf-8')
+    return hashlib.sha256(html).hexdigest()
+
+
+def _store_when_read(episodes, url, digest, episode, tracks):
+    """Yield the tracks, caching the episode once they've all been read."""
+    read = []
+    for track in tracks:
+        read.append(track)
+        yield track
+    episodes.set(url, digest, PARSER_VERSION, episode.replace(tracks=read))
+
+
+def parse_episode(domain, html, stream=False, url=None, episodes=None):
+    """Parse the given episode HTML.
+
+    Streamed tracks count towards the parse stage as they're extracted.
+    Given an EpisodeCache and the page's URL, an episode parsed before
+    from the same content is returned without parsing the page again;
+    new ones are cached once all their tracks have been read."""
     try:
         parser = DOMAIN_TO_PARSER[domain]
     except KeyError:
         raise KeyError('Cannot parse content from {domain}.')
-    return parser(html)
+    digest = None
+    if episodes is not None and url is not None:
+        digest = content_digest(html)
+        episode = episodes.get(url, digest, PARSER_VERSION)
+        if episode is not None:
+            return episode
+    with profiling.hooks.stage('parse'):
+        episode = parser(html, stream=stream)
+    if stream:
+        episode = episode.replace(
+            tracks=profiling.hooks.iterate('parse', episode.tracks),
+            )
+    if digest is not None:
+        if stream:
+            episode = episode.replace(tracks=_store_when_read(
+                episodes,
+                url,
+                digest,
+                episode,
+                episode.tracks,
+                ))
+        else:
+            episodes.set(url, digest, PARSER_VERSION, episode)
+    return episode
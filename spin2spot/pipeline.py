@@ -0,0 +1,117 @@
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import profiling
+from .executors import map_ahead
+from .parsers import parse_episode
+from .queries import DEFAULT_TIERS
+from .retrieval import retrieve_episode
+from .scoring import THRESHOLD
+from .spotify import PlaylistIndex, create_playlist_from_parser
+
+STAGE_LIMITS = {
+    'fetch': 4,
+    'parse': 2,
+    'resolve': 1,
+    'write': 2,
+    }
+
+READ_AHEAD = 2  # URLs queued per episode in progress
+
+Result = collections.namedtuple('Result', ['url', 'playlist_id', 'error'])
+_DONE = object()
+
+
+def stage_limits(**limits):
+    """Return the per-stage concurrency limits, with defaults filled in."""
+    unknown = set(limits) - set(STAGE_LIMITS)
+    if unknown:
+        raise ValueError(f'Unknown pipeline stages: {sorted(unknown)}.')
+    limits = dict(STAGE_LIMITS, **limits)
+    for stage, limit in limits.items():
+        if limit < 1:
+            raise ValueError(f'The {stage} stage needs at least one worker.')
+    return limits
+
+
+def _holding(semaphore, items):
+    """Yield the items, holding the semaphore while each one is produced."""
+    items = iter(items)
+    while True:
+        with semaphore:
+            item = next(items, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+def process_episodes(client, urls, public=False, cache=None, pages=None,
+                     episodes=None, tiers=DEFAULT_TIERS, threshold=THRESHOLD,
+                     journal=None, sync=False, jobs=None, **limits):
+    """Create a Spotify playlist for each URL, overlapping episodes.
+
+    Each episode moves through the fetch, parse, resolve and write stages
+    in turn, but different episodes can be in different stages at once.
+    Every stage has its own concurrency limit, whichever episode the work
+    belongs to: parse covers the tracks extracted as they're streamed as
+    well as the page itself, the track searches of all episodes share
+    one resolve pool, and write covers only the calls that create or
+    change playlists. Returns a Result for each URL, in order; a failed
+    episode doesn't stop the others. At most jobs episodes are in
+    progress at once (by default, as many as the fetch, parse and write
+    stages allow together), and the URLs are read lazily, only a little
+    ahead of them.
+
+    Given an EpisodeCache, pages whose content hasn't changed since they
+    were last parsed aren't parsed again. Given a Journal, each episode's
+    progress is recorded in it; URLs it has as finished are skipped, and
+    partial episodes are continued. With sync=True, episodes that already
+    have a playlist update it in place; the user's playlists are listed
+    once for the whole run."""
+    limits = stage_limits(**limits)
+    semaphores = {
+        stage: threading.BoundedSemaphore(limits[stage])
+        for stage in ('fetch', 'parse', 'write')
+        }
+    playlists = PlaylistIndex(client) if sync else None
+
+    def process(url):
+        profiling.current_url.set(url)
+        checkpoint = None
+        if journal is not None:
+            playlist_id = journal.finished(url)
+            if playlist_id is not None:
+                return Result(url, playlist_id, None)
+            checkpoint = journal.checkpoint(url)
+        try:
+            with semaphores['fetch']:
+                domain, html = retrieve_episode(url, pages=pages)
+            with semaphores['parse']:
+                parser = parse_episode(domain, html, stream=True, url=url,
+                                       episodes=episodes)
+            parser = parser.replace(
+                tracks=_holding(semaphores['parse'], parser['tracks']),
+                )
+            playlist_id = create_playlist_from_parser(
+                client,
+                parser,
+                public=public,
+                cache=cache,
+                workers=limits['resolve'],
+                executor=resolver,
+                tiers=tiers,
+                threshold=threshold,
+                checkpoint=checkpoint,
+                sync=sync,
+                playlists=playlists,
+                write_limit=semaphores['write'],
+                )
+        except Exception as error:
+            return Result(url, None, error)
+        return Result(url, playlist_id, None)
+
+    if jobs is None:
+        jobs = limits['fetch'] + limits['parse'] + limits['write']
+    with ThreadPoolExecutor(max_workers=limits['resolve']) as resolver, \
+            ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(map_ahead(executor, process, urls, READ_AHEAD * jobs))
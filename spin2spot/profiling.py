@@ -0,0 +1,104 @@
+import collections
+import contextlib
+import contextvars
+import threading
+import time
+
+current_url = contextvars.ContextVar('current_url', default=None)
+
+
+class Hooks:
+    """The hook points wrapped around each stage of the work.
+
+    These defaults record nothing; install a Profiler to collect timings
+    instead."""
+
+    def stage(self, name):
+        """Return a context manager around one call of the named stage."""
+        return contextlib.nullcontext()
+
+    def iterate(self, name, iterable):
+        """Return the iterable, counting the time to produce each item."""
+        return iterable
+
+    def transferred(self, name, size):
+        """Note that the named stage moved the given number of bytes."""
+
+
+class Profiler(Hooks):
+    """Collect the time, calls and bytes of each stage, per URL and overall.
+
+    Work is attributed to the URL in current_url when it runs."""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._started = clock()
+        self._totals = collections.defaultdict(self._counts)
+        self._urls = collections.defaultdict(
+            lambda: collections.defaultdict(self._counts),
+            )
+
+    @staticmethod
+    def _counts():
+        return {'calls': 0, 'seconds': 0.0, 'bytes': 0}
+
+    def _record(self, name, calls=0, seconds=0.0, size=0):
+        url = current_url.get()
+        with self._lock:
+            tallies = [self._totals[name]]
+            if url is not None:
+                tallies.append(self._urls[url][name])
+            for counts in tallies:
+                counts['calls'] += calls
+                counts['seconds'] += seconds
+                counts['bytes'] += size
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self._record(name, calls=1, seconds=self._clock() - start)
+
+    def iterate(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            start = self._clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._record(name, seconds=self._clock() - start)
+            yield item
+
+    def transferred(self, name, size):
+        self._record(name, size=size)
+
+    def report(self):
+        """Return the run's timings, ready to be written out as JSON."""
+        with self._lock:
+            return {
+                'seconds': self._clock() - self._started,
+                'stages': {
+                    name: dict(counts)
+                    for name, counts in self._totals.items()
+                    },
+                'urls': {
+                    url: {name: dict(counts)
+                          for name, counts in stages.items()}
+                    for url, stages in self._urls.items()
+                    },
+                }
+
+
+hooks = Hooks()
+
+
+def install(new_hooks):
+    """Use the given hooks from now on, returning the ones replaced."""
+    global hooks
+    previous, hooks = hooks, new_hooks
+    return previous
@@ -0,0 +1,85 @@
+import collections
+import re
+from .tally import Tally
+
+FEATURING = re.compile(
+    r'\s*[\(\[]?\b(?:feat\.?|ft\.|featuring)\s[^\)\]]*[\)\]]?',
+    re.IGNORECASE,
+    )
+VERSION_WORDS = r'(?:remaster(?:ed)?|live|edit|version|mix|mono|stereo|demo)'
+VERSION = re.compile(
+    rf'''
+    \s*(?:
+        [\(\[][^\)\]]*\b{VERSION_WORDS}\b[^\)\]]*[\)\]]  # (Live)
+        |\s-\s[^-]*\b{VERSION_WORDS}\b.*                 # - Remastered
+    )$''',
+    re.IGNORECASE | re.VERBOSE,
+    )
+ARTIST_SEPARATOR = re.compile(
+    r'\s*(?:,|&|\+|/|\band\b|\bwith\b|\bx\b|\bvs\.?)\s*',
+    re.IGNORECASE,
+    )
+
+
+def exact(artist, title, cover_of=None):
+    """Search for the track as it was logged."""
+    return artist, title
+
+
+def covered_artist(artist, title, cover_of=None):
+    """Search for the original artist of a cover."""
+    return (cover_of, title) if cover_of else None
+
+
+def without_featuring(artist, title, cover_of=None):
+    """Drop "feat. ..." credits from the artist and title."""
+    return FEATURING.sub('', artist), FEATURING.sub('', title)
+
+
+def without_version(artist, title, cover_of=None):
+    """Drop remaster, live, edit and mix tags from the title."""
+    return artist, VERSION.sub('', title)
+
+
+def ampersand_as_and(artist, title, cover_of=None):
+    """Spell out ampersands, which would otherwise be stripped."""
+    return artist.replace('&', 'and'), title.replace('&', 'and')
+
+
+def first_artist(artist, title, cover_of=None):
+    """Search for only the first of several credited artists."""
+    return ARTIST_SEPARATOR.split(artist, 1)[0], title
+
+
+TIERS = collections.OrderedDict([
+    ('exact', exact),
+    ('cover_of', covered_artist),
+    ('featuring', without_featuring),
+    ('version', without_version),
+    ('ampersand', ampersand_as_and),
+    ('first_artist', first_artist),
+    ])
+DEFAULT_TIERS = tuple(TIERS)
+
+
+def rewrites(artist, title, cover_of=None, tiers=DEFAULT_TIERS):
+    """Yield the (tier, artist, title) searches to try, in order.
+
+    Tiers that don't apply to the track, or that would repeat an earlier
+    search, are skipped."""
+    seen = set()
+    for tier in tiers:
+        query = TIERS[tier](artist, title, cover_of)
+        if query is None or not all(query) or query in seen:
+            continue
+        seen.add(query)
+        yield (tier,) + query
+
+
+class TierStats(Tally):
+    """Count the searches made and the hits found by each query tier."""
+
+    FIELDS = ('searches', 'hits', 'hit_rate')
+
+
+stats = TierStats()
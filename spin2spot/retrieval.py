@@ -1,5 +1,24 @@
-import requests
+import collections
+import functools
+import threading
 import urllib.parse
+from . import profiling
+from .lazy import LazyModule
+
+POOL_SIZE = 10
+TIMEOUT = (5, 30)  # seconds to connect, seconds between bytes
+DOMAIN_LIMIT = 4  # concurrent bulk downloads per domain
+
+Download = collections.namedtuple(
+    'Download',
+    ['url', 'domain', 'html', 'error'],
+    )
+
+asyncio = LazyModule('asyncio')
+requests = LazyModule('requests')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
 
 
 def parse_domain(url):
@@ -12,14 +31,120 @@ def parse_domain(url):
     return '.'.join(domain)
 
 
-def retrieve_episode_html(url):
-    """Retrieve the HTML for the given episode playlist URL."""
-    response = requests.get(url)
+def get_session(domain):
+    """Return the shared, keep-alive HTTP session for the given domain."""
+    with _sessions_lock:
+        session = _sessions.get(domain)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=POOL_SIZE,
+                )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['Accept-Encoding'] = 'gzip, deflate'
+            _sessions[domain] = session
+        return session
+
+
+def _conditional_headers(page):
+    """Return the revalidation headers for a previously cached page."""
+    headers = {}
+    if page is not None and page.etag:
+        headers['If-None-Match'] = page.etag
+    if page is not None and page.last_modified:
+        headers['If-Modified-Since'] = page.last_modified
+    return headers
+
+
+def retrieve_episode_html(url, pages=None):
+    """Retrieve the HTML for the given episode playlist URL.
+
+    Given a PageCache, pages downloaded before are revalidated with their
+    ETag or Last-Modified date and reused if the server answers 304."""
+    session = get_session(parse_domain(url))
+    page = pages.get(url) if pages is not None else None
+    with profiling.hooks.stage('fetch'):
+        response = session.get(
+            url,
+            headers=_conditional_headers(page),
+            timeout=TIMEOUT,
+            )
+    if page is not None and response.status_code == 304:
+        return page.content
+    response.raise_for_status()
+    profiling.hooks.transferred('fetch', len(response.content))
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if pages is not None and (etag or last_modified):
+        pages.set(url, etag, last_modified, response.content)
     return response.content
 
 
-def retrieve_episode(url):
+def retrieve_episode(url, pages=None):
     """Return the domain and HTML for the given playlist URL."""
     domain = parse_domain(url)
-    html = retrieve_episode_html(url)
+    html = retrieve_episode_html(url, pages=pages)
     return domain, html
+
+
+async def retrieve_episode_async(url, pages=None):
+    """Return the domain and HTML for the given URL without blocking.
+
+    The download itself runs on the event loop's default executor,
+    through the same pooled sessions as retrieve_episode."""
+    loop = asyncio.get_running_loop()
+    retrieve = functools.partial(retrieve_episode, url, pages=pages)
+    return await loop.run_in_executor(None, retrieve)
+
+
+class _DomainThrottle:
+    """Cap the downloads in flight to a domain and space out their starts."""
+
+    def __init__(self, limit, delay):
+        self.delay = delay
+        self._semaphore = asyncio.Semaphore(limit)
+        self._lock = asyncio.Lock()
+        self._next_start = 0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            if self._next_start > now:
+                await asyncio.sleep(self._next_start - now)
+            self._next_start = max(now, self._next_start) + self.delay
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+async def retrieve_episodes(urls, per_domain=DOMAIN_LIMIT, delay=0,
+                            pages=None):
+    """Download many episode pages at once, yielding each as it finishes.
+
+    At most per_domain pages are in flight to any one domain, and starts
+    to the same domain are at least delay seconds apart. Yields a
+    Download for every URL, in completion order; failures carry their
+    exception as the error rather than stopping the others."""
+    throttles = collections.defaultdict(
+        lambda: _DomainThrottle(per_domain, delay),
+        )
+
+    async def download(url):
+        domain = parse_domain(url)
+        try:
+            async with throttles[domain]:
+                domain, html = await retrieve_episode_async(url, pages=pages)
+        except Exception as error:
+            return Download(url, domain, None, error)
+        return Download(url, domain, html, None)
+
+    tasks = [asyncio.ensure_future(download(url)) for url in urls]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,75 @@
+import collections
+import difflib
+from .normalize import canonical
+from .queries import VERSION
+
+WEIGHTS = {'title': 0.5, 'artist': 0.3, 'album': 0.15, 'duration': 0.05}
+THRESHOLD = 0.7  # the lowest score counted as a confident match
+SCORING_VERSION = 1  # bump whenever matches are found or scored differently
+FLOOR = 0.5  # similarities below this count as no match at all
+DURATION_TOLERANCE = 30000  # milliseconds off before a duration scores 0
+
+Match = collections.namedtuple('Match', ['id', 'score'])
+
+
+def similarity(a, b):
+    """Return how alike the two normalized strings are, from 0 to 1."""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    ratio = difflib.SequenceMatcher(None, a, b).ratio()
+    return ratio if ratio >= FLOOR else 0.0
+
+
+def _candidate_fields(candidate):
+    """Normalize the fields of a Spotify track once, for every comparison."""
+    name = candidate['name']
+    return (
+        (canonical(name), canonical(VERSION.sub('', name))),
+        [canonical(artist['name']) for artist in candidate['artists']],
+        canonical(candidate['album']['name']),
+        candidate.get('duration_ms'),
+        )
+
+
+def score_candidates(candidates, artist, title, album=None, duration=None,
+                     weights=WEIGHTS):
+    """Score how well each Spotify track matches the logged track.
+
+    Titles, artists and albums are compared by string similarity, and
+    durations (in milliseconds) by how far apart they are. Fields the
+    logged track doesn't have are left out of the score. Returns a Match
+    for each candidate, best first; ties keep Spotify's order."""
+    artist, title, album = map(canonical, (artist, title, album))
+    fields = ['title', 'artist']
+    fields += ['album'] if album else []
+    fields += ['duration'] if duration else []
+    total = sum(weights[field] for field in fields)
+    matches = []
+    for candidate in candidates:
+        names, artists, candidate_album, length = _candidate_fields(candidate)
+        scores = {
+            'title': max(similarity(title, name) for name in names),
+            'artist': max(
+                similarity(artist, name)
+                for name in artists + [', '.join(artists)]
+                ),
+            'album': similarity(album, candidate_album),
+            'duration': (
+                max(0, 1 - abs(duration - length) / DURATION_TOLERANCE)
+                if duration and length else 0
+                ),
+            }
+        score = sum(weights[field] * scores[field] for field in fields)
+        matches.append(Match(candidate['id'], score / total))
+    return sorted(matches, key=lambda match: -match.score)
+
+
+def best_match(candidates, artist, title, album=None, duration=None,
+               threshold=THRESHOLD):
+    """Return the best-scoring Match, or None if none is confident."""
+    matches = score_candidates(candidates, artist, title, album, duration)
+    if matches and matches[0].score >= threshold:
+        return matches[0]
+    return None
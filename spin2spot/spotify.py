@@ -1,20 +1,38 @@
+import collections
+import contextlib
+import difflib
+import functools
+import itertools
 import os
-import re
-import spotipy
-import spotipy.util as util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import profiling
+from .cache import MISSING, track_key
+from .coalesce import SingleFlight
 from .descriptions import playlist_description, playlist_title
+from .executors import map_ahead
+from .lazy import LazyModule
+from .normalize import query_text
 from .parsers import parse_episode
+from .queries import DEFAULT_TIERS, rewrites, stats
 from .retrieval import retrieve_episode
+from .scoring import THRESHOLD, best_match
+from .throttle import scheduler
 
-INVALID_CHARACTERS = re.compile(
-    r'''
-    [^        # ignore everything except
-    \w\s      # words and whitespace
-    \.\:\/    # periods, colons, slashes
-    \-\=      # hyphens, equal signs
-    ]''',
-    re.VERBOSE,
-    )
+PAGE_SIZE = 100  # the most tracks Spotify accepts per request
+PLAYLISTS_PAGE_SIZE = 50  # the most playlists Spotify lists per request
+PAGE_RETRIES = 2
+RETRY_STATUSES = (500, 502, 503, 504)
+CLIENT_RETRIES = 3  # server errors retried by each request's session
+CLIENT_BACKOFF = 0.3  # seconds, doubled after each further server error
+READ_AHEAD = 2  # tracks queued per search worker
+
+requests = LazyModule('requests')
+spotipy = LazyModule('spotipy')
+util = LazyModule('spotipy.util')
+urllib3_retry = LazyModule('urllib3.util.retry')
+
+searches = SingleFlight()
 
 
 def get_username(username=None):
@@ -25,6 +43,33 @@ def get_username(username=None):
     raise ValueError('No username specified or configured.')
 
 
+def build_session(retries=CLIENT_RETRIES, backoff=CLIENT_BACKOFF):
+    """Build a requests session for Spotipy that never retries a 429.
+
+    Spotipy's own session retries any 429 with a Retry-After header
+    inside the calling thread, out of the scheduler's sight. Here only
+    server errors are retried, so every 429 reaches the scheduler, which
+    pauses all callers. Once the server errors run out, the last one is
+    handed back as it is: left to urllib3, it would become a RetryError,
+    which Spotipy reports as a 429."""
+    session = requests.Session()
+    retry = urllib3_retry.Retry(
+        total=retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+        )
+    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 def build_client(username=None):
     """Build a Spotipy client scoped for use."""
     username = get_username(username)
@@ -32,70 +77,396 @@ def build_client(username=None):
         username,
         scope='playlist-modify-private playlist-modify-public',
         )
-    return spotipy.Spotify(auth=auth)
-
-
-def _format_query(string):
-    """Format the query string."""
-    return INVALID_CHARACTERS.sub('', string)
+    return spotipy.Spotify(
+        auth=auth,
+        requests_session=build_session(),
+        status_forcelist=RETRY_STATUSES,
+        )
 
 
 def _get_track_search_results(client, artist, title, album=None):
     """Return the Spotify track ID for the given track."""
-    artist = _format_query(artist)
-    title = _format_query(title)
-    album = _format_query(album) if album is not None else ''
+    artist = query_text(artist)
+    title = query_text(title)
     query = f'artist:"{artist}" track:"{title}"'
-    results = client.search(q=query)
+    with profiling.hooks.stage('search'):
+        results = searches.do(
+            query.lower(),  # Spotify's search ignores case
+            scheduler.call,
+            client.search,
+            q=query,
+            )
     if not results['tracks']['total']:
         return []
     return results['tracks']['items']
 
 
-def _result_sort_key(track, title, album):
-    """Provide a sort key for the returned Spotify tracks.
+def get_track_id(client, artist, title, album=None, cover_of=None,
+                 duration=None, cache=None, tiers=DEFAULT_TIERS,
+                 threshold=THRESHOLD):
+    """Return the Spotify track ID for the given track."""
+    if cache is None:
+        match = get_track_match(client, artist, title, album, cover_of,
+                                duration, tiers, threshold)
+        return match and match.id
+    key = track_key(artist, title, album, cover_of, tiers, threshold)
+    track_id = cache.get(key)
+    if track_id is MISSING:
+        match = get_track_match(client, artist, title, album, cover_of,
+                                duration, tiers, threshold)
+        track_id = match and match.id
+        cache.set(key, track_id)
+    return track_id
+
 
-    Orders by exact title match, then album matching."""
-    title_match = track['name'].lower().startswith(title.lower())
-    album = album if album is not None else ''
-    album_match = track['album']['name'].lower() == album.lower()
-    return (not title_match, not album_match)
+def get_track_match(client, artist, title, album=None, cover_of=None,
+                    duration=None, tiers=DEFAULT_TIERS, threshold=THRESHOLD):
+    """Search Spotify for the best-matching track.
 
+    Works down the query tiers, stopping at the first whose best result
+    scores at least the threshold. Returns a Match of the track ID and
+    its score, or None if no tier found a confident match."""
+    for tier, query_artist, query_title in rewrites(artist, title, cover_of,
+                                                    tiers):
+        results = _get_track_search_results(client, query_artist,
+                                            query_title)
+        match = best_match(results, query_artist, query_title, album,
+                           duration, threshold)
+        stats.record(tier, match)
+        if match is not None:
+            return match
+    return None
 
-def get_track_id(client, artist, title, album=None, cover_of=None):
-    """Return the Spotify track ID for the given track."""
-    results = _get_track_search_results(client, artist, title)
-    if not results and cover_of is not None:
-        results = _get_track_search_results(client, cover_of, title)
-    if not results:
-        return None
-    results = sorted(
-        results,
-        key=lambda track: _result_sort_key(track, title, album),
-        )
-    return results[0]['id']
-
-
-def create_playlist_from_parser(client, parser, public=False):
-    """Create a Spotify playlist for the given parsed episode."""
-    tracks = [get_track_id(client, **track) for track in parser['tracks']]
-    tracks = [track for track in tracks if track]
-    user = client.current_user()['id']
-    playlist = client.user_playlist_create(
-        user=user,
-        name=playlist_title(parser),
-        public=public,
-        description=playlist_description(parser),
+
+def resolve_track_ids(client, tracks, workers=1, cache=None, executor=None,
+                      tiers=DEFAULT_TIERS, threshold=THRESHOLD):
+    """Yield the Spotify track IDs for the given tracks, in order.
+
+    With more than one worker, searches run concurrently on a bounded
+    thread pool; results still line up with the incoming tracks. Passing
+    an executor shares its pool (and its limit) between episodes. Tracks
+    are read lazily, so they can be streamed from the parser."""
+    def resolve(track):
+        return get_track_id(client, cache=cache, tiers=tiers,
+                            threshold=threshold, **track)
+    window = READ_AHEAD * max(workers, 1)
+    if executor is not None:
+        yield from map_ahead(executor, resolve, tracks, window)
+        return
+    if workers <= 1:
+        yield from map(resolve, tracks)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from map_ahead(executor, resolve, tracks, window)
+
+
+def _pages(track_ids, page_size=PAGE_SIZE):
+    """Group the found track IDs into pages, skipping unmatched tracks."""
+    page = []
+    for track_id in track_ids:
+        if not track_id:
+            continue
+        page.append(track_id)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _add_page(client, user, playlist_id, page, position=None,
+              retries=PAGE_RETRIES):
+    """Add a single page of tracks to the playlist, retrying on failure.
+
+    Only server errors are retried; anything else, including a 429 the
+    scheduler has given up on, won't go better on another try. The
+    tracks are added at the end, or before the given position."""
+    placement = {} if position is None else {'position': position}
+    for attempt in range(retries + 1):
+        try:
+            return scheduler.call(
+                client.user_playlist_add_tracks,
+                user=user,
+                playlist_id=playlist_id,
+                tracks=page,
+                **placement,
+                )
+        except spotipy.SpotifyException as error:
+            if (error.http_status not in RETRY_STATUSES
+                    or attempt == retries):
+                raise
+
+
+def _writing(write_limit):
+    """Return the context to hold around a write, given a write limit."""
+    return contextlib.nullcontext() if write_limit is None else write_limit
+
+
+def add_tracks(client, user, playlist_id, track_ids, page_size=PAGE_SIZE,
+               progress=None, write_limit=None):
+    """Add the track IDs to the playlist a page at a time.
+
+    Each page is written as soon as it fills up, so a playlist grows
+    while the rest of its tracks are still being searched for. After
+    each page, progress (if given) is called with the number of track
+    IDs, matched or not, read since the page before. A write_limit
+    semaphore is held around each page written."""
+    read = 0
+
+    def counted():
+        nonlocal read
+        for track_id in track_ids:
+            read += 1
+            yield track_id
+    for page in _pages(counted(), page_size):
+        with _writing(write_limit), profiling.hooks.stage('write'):
+            _add_page(client, user, playlist_id, page)
+        if progress is not None:
+            progress(read)
+            read = 0
+
+
+def list_playlists(client, user):
+    """Return the IDs of the user's own playlists, by name.
+
+    Where names repeat, the first playlist listed is kept."""
+    playlist_ids = {}
+    offset = 0
+    while True:
+        playlists = scheduler.call(
+            client.user_playlists,
+            user,
+            limit=PLAYLISTS_PAGE_SIZE,
+            offset=offset,
+            )
+        for playlist in playlists['items']:
+            if playlist['owner']['id'] == user:
+                playlist_ids.setdefault(playlist['name'], playlist['id'])
+        if not playlists['next']:
+            return playlist_ids
+        offset += len(playlists['items'])
+
+
+class PlaylistIndex:
+    """The user's own playlists by name, listed once for a whole run.
+
+    Listing takes a request per 50 playlists, so rather than page through
+    them for every synced episode, they're listed at the first lookup and
+    the playlists the run creates are added as it goes."""
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def _playlists(self, user):
+        playlist_ids = self._users.get(user)
+        if playlist_ids is None:
+            playlist_ids = list_playlists(self._client, user)
+            self._users[user] = playlist_ids
+        return playlist_ids
+
+    def find(self, user, name):
+        """Return the ID of the user's playlist with the name, or None."""
+        with self._lock:
+            return self._playlists(user).get(name)
+
+    def add(self, user, name, playlist_id):
+        """Record a playlist created for the user."""
+        with self._lock:
+            self._playlists(user).setdefault(name, playlist_id)
+
+
+def get_playlist_track_ids(client, user, playlist_id):
+    """Return the IDs of the tracks in the playlist, in order.
+
+    Unavailable and local tracks have no ID, and are returned as None."""
+    track_ids = []
+    while True:
+        tracks = scheduler.call(
+            client.user_playlist_tracks,
+            user,
+            playlist_id,
+            fields='items(track(id)),next',
+            limit=PAGE_SIZE,
+            offset=len(track_ids),
+            )
+        track_ids += [item['track'] and item['track']['id']
+                      for item in tracks['items']]
+        if not tracks['next']:
+            return track_ids
+
+
+def playlist_edits(current, wanted):
+    """Return the edits that turn the current track IDs into the wanted.
+
+    Returns the positions to remove from the current playlist, and the
+    (position, track IDs) runs to insert afterwards, in order. Tracks
+    already in the right order are left alone; tracks out of place are
+    removed and inserted again where they belong. Tracks without an ID
+    (None) can't be removed, so they stay put and the rest are edited
+    around them."""
+    present = [position
+               for position, track_id in enumerate(current)
+               if track_id is not None]
+    matcher = difflib.SequenceMatcher(
+        None,
+        [current[position] for position in present],
+        wanted,
+        autojunk=False,
         )
-    client.user_playlist_add_tracks(
-        user=user,
-        playlist_id=playlist['id'],
-        tracks=tracks,
+    removals = []
+    runs = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('delete', 'replace'):
+            removals.extend(present[i1:i2])
+        if tag in ('insert', 'replace'):
+            runs.append((j1, wanted[j1:j2]))
+    # Count the tracks without IDs ahead of each track that's kept, so
+    # each run can be placed just before the kept track it precedes.
+    removed = set(removals)
+    skipped = []
+    unmovable = 0
+    for position, track_id in enumerate(current):
+        if track_id is None:
+            unmovable += 1
+        elif position not in removed:
+            skipped.append(unmovable)
+    skipped.append(unmovable)
+    insertions = []
+    inserted = 0
+    for position, run in runs:
+        insertions.append((position + skipped[position - inserted], run))
+        inserted += len(run)
+    return removals, insertions
+
+
+def _remove_positions(client, user, playlist_id, current, positions,
+                      page_size=PAGE_SIZE):
+    """Remove the tracks at the given positions, a page at a time.
+
+    The last positions go first, so earlier ones don't shift."""
+    positions = sorted(positions, reverse=True)
+    for start in range(0, len(positions), page_size):
+        occurrences = collections.defaultdict(list)
+        for position in positions[start:start + page_size]:
+            occurrences[current[position]].append(position)
+        scheduler.call(
+            client.user_playlist_remove_specific_occurrences_of_tracks,
+            user,
+            playlist_id,
+            [{'uri': track_id, 'positions': at}
+             for track_id, at in occurrences.items()],
+            )
+
+
+def sync_playlist(client, user, playlist_id, track_ids, page_size=PAGE_SIZE,
+                  write_limit=None):
+    """Make the playlist hold exactly the given track IDs, in order.
+
+    Only the tracks that differ are removed or added, so the writes made
+    grow with the size of the change rather than of the playlist. A
+    write_limit semaphore is held while they're made."""
+    current = get_playlist_track_ids(client, user, playlist_id)
+    removals, insertions = playlist_edits(current, track_ids)
+    with _writing(write_limit), profiling.hooks.stage('write'):
+        _remove_positions(client, user, playlist_id, current, removals,
+                          page_size)
+        for position, run in insertions:
+            for start in range(0, len(run), page_size):
+                _add_page(client, user, playlist_id,
+                          run[start:start + page_size],
+                          position=position + start)
+
+
+def create_playlist_from_parser(client, parser, public=False, workers=1,
+                                cache=None, executor=None,
+                                tiers=DEFAULT_TIERS, threshold=THRESHOLD,
+                                checkpoint=None, sync=False, playlists=None,
+                                write_limit=None):
+    """Create a Spotify playlist for the given parsed episode.
+
+    Given a journal Checkpoint, the playlist and the tracks written to it
+    are recorded as they happen; if the checkpoint already has a
+    playlist, it's added to from the first unwritten track instead. With
+    sync=True, an existing playlist of the same name is brought up to
+    date in place of creating another; pass a PlaylistIndex to share one
+    listing of the user's playlists between episodes. A write_limit
+    semaphore is held around each call that changes a playlist, but not
+    while its tracks are searched for. Returns the ID of the playlist."""
+    user = scheduler.call(client.current_user)['id']
+    resolve = functools.partial(
+        resolve_track_ids,
+        client,
+        workers=workers,
+        cache=cache,
+        executor=executor,
+        tiers=tiers,
+        threshold=threshold,
         )
+    resuming = checkpoint is not None and checkpoint.playlist_id is not None
+    if sync and playlists is None:
+        playlists = PlaylistIndex(client)
+    if sync and not resuming:
+        playlist_id = playlists.find(user, playlist_title(parser))
+        if playlist_id is not None:
+            track_ids = [track_id
+                         for track_id in resolve(parser['tracks'])
+                         if track_id]
+            sync_playlist(client, user, playlist_id, track_ids,
+                          write_limit=write_limit)
+            if checkpoint is not None:
+                checkpoint.playlist_id = playlist_id
+                checkpoint.finished()
+            return playlist_id
+    if resuming:
+        playlist_id = checkpoint.playlist_id
+    else:
+        with _writing(write_limit), profiling.hooks.stage('create'):
+            playlist_id = scheduler.call(
+                client.user_playlist_create,
+                user=user,
+                name=playlist_title(parser),
+                public=public,
+                description=playlist_description(parser),
+                )['id']
+        if checkpoint is not None:
+            checkpoint.created(playlist_id)
+        if sync:
+            playlists.add(user, playlist_title(parser), playlist_id)
+    tracks = parser['tracks']
+    if checkpoint is not None:
+        tracks = itertools.islice(tracks, checkpoint.position, None)
+    tracks = resolve(tracks)
+    progress = checkpoint.wrote if checkpoint is not None else None
+    add_tracks(client, user, playlist_id, tracks, progress=progress,
+               write_limit=write_limit)
+    if checkpoint is not None:
+        checkpoint.finished()
+    return playlist_id
+
 
+def create_playlist(client, url, public=False, workers=1, cache=None,
+                    pages=None, episodes=None, tiers=DEFAULT_TIERS,
+                    threshold=THRESHOLD, sync=False):
+    """Create a Spotify playlist for the given URL.
 
-def create_playlist(client, url, public=False):
-    """Create a Spotify playlist for the given URL."""
-    domain, html = retrieve_episode(url)
-    parser = parse_episode(domain, html)
-    create_playlist_from_parser(client, parser, public=public)
+    With sync=True, the episode's existing playlist is updated instead,
+    if it has one. Returns the ID of the playlist."""
+    token = profiling.current_url.set(url)
+    try:
+        domain, html = retrieve_episode(url, pages=pages)
+        parser = parse_episode(domain, html, stream=True, url=url,
+                               episodes=episodes)
+        return create_playlist_from_parser(
+            client,
+            parser,
+            public=public,
+            workers=workers,
+            cache=cache,
+            tiers=tiers,
+            threshold=threshold,
+            sync=sync,
+            )
+    finally:
+        profiling.current_url.reset(token)
@@ -0,0 +1,41 @@
+import collections
+import threading
+
+
+class Tally:
+    """Count the events recorded under each key, and how many were marked.
+
+    Subclasses name the three figures reported for each key in FIELDS:
+    the count of events, the count marked, and the share marked."""
+
+    FIELDS = ('count', 'marked', 'rate')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+        self._marked = collections.Counter()
+
+    def record(self, key, marked):
+        """Record an event under the key, and whether it was marked."""
+        with self._lock:
+            self._counts[key] += 1
+            self._marked[key] += bool(marked)
+
+    def report(self):
+        """Return the counts and rate of each key recorded."""
+        count, marked, rate = self.FIELDS
+        with self._lock:
+            return {
+                key: {
+                    count: total,
+                    marked: self._marked[key],
+                    rate: self._marked[key] / total,
+                    }
+                for key, total in self._counts.items()
+                }
+
+    def reset(self):
+        """Forget every recorded event."""
+        with self._lock:
+            self._counts.clear()
+            self._marked.clear()
@@ -0,0 +1,106 @@
+import random
+import threading
+import time
+from .lazy import LazyModule
+
+TOO_MANY_REQUESTS = 429
+
+spotipy = LazyModule('spotipy')
+
+
+def retry_after(error):
+    """Return the seconds a 429 response asked us to wait, if it said."""
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    """A token bucket that every Spotify API call goes through.
+
+    One scheduler is shared by all threads, so the total request rate
+    stays steady however many workers are searching. When Spotify
+    answers 429, every caller pauses for its Retry-After (or a jittered
+    exponential backoff), and the rate is halved; each success then
+    nudges the rate back up towards its ceiling."""
+
+    def __init__(self, rate=10.0, burst=10, min_rate=0.5, increase=0.1,
+                 retries=5, backoff=1.0, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.retries = retries
+        self.backoff = backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = clock()
+        self._paused_until = 0
+
+    def _refill(self, now):
+        """Add the tokens earned since the last update."""
+        elapsed = max(now - self._updated, 0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent, then spend its token."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def throttled(self, delay):
+        """Pause every caller for the delay and halve the request rate."""
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until,
+                self._clock() + delay,
+                )
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def succeeded(self):
+        """Recover some of the request rate after a successful call."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def delay(self, error, attempt):
+        """Return how long to wait before retrying a throttled call."""
+        delay = retry_after(error)
+        if delay is None:
+            delay = self.backoff * 2 ** attempt
+        return delay + random.uniform(0, self.backoff)
+
+    def call(self, function, *args, **kwargs):
+        """Call the Spotify API function once the scheduler allows it.
+
+        Calls throttled with a 429 are retried up to `retries` times."""
+        for attempt in range(self.retries + 1):
+            self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except spotipy.SpotifyException as error:
+                throttled = error.http_status == TOO_MANY_REQUESTS
+                if not throttled or attempt == self.retries:
+                    raise
+                self.throttled(self.delay(error, attempt))
+                continue
+            self.succeeded()
+            return result
+
+
+scheduler = Scheduler()
@@ -0,0 +1,173 @@
+import datetime
+import os
+import pytest
+from spin2spot import cache
+
+cache_dir = cache.cache_dir  # unpatched
+
+
+@pytest.fixture
+def track_cache(tmp_path):
+    return cache.TrackCache(str(tmp_path / 'tracks.sqlite'))
+
+
+class TestCacheDir:
+    def test_uses_environment_directory(self, mock_os):
+        mock_os.get.return_value = '/tmp/spin2spot'
+        assert cache_dir() == '/tmp/spin2spot'
+
+    def test_defaults_to_home_directory(self, mock_os):
+        mock_os.get.return_value = None
+        expected = os.path.join('.cache', 'spin2spot')
+        assert cache_dir().endswith(expected)
+
+
+class TestTrackKey:
+    def test_normalizes_case_and_whitespace(self):
+        key = cache.track_key('  The  Courtneys', 'LOST BOYS')
+        assert key == cache.track_key('the courtneys', 'lost boys')
+
+    def test_distinguishes_albums(self):
+        key = cache.track_key('The Courtneys', 'Lost Boys', 'Lost Boys')
+        assert key != cache.track_key('The Courtneys', 'Lost Boys')
+
+    def test_distinguishes_thresholds(self):
+        key = cache.track_key('The Courtneys', 'Lost Boys', threshold=0.95)
+        assert key != cache.track_key('The Courtneys', 'Lost Boys')
+
+    def test_distinguishes_tiers(self):
+        key = cache.track_key('The Courtneys', 'Lost Boys', tiers=('exact',))
+        assert key != cache.track_key('The Courtneys', 'Lost Boys')
+
+    def test_distinguishes_scoring_versions(self, mocker):
+        key = cache.track_key('The Courtneys', 'Lost Boys')
+        mocker.patch('spin2spot.cache.SCORING_VERSION', 2)
+        assert key != cache.track_key('The Courtneys', 'Lost Boys')
+
+
+class TestTrackCache:
+    def test_defaults_to_cache_directory(self, tmp_path):
+        cache.TrackCache()
+        assert (tmp_path / 'tracks.sqlite').exists()
+
+    def test_returns_missing_for_unknown_keys(self, track_cache):
+        assert track_cache.get('key') is cache.MISSING
+
+    def test_returns_cached_hits(self, track_cache):
+        track_cache.set('key', 'id')
+        assert track_cache.get('key') == 'id'
+
+    def test_returns_cached_misses(self, track_cache):
+        track_cache.set('key', None)
+        assert track_cache.get('key') is None
+
+    def test_persists_between_connections(self, tmp_path, track_cache):
+        track_cache.set('key', 'id')
+        track_cache.close()
+        reopened = cache.TrackCache(str(tmp_path / 'tracks.sqlite'))
+        assert reopened.get('key') == 'id'
+
+    @pytest.mark.parametrize('track_id, ttl', [
+        ('id', 'hit_ttl'),
+        (None, 'miss_ttl'),
+        ])
+    def test_expires_entries(self, track_cache, track_id, ttl):
+        setattr(track_cache, ttl, 0)
+        track_cache.set('key', track_id)
+        assert track_cache.get('key') is cache.MISSING
+
+    def test_evicts_expired_entries(self, track_cache):
+        track_cache.miss_ttl = 0
+        track_cache.set('key', None)
+        track_cache.evict()
+        assert len(track_cache) == 0
+
+    def test_evicts_oldest_entries(self, track_cache):
+        track_cache.max_entries = 2
+        for key in ['a', 'b', 'c']:
+            track_cache.set(key, key)
+        track_cache.evict()
+        assert len(track_cache) == 2
+        assert track_cache.get('a') is cache.MISSING
+
+    def test_clears_entries(self, track_cache):
+        track_cache.set('key', 'id')
+        track_cache.clear()
+        assert track_cache.get('key') is cache.MISSING
+
+
+class TestPageCache:
+    @pytest.fixture
+    def pages(self, tmp_path):
+        return cache.PageCache(str(tmp_path / 'pages.sqlite'))
+
+    def test_defaults_to_cache_directory(self, tmp_path):
+        cache.PageCache()
+        assert (tmp_path / 'pages.sqlite').exists()
+
+    def test_returns_none_for_unknown_urls(self, pages):
+        assert pages.get('url') is None
+
+    def test_returns_cached_pages(self, pages):
+        pages.set('url', '"abc"', 'Tue, 10 Nov 2015', b'html')
+        assert pages.get('url') == cache.Page('"abc"', 'Tue, 10 Nov 2015',
+                                              b'html')
+
+    def test_evicts_oldest_pages(self, pages):
+        pages.max_entries = 1
+        pages.set('old', '"a"', None, b'html')
+        pages.set('new', '"b"', None, b'html')
+        pages.evict()
+        assert pages.get('old') is None
+        assert len(pages) == 1
+
+
+class TestMarkCache:
+    @pytest.fixture
+    def marks(self, tmp_path):
+        return cache.MarkCache(str(tmp_path / 'marks.sqlite'))
+
+    def test_defaults_to_zero(self, marks):
+        assert marks.get('archive') == 0
+
+    def test_returns_stored_marks(self, marks):
+        marks.set('archive', 50067)
+        marks.set('archive', 50070)
+        assert marks.get('archive') == 50070
+        assert marks.get('other') == 0
+
+
+class TestEpisodeCache:
+    @pytest.fixture
+    def episodes(self, tmp_path):
+        return cache.EpisodeCache(str(tmp_path / 'episodes.sqlite'))
+
+    @pytest.fixture
+    def episode(self):
+        return {
+            'title': 'Ruckus Radio',
+            'station': 'KWVA',
+            'dj': 'Ruckus the Red',
+            'datetime': datetime.datetime(2015, 11, 10, 11, 0),
+            'tracks': [{'artist': 'The Courtneys', 'title': 'Lost Boys',
+                        'album': 'II'}],
+            }
+
+    def test_returns_cached_episodes(self, episodes, episode):
+        episodes.set('url', 'digest', 1, episode)
+        assert episodes.get('url', 'digest', 1) == episode
+
+    def test_misses_changed_content(self, episodes, episode):
+        episodes.set('url', 'digest', 1, episode)
+        assert episodes.get('url', 'other', 1) is None
+        assert episodes.get('other', 'digest', 1) is None
+
+    def test_misses_other_parser_versions(self, episodes, episode):
+        episodes.set('url', 'digest', 1, episode)
+        assert episodes.get('url', 'digest', 2) is None
+
+    def test_keeps_latest_content_per_url(self, episodes, episode):
+        episodes.set('url', 'digest', 1, episode)
+        episodes.set('url', 'newer', 1, dict(episode, title='New'))
+        assert len(episodes) == 1
+        assert episodes.get('url', 'newer', 1)['title'] == 'New'
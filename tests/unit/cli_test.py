@@ -1,5 +1,30 @@
+import io
 import pytest
 from spin2spot import cli
+from spin2spot import queries
+from spin2spot import scoring
+
+
+class TestReadURLs:
+    @pytest.fixture
+    def url_file(self, tmp_path):
+        path = tmp_path / 'urls.txt'
+        path.write_text('url2\n\n# a comment\n  url3  \nurl1\n')
+        return str(path)
+
+    def test_reads_files_after_urls(self, url_file):
+        urls = cli.read_urls(['url1'], [url_file])
+        assert list(urls) == ['url1', 'url2', 'url3']
+
+    def test_reads_stdin(self, mocker):
+        mocker.patch('spin2spot.cli.sys.stdin', io.StringIO('url1\nurl2\n'))
+        assert list(cli.read_urls([], ['-'])) == ['url1', 'url2']
+
+    def test_reads_lazily(self, mocker):
+        lines = mocker.patch('spin2spot.cli._lines')
+        urls = cli.read_urls(['url1'], ['urls.txt'])
+        assert next(urls) == 'url1'
+        lines.assert_not_called()
 
 
 class TestParseArgs:
@@ -13,12 +38,74 @@ class TestParseArgs:
         ])
     def test_parses_urls(self, parse, urls):
         args = urls
-        assert parse(args)['urls'] == urls
+        assert list(parse(args)['urls']) == urls
 
     def test_requires_urls(self, parse):
         with pytest.raises(SystemExit):
             parse([])
 
+    @pytest.mark.parametrize('flag', ['-f', '--file'])
+    def test_parses_url_files(self, parse, flag, mocker, tmp_path):
+        read = mocker.patch('spin2spot.cli.read_urls')
+        path = tmp_path / 'a.txt'
+        path.write_text('url\n')
+        params = parse([flag, str(path), flag, '-', 'url'])
+        read.assert_called_once_with(['url'], [str(path), '-'])
+        assert params['urls'] == read.return_value
+        assert 'files' not in params
+
+    @pytest.mark.parametrize('flag', ['-a', '--archive'])
+    def test_parses_archives(self, parse, flag):
+        archives = ['https://spinitron.com/WZBC/show/1',
+                    'https://wkdu.org/program/show']
+        params = parse([flag, archives[0], flag, archives[1]])
+        assert params['archives'] == archives
+        assert list(params['urls']) == []
+
+    @pytest.mark.parametrize('archive', [
+        'https://wprb.com/playlists/recentplaylists/',
+        'archive',
+        ])
+    def test_refuses_unsupported_archives(self, parse, archive, capsys):
+        with pytest.raises(SystemExit):
+            parse(['--archive', archive])
+        assert 'Cannot crawl archives on' in capsys.readouterr().err
+
+    def test_defaults_to_no_archives(self, parse):
+        args = ['url']
+        assert parse(args)['archives'] == []
+
+    def test_accepts_only_url_files(self, parse, tmp_path):
+        path = tmp_path / 'urls.txt'
+        path.write_text('url\n')
+        assert parse(['--file', str(path)])['urls'] is not None
+
+    def test_refuses_missing_url_files(self, parse, tmp_path, capsys):
+        path = str(tmp_path / 'missing.txt')
+        with pytest.raises(SystemExit):
+            parse(['--file', path, 'url'])
+        assert f"can't open '{path}'" in capsys.readouterr().err
+
+    def test_reads_url_files_lazily(self, parse, tmp_path, mocker):
+        path = tmp_path / 'urls.txt'
+        path.write_text('url\n')
+        lines = mocker.patch('spin2spot.cli._lines')
+        parse(['--file', str(path)])
+        lines.assert_not_called()
+
+    @pytest.mark.parametrize('flag', ['-j', '--jobs'])
+    def test_parses_jobs(self, parse, flag):
+        args = [flag, '8', 'url']
+        assert parse(args)['jobs'] == 8
+
+    def test_defaults_to_pipeline_jobs(self, parse):
+        args = ['url']
+        assert parse(args)['jobs'] is None
+
+    def test_refuses_no_jobs(self, parse):
+        with pytest.raises(SystemExit):
+            parse(['--jobs', '0', 'url'])
+
     @pytest.mark.parametrize('flag', ['-p', '--public'])
     def test_parses_public(self, parse, flag):
         args = ['url', flag]
@@ -36,3 +123,84 @@ class TestParseArgs:
     def test_defaults_username_as_none(self, parse):
         args = ['url']
         assert parse(args)['username'] is None
+
+    @pytest.mark.parametrize('flag', ['-w', '--workers'])
+    def test_parses_workers(self, parse, flag):
+        args = [flag, '8', 'url']
+        assert parse(args)['workers'] == 8
+
+    def test_defaults_to_one_worker(self, parse):
+        args = ['url']
+        assert parse(args)['workers'] == 1
+
+    def test_refuses_no_workers(self, parse):
+        with pytest.raises(SystemExit):
+            parse(['--workers', '0', 'url'])
+
+    def test_parses_no_cache(self, parse):
+        args = ['--no-cache', 'url']
+        assert parse(args)['use_cache'] is False
+
+    def test_defaults_to_using_cache(self, parse):
+        args = ['url']
+        assert parse(args)['use_cache'] is True
+
+    def test_parses_clear_cache(self, parse):
+        args = ['--clear-cache', 'url']
+        assert parse(args)['clear_cache'] is True
+
+    def test_parses_tiers(self, parse):
+        args = ['--tiers', 'exact', 'version', '--', 'url']
+        assert parse(args)['tiers'] == ['exact', 'version']
+
+    def test_defaults_to_every_tier(self, parse):
+        args = ['url']
+        assert parse(args)['tiers'] == queries.DEFAULT_TIERS
+
+    def test_refuses_unknown_tiers(self, parse):
+        with pytest.raises(SystemExit):
+            parse(['--tiers', 'guess', '--', 'url'])
+
+    def test_parses_threshold(self, parse):
+        args = ['--threshold', '0.8', 'url']
+        assert parse(args)['threshold'] == 0.8
+
+    def test_defaults_to_scoring_threshold(self, parse):
+        args = ['url']
+        assert parse(args)['threshold'] == scoring.THRESHOLD
+
+    def test_parses_stats(self, parse):
+        args = ['--stats', 'url']
+        assert parse(args)['show_stats'] is True
+
+    def test_parses_profile(self, parse):
+        args = ['--profile', 'profile.json', 'url']
+        assert parse(args)['profile'] == 'profile.json'
+
+    def test_defaults_to_not_profiling(self, parse):
+        args = ['url']
+        assert parse(args)['profile'] is None
+
+    def test_parses_resume(self, parse):
+        args = ['--resume', 'url']
+        assert parse(args)['resume'] is True
+
+    def test_defaults_to_starting_over(self, parse):
+        args = ['url']
+        assert parse(args)['resume'] is False
+
+    def test_parses_journal(self, parse):
+        args = ['--journal', 'run.jsonl', 'url']
+        assert parse(args)['journal'] == 'run.jsonl'
+
+    def test_defaults_to_no_journal(self, parse):
+        args = ['url']
+        assert parse(args)['journal'] is None
+
+    def test_parses_sync(self, parse):
+        args = ['--sync', 'url']
+        assert parse(args)['sync'] is True
+
+    def test_defaults_to_new_playlists(self, parse):
+        args = ['url']
+        assert parse(args)['sync'] is False
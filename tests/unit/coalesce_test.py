@@ -0,0 +1,55 @@
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from spin2spot import coalesce
+
+
+@pytest.fixture
+def flight():
+    return coalesce.SingleFlight()
+
+
+class TestSingleFlight:
+    def test_returns_result(self, flight):
+        function = MagicMock(return_value='result')
+        assert flight.do('key', function, 1, q='query') == 'result'
+        function.assert_called_once_with(1, q='query')
+
+    def test_shares_calls_in_flight(self, flight, future_waiters):
+        started = threading.Event()
+        release = threading.Event()
+
+        def search():
+            started.set()
+            release.wait(5)
+            return 'result'
+        function = MagicMock(side_effect=search)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            leader = executor.submit(flight.do, 'key', function)
+            started.wait(5)
+            followers = [executor.submit(flight.do, 'key', function)
+                         for _ in range(3)]
+            future_waiters.wait_for(3)
+            release.set()
+            results = [future.result() for future in [leader] + followers]
+        assert results == ['result'] * 4
+        assert function.call_count == 1
+
+    def test_separates_keys(self, flight):
+        function = MagicMock(side_effect=['a', 'b'])
+        assert flight.do('a', function) == 'a'
+        assert flight.do('b', function) == 'b'
+
+    def test_calls_again_once_finished(self, flight):
+        function = MagicMock(return_value='result')
+        flight.do('key', function)
+        flight.do('key', function)
+        assert function.call_count == 2
+        assert len(flight) == 0
+
+    def test_shares_errors(self, flight):
+        function = MagicMock(side_effect=ValueError)
+        with pytest.raises(ValueError):
+            flight.do('key', function)
+        assert len(flight) == 0
@@ -0,0 +1,124 @@
+import pytest
+from spin2spot import cache
+from spin2spot import crawler
+from spin2spot.pipeline import Result
+
+
+def archive_page(numbers, next_url=None):
+    links = ''.join(
+        f'<li><a href="/WZBC/pl/{number}/Show">Episode {number}</a></li>'
+        for number in numbers
+        )
+    pager = f'<li class="next"><a href="{next_url}">Next</a></li>' \
+        if next_url else ''
+    return f'<html><body><ul>{links}</ul><ul>{pager}</ul></body></html>'
+
+
+@pytest.fixture
+def marks(tmp_path):
+    return cache.MarkCache(str(tmp_path / 'marks.sqlite'))
+
+
+class TestEpisodeLinks:
+    @pytest.mark.parametrize('page_url, href, expected', [
+        ('https://spinitron.com/WZBC/show/1191/7DayWknd',
+         '/WZBC/pl/50067/7DayWknd',
+         'https://spinitron.com/WZBC/pl/50067'),
+        ('http://spinitron.com/radio/playlist.php?station=kwva&showid=6435',
+         'playlist.php?station=kwva&playlist=20955&merch=song&id=481524',
+         'https://spinitron.com/radio/playlist.php?station=kwva'
+         '&playlist=20955'),
+        ('https://wkdu.org/program/new-matt-show',
+         '/playlist/32880',
+         'https://wkdu.org/playlist/32880'),
+        ])
+    def test_finds_episode_links(self, page_url, href, expected):
+        html = f'<a href="{href}">Episode</a>'
+        links = crawler.episode_links(page_url, html)
+        assert [link.url for link in links] == [expected]
+
+    def test_skips_other_links(self):
+        html = ('<a href="/WZBC/show/1191/7DayWknd">Show</a>'
+                '<a href="playlist.php?station=kwva&playlist=current">Now</a>')
+        url = 'https://spinitron.com/radio/playlist.php?station=kwva'
+        assert crawler.episode_links(url, html) == []
+
+    def test_lists_each_episode_once(self):
+        html = archive_page([3, 2, 3])
+        links = crawler.episode_links('https://spinitron.com/WZBC', html)
+        assert [link.number for link in links] == [3, 2]
+
+
+class TestNextPage:
+    @pytest.mark.parametrize('html', [
+        '<link rel="next" href="?page=2">',
+        '<ul><li class="pager-next"><a href="?page=2">›</a></li></ul>',
+        '<a href="?page=2">Older posts</a>',
+        '<a href="?page=2">»</a>',
+        ])
+    def test_finds_next_page(self, html):
+        url = 'https://wkdu.org/program/show'
+        assert crawler.next_page(url, html) == f'{url}?page=2'
+
+    def test_returns_none_on_last_page(self):
+        assert crawler.next_page('https://wkdu.org', archive_page([1])) is None
+
+
+class TestCrawl:
+    @pytest.fixture
+    def pages(self, mocker):
+        pages = {
+            'https://spinitron.com/WZBC/show/1': archive_page(
+                [9, 8, 7], 'https://spinitron.com/WZBC/show/1?page=2'),
+            'https://spinitron.com/WZBC/show/1?page=2': archive_page(
+                [6, 5, 4], 'https://spinitron.com/WZBC/show/1?page=3'),
+            'https://spinitron.com/WZBC/show/1?page=3': archive_page(
+                [3, 2, 1]),
+            }
+        patch = mocker.patch('spin2spot.crawler.retrieve_episode_html')
+        patch.side_effect = pages.__getitem__
+        return patch
+
+    def test_returns_every_episode_oldest_first(self, pages):
+        episodes = crawler.crawl('https://spinitron.com/WZBC/show/1')
+        assert [episode.number for episode in episodes] == list(range(1, 10))
+        assert episodes[0].url == 'https://spinitron.com/WZBC/pl/1'
+
+    def test_stops_at_high_water_mark(self, pages):
+        episodes = crawler.crawl('https://spinitron.com/WZBC/show/1', since=7)
+        assert [episode.number for episode in episodes] == [8, 9]
+        assert pages.call_count == 2
+
+    def test_limits_pages(self, pages):
+        episodes = crawler.crawl('https://spinitron.com/WZBC/show/1',
+                                 max_pages=1)
+        assert [episode.number for episode in episodes] == [7, 8, 9]
+
+    def test_refuses_unsupported_archives(self, pages):
+        with pytest.raises(ValueError):
+            crawler.crawl('https://wprb.com/playlists/recentplaylists/')
+        pages.assert_not_called()
+
+
+class TestAdvance:
+    @pytest.fixture
+    def episodes(self):
+        return [crawler.EpisodeLink(f'url{number}', number)
+                for number in (4, 5, 6)]
+
+    def test_moves_past_processed_episodes(self, marks, episodes):
+        results = [Result(episode.url, 'playlist', None)
+                   for episode in episodes]
+        assert crawler.advance(marks, 'archive', episodes, results) == 6
+        assert marks.get('archive') == 6
+
+    def test_stops_before_failures(self, marks, episodes):
+        marks.set('archive', 3)
+        results = [Result('url4', 'playlist', None),
+                   Result('url5', None, ValueError()),
+                   Result('url6', 'playlist', None)]
+        assert crawler.advance(marks, 'archive', episodes, results) == 4
+
+    def test_keeps_mark_without_episodes(self, marks):
+        marks.set('archive', 3)
+        assert crawler.advance(marks, 'archive', [], []) == 3
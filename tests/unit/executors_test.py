@@ -0,0 +1,33 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from spin2spot import executors
+
+current = contextvars.ContextVar('current', default=None)
+
+
+class TestMapAhead:
+    def test_yields_results_in_order(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = executors.map_ahead(executor, lambda x: x * 2,
+                                          range(10), 3)
+            assert list(results) == [x * 2 for x in range(10)]
+
+    def test_reads_only_window_ahead(self):
+        read = []
+
+        def items():
+            for item in range(10):
+                read.append(item)
+                yield item
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = executors.map_ahead(executor, str, items(), 3)
+            assert next(results) == '0'
+            assert read == [0, 1, 2]
+            results.close()
+
+    def test_runs_in_callers_context(self):
+        current.set('caller')
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            results = executors.map_ahead(executor, lambda _: current.get(),
+                                          [1, 2], 1)
+            assert list(results) == ['caller', 'caller']
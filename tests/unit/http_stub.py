@@ -0,0 +1,71 @@
+import contextlib
+import http.server
+import json
+import threading
+
+
+def error(status, message='Stub error'):
+    """Return a response in the shape of a Spotify API error."""
+    return status, {'error': {'status': status, 'message': message}}
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """Answer every request with the next of the queued responses.
+
+    Each response is a (status, JSON body) pair; the last one is repeated
+    once the others are used up. Requests are recorded as (method, path)
+    pairs."""
+
+    daemon_threads = True
+
+    def __init__(self, responses):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self._responses = list(responses)
+        self._lock = threading.Lock()
+        self.requests = []
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'http://{host}:{port}'
+
+    def respond(self, method, path):
+        """Record the request and return the response to send."""
+        with self._lock:
+            self.requests.append((method, path))
+            if len(self._responses) > 1:
+                return self._responses.pop(0)
+            return self._responses[0]
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        status, body = self.server.respond(self.command, self.path)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve(*responses):
+    """Run a StubServer with the responses on a background thread."""
+    server = StubServer(responses)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
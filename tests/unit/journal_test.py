@@ -0,0 +1,85 @@
+import json
+import pytest
+from spin2spot import journal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'journal.jsonl')
+
+
+def entries(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+class TestJournal:
+    def test_defaults_to_cache_directory(self, tmp_path):
+        journal.Journal().close()
+        assert (tmp_path / 'journal.jsonl').exists()
+
+    def test_records_progress(self, path):
+        with journal.Journal(path) as log:
+            checkpoint = log.checkpoint('url')
+            checkpoint.created('playlist')
+            checkpoint.wrote(100)
+            checkpoint.wrote(20)
+            checkpoint.finished()
+        assert entries(path) == [
+            {'event': 'created', 'url': 'url', 'playlist_id': 'playlist'},
+            {'event': 'wrote', 'url': 'url', 'position': 100},
+            {'event': 'wrote', 'url': 'url', 'position': 120},
+            {'event': 'finished', 'url': 'url', 'playlist_id': 'playlist'},
+            ]
+
+    def test_starts_over_without_resume(self, path):
+        with journal.Journal(path) as log:
+            log.checkpoint('url').created('playlist')
+        with journal.Journal(path) as log:
+            assert log.checkpoint('url').playlist_id is None
+        assert entries(path) == []
+
+    def test_resumes_finished_urls(self, path):
+        with journal.Journal(path) as log:
+            checkpoint = log.checkpoint('url')
+            checkpoint.created('playlist')
+            checkpoint.finished()
+        with journal.Journal(path, resume=True) as log:
+            assert log.finished('url') == 'playlist'
+            assert log.finished('other') is None
+
+    def test_resumes_partial_episodes(self, path):
+        with journal.Journal(path) as log:
+            checkpoint = log.checkpoint('url')
+            checkpoint.created('playlist')
+            checkpoint.wrote(100)
+        with journal.Journal(path, resume=True) as log:
+            checkpoint = log.checkpoint('url')
+            assert (checkpoint.playlist_id, checkpoint.position) == (
+                'playlist', 100)
+            checkpoint.wrote(50)
+        assert entries(path)[-1]['position'] == 150
+
+    def test_resumes_missing_journal(self, path):
+        with journal.Journal(path, resume=True) as log:
+            assert log.checkpoint('url').playlist_id is None
+
+    def test_ignores_truncated_lines(self, path):
+        with journal.Journal(path) as log:
+            log.checkpoint('url').created('playlist')
+        with open(path, 'a') as file:
+            file.write('{"event": "wrote", "url"')
+        with journal.Journal(path, resume=True) as log:
+            assert log.checkpoint('url').position == 0
+
+    def test_appends_after_truncated_lines(self, path):
+        with journal.Journal(path) as log:
+            log.checkpoint('url').created('playlist')
+        with open(path, 'a') as file:
+            file.write('{"event": "created", "url": "other", "playl')
+        with journal.Journal(path, resume=True) as log:
+            log.checkpoint('new').created('new playlist')
+        with journal.Journal(path, resume=True) as log:
+            assert log.checkpoint('new').playlist_id == 'new playlist'
+            assert log.checkpoint('url').playlist_id == 'playlist'
+        assert len(entries(path)) == 2
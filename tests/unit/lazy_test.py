@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import pytest
+import spin2spot
+from spin2spot import lazy
+from spin2spot import spotify
+
+
+@pytest.fixture
+def module():
+    return lazy.LazyModule('json')
+
+
+class TestLazyModule:
+    def test_imports_on_first_use(self, mocker, module):
+        spy = mocker.spy(lazy.importlib, 'import_module')
+        assert '(not loaded)' in repr(module)
+        assert module.dumps([]) == '[]'
+        assert module.loads('[]') == []
+        spy.assert_called_once_with('json')
+        assert '(loaded)' in repr(module)
+
+    def test_sets_attributes_on_module(self, module):
+        import json
+        module.answer = 42
+        assert json.answer == 42
+        del module.answer
+        assert not hasattr(json, 'answer')
+
+    def test_surfaces_missing_modules(self):
+        with pytest.raises(ImportError):
+            lazy.LazyModule('spin2spot.missing').anything
+
+
+class TestPackage:
+    def test_exports_client_functions(self):
+        assert spin2spot.build_client is spotify.build_client
+        assert spin2spot.create_playlist is spotify.create_playlist
+
+    def test_refuses_unknown_attributes(self):
+        with pytest.raises(AttributeError):
+            spin2spot.missing
+
+    def test_cli_defers_heavy_imports(self):
+        root = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+        code = ('import sys, spin2spot.__main__; '
+                'print(" ".join(sorted(sys.modules)))')
+        output = subprocess.check_output(
+            [sys.executable, '-c', code],
+            cwd=root,
+            universal_newlines=True,
+            )
+        modules = {name.split('.')[0] for name in output.split()}
+        heavy = {'asyncio', 'bs4', 'dateutil', 'lxml', 'requests', 'spotipy'}
+        assert not modules & heavy
@@ -1,11 +1,20 @@
+import json
 import pytest
 from spin2spot import __main__ as main
+from spin2spot import crawler
+from spin2spot import profiling
+from spin2spot import queries
+from spin2spot import scoring
+from spin2spot.pipeline import Result
 
 
 class TestRunModule:
     @pytest.fixture(autouse=True)
-    def mock_create(self, mocker):
-        patch = mocker.patch('spin2spot.__main__.create_playlist')
+    def mock_process(self, mocker):
+        def process(client, urls, **kwargs):
+            return [Result(url, 'playlist', None) for url in urls]
+        patch = mocker.patch('spin2spot.__main__.process_episodes')
+        patch.side_effect = process
         return patch
 
     @pytest.fixture(autouse=True)
@@ -13,14 +22,157 @@ class TestRunModule:
         patch = mocker.patch('builtins.print')
         return patch
 
-    def test_creates_playlists_correctly(self, mock_create, mock_client):
+    @pytest.fixture(autouse=True)
+    def mock_cache(self, mocker):
+        patch = mocker.patch('spin2spot.__main__.TrackCache')
+        return patch
+
+    @pytest.fixture(autouse=True)
+    def mock_pages(self, mocker):
+        patch = mocker.patch('spin2spot.__main__.PageCache')
+        return patch
+
+    @pytest.fixture(autouse=True)
+    def mock_episodes(self, mocker):
+        patch = mocker.patch('spin2spot.__main__.EpisodeCache')
+        return patch
+
+    @pytest.fixture(autouse=True)
+    def mock_journal(self, mocker):
+        patch = mocker.patch('spin2spot.__main__.Journal')
+        return patch
+
+    def test_creates_playlists_correctly(self, mock_process, mock_client,
+                                         mock_cache, mock_pages,
+                                         mock_episodes, mock_journal):
         main.run_module(['url'])
-        mock_create.assert_called_with(mock_client, 'url', public=False)
+        mock_process.assert_called_with(
+            mock_client,
+            ['url'],
+            public=False,
+            cache=mock_cache.return_value,
+            pages=mock_pages.return_value,
+            episodes=mock_episodes.return_value,
+            tiers=queries.DEFAULT_TIERS,
+            threshold=scoring.THRESHOLD,
+            journal=None,
+            sync=False,
+            jobs=None,
+            resolve=1,
+            )
+
+    def test_skips_cache_if_requested(self, mock_process, mock_cache,
+                                      mock_pages, mock_episodes):
+        main.run_module(['url'], use_cache=False)
+        assert mock_process.call_args[1]['cache'] is None
+        assert mock_process.call_args[1]['pages'] is None
+        assert mock_process.call_args[1]['episodes'] is None
+        mock_cache.assert_not_called()
+        mock_pages.assert_not_called()
+        mock_episodes.assert_not_called()
 
-    def test_creates_playlists_for_all_urls(self, mock_create):
-        main.run_module(['url', 'url'])
-        assert mock_create.call_count == 2
+    @pytest.mark.parametrize('use_cache', [True, False])
+    def test_clears_cache_if_requested(self, mock_process, mock_cache,
+                                       mock_pages, mock_episodes, use_cache):
+        main.run_module(['url'], use_cache=use_cache, clear_cache=True)
+        mock_cache.return_value.clear.assert_called_once_with()
+        mock_pages.return_value.clear.assert_called_once_with()
+        mock_episodes.return_value.clear.assert_called_once_with()
+        has_cache = mock_process.call_args[1]['cache'] is not None
+        assert has_cache is use_cache
+
+    def test_skips_journal_by_default(self, mock_journal):
+        main.run_module(['url'])
+        mock_journal.assert_not_called()
+
+    def test_keeps_journal_if_requested(self, mock_process, mock_journal):
+        main.run_module(['url'], journal='run.jsonl')
+        mock_journal.assert_called_once_with('run.jsonl', resume=False)
+        log = mock_journal.return_value.__enter__.return_value
+        assert mock_process.call_args[1]['journal'] == log
+
+    @pytest.mark.parametrize('path', [None, 'run.jsonl'])
+    def test_resumes_if_requested(self, mock_journal, path):
+        main.run_module(['url'], resume=True, journal=path)
+        mock_journal.assert_called_once_with(path, resume=True)
+
+    def test_runs_jobs_episodes_at_once(self, mock_process):
+        main.run_module(['url'], jobs=8)
+        assert mock_process.call_args[1]['jobs'] == 8
+        assert 'write' not in mock_process.call_args[1]
+
+    def test_crawls_archives(self, mocker, mock_process):
+        marks = mocker.patch('spin2spot.__main__.MarkCache').return_value
+        marks.get.return_value = 7
+        crawl = mocker.patch('spin2spot.__main__.crawler.crawl')
+        crawl.return_value = [crawler.EpisodeLink('url8', 8)]
+        results = main.run_module(['url'], archives=['archive'])
+        crawl.assert_called_once_with('archive', 7)
+        assert [result.url for result in results] == ['url', 'url8']
+        marks.set.assert_called_once_with('archive', 8)
+
+    def test_reports_failed_crawls(self, mocker, mock_print):
+        mocker.patch('spin2spot.__main__.MarkCache')
+        crawl = mocker.patch('spin2spot.__main__.crawler.crawl')
+        crawl.side_effect = ValueError('Not found')
+        results = main.run_module([], archives=['archive'])
+        assert results == []
+        mock_print.assert_any_call('Could not crawl archive: Not found')
+
+    def test_leaves_unsupported_archives_unmarked(self, mocker, mock_print):
+        marks = mocker.patch('spin2spot.__main__.MarkCache').return_value
+        fetch = mocker.patch('spin2spot.crawler.retrieve_episode_html')
+        results = main.run_module([], archives=['https://wprb.com/'])
+        assert results == []
+        fetch.assert_not_called()
+        marks.set.assert_not_called()
+
+    def test_returns_result_for_all_urls(self):
+        results = main.run_module(['url', 'url'])
+        assert len(results) == 2
 
     def test_returns_stdout_message(self, mock_print):
         main.run_module(['url'])
         mock_print.assert_called_with('Created 1 playlist for user username.')
+
+    def test_reports_failures(self, mock_process, mock_print):
+        mock_process.side_effect = None
+        mock_process.return_value = [
+            Result('url1', 'playlist', None),
+            Result('url2', None, ValueError('Cannot parse')),
+            ]
+        main.run_module(['url1', 'url2'])
+        mock_print.assert_any_call(
+            'Could not create a playlist for url2: Cannot parse',
+            )
+        mock_print.assert_called_with('Created 1 playlist for user username.')
+
+    def test_prints_tier_stats_if_requested(self, mocker, mock_print):
+        mocker.patch('spin2spot.__main__.stats').report.return_value = {
+            'exact': {'searches': 4, 'hits': 3, 'hit_rate': 0.75},
+            }
+        main.run_module(['url'], show_stats=True)
+        mock_print.assert_any_call('exact: 3/4 searches found matches (75%)')
+
+    def test_prints_date_stats_if_requested(self, mocker, mock_print):
+        report = mocker.patch('spin2spot.__main__.date_stats').report
+        report.return_value = {
+            'WKDUParser': {'parsed': 4, 'fallbacks': 1, 'fallback_rate': 0.25},
+            }
+        main.run_module(['url'], show_stats=True)
+        mock_print.assert_any_call(
+            'WKDUParser: 1/4 dates fell back to dateutil (25%)',
+            )
+
+    def test_writes_profile_if_requested(self, mock_process, tmp_path):
+        def process(client, urls, **kwargs):
+            assert isinstance(profiling.hooks, profiling.Profiler)
+            with profiling.hooks.stage('fetch'):
+                pass
+            return [Result(url, 'playlist', None) for url in urls]
+        mock_process.side_effect = process
+        path = tmp_path / 'profile.json'
+        main.run_module(['url'], profile=str(path))
+        report = json.loads(path.read_text())
+        assert report['stages']['fetch']['calls'] == 1
+        assert type(profiling.hooks) is profiling.Hooks
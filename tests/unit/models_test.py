@@ -0,0 +1,111 @@
+import datetime
+import pickle
+import pytest
+from spin2spot import descriptions
+from spin2spot.models import Episode, Track
+
+
+@pytest.fixture
+def track():
+    return Track('The Courtneys', 'Lost Boys', 'II')
+
+
+@pytest.fixture
+def episode(track):
+    return Episode(
+        title='Ruckus Radio',
+        station='KWVA',
+        dj='Ruckus the Red',
+        datetime=datetime.datetime(2015, 11, 10, 11, 0),
+        tracks=[track],
+        )
+
+
+class TestTrack:
+    def test_reads_fields_as_keys(self, track):
+        assert track['artist'] == 'The Courtneys'
+        assert track.title == 'Lost Boys'
+
+    def test_leaves_out_missing_fields(self):
+        track = Track('Waxahatchee', 'Recite Remorse', cover_of='Bright Eyes')
+        assert dict(track) == {
+            'artist': 'Waxahatchee',
+            'title': 'Recite Remorse',
+            'cover_of': 'Bright Eyes',
+            }
+        assert 'album' not in track
+        assert track.get('album') is None
+        with pytest.raises(KeyError):
+            track['album']
+
+    def test_refuses_unknown_keys(self, track):
+        assert 'label' not in track
+        with pytest.raises(KeyError):
+            track['label']
+
+    def test_compares_equal_to_dicts(self, track):
+        assert track == {
+            'artist': 'The Courtneys',
+            'title': 'Lost Boys',
+            'album': 'II',
+            }
+
+    def test_unpacks_as_keyword_arguments(self, track):
+        def fields(artist, title, album=None, cover_of=None):
+            return artist, title, album, cover_of
+        assert fields(**track) == ('The Courtneys', 'Lost Boys', 'II', None)
+
+    def test_is_immutable(self, track):
+        with pytest.raises(AttributeError):
+            track.artist = 'Someone Else'
+        with pytest.raises(AttributeError):
+            del track.artist
+        with pytest.raises(TypeError):
+            track['artist'] = 'Someone Else'
+
+    def test_has_no_instance_dict(self, track):
+        assert not hasattr(track, '__dict__')
+
+    def test_hashes_by_fields(self, track):
+        assert len({track, Track('The Courtneys', 'Lost Boys', 'II')}) == 1
+
+    def test_interns_strings(self):
+        artist = ''.join(['The ', 'Courtneys'])
+        track = Track(artist, 'Lost Boys')
+        assert track.artist is Track(''.join(['The ', 'Courtneys']), '').artist
+
+    def test_replaces_fields(self, track):
+        assert track.replace(album='') == dict(track, album='')
+        assert track.album == 'II'
+
+    def test_pickles(self, track):
+        assert pickle.loads(pickle.dumps(track)) == track
+
+    def test_shows_its_fields(self):
+        assert repr(Track('A', 'B')) == "Track(artist='A', title='B')"
+
+
+class TestEpisode:
+    def test_leaves_out_missing_fields(self, episode):
+        assert set(episode) == {'title', 'datetime', 'tracks', 'station',
+                                'dj'}
+        assert len(episode) == 5
+
+    def test_is_not_hashable(self, episode):
+        with pytest.raises(TypeError):
+            hash(episode)
+
+    def test_replaces_tracks(self, episode):
+        tracks = iter(episode.tracks)
+        assert episode.replace(tracks=tracks)['tracks'] is tracks
+
+    def test_works_with_descriptions(self, episode):
+        assert (descriptions.playlist_title(episode)
+                == 'Ruckus Radio: November 10, 2015')
+        assert (descriptions.playlist_description(episode)
+                == 'Tuesday at 11:00am on KWVA with Ruckus the Red')
+
+    def test_describes_venues(self):
+        episode = Episode(title='Kevin Morby', venue='Beat Kitchen',
+                          datetime=None, tracks=[])
+        assert descriptions.playlist_description(episode) == 'At Beat Kitchen'
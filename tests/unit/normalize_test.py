@@ -0,0 +1,52 @@
+import pytest
+from spin2spot import normalize
+
+
+class TestQueryText:
+    @pytest.mark.parametrize('string, expected', [
+        ('1 Samuel 15:23', '1 Samuel 15:23'),
+        ('5-4=Unity', '5-4=Unity'),
+        ('Avenues & Alleyways', 'Avenues  Alleyways'),
+        ('Earth A.D.', 'Earth A.D.'),
+        ('Kiwi Maddog 20/20', 'Kiwi Maddog 20/20'),
+        ('Neighborhood #1 (Tunnels)', 'Neighborhood #1 Tunnels'),
+        ('One last "Whoo-hoo!" for the Pullman', 'One last Whoo-hoo for the Pullman'),
+        ("Scott Get the Van, I'm Moving", 'Scott Get the Van, Im Moving'),
+        ("Scott Get the Van, I’m Moving", 'Scott Get the Van, Im Moving'),
+        ('Two-Headed Boy', 'Two-Headed Boy'),
+        ("What's My Sign Again?", 'Whats My Sign Again'),
+        ])
+    def test_reformats_strings_correctly(self, string, expected):
+        assert normalize.query_text(string) == expected
+
+
+class TestCanonical:
+    @pytest.mark.parametrize('string, expected', [
+        ('  The  Courtneys ', 'courtneys'),
+        ('Björk', 'bjork'),
+        ('Sigur Rós', 'sigur ros'),
+        ('Simon & Garfunkel', 'simon and garfunkel'),
+        ("What's My Sign Again?", 'whats my sign again'),
+        ('Take Care (feat. Rihanna)', 'take care'),
+        ('Drake ft. Rihanna', 'drake'),
+        ('A Tribe Called Quest', 'tribe called quest'),
+        ('The', 'the'),
+        ('Theme', 'theme'),
+        ('5-4=Unity', '5 4 unity'),
+        ('', ''),
+        (None, ''),
+        ])
+    def test_normalizes_strings(self, string, expected):
+        assert normalize.canonical(string) == expected
+
+    def test_interns_results(self):
+        first = normalize.canonical(''.join(['Lost ', 'Boys']))
+        second = normalize.canonical(''.join(['LOST ', 'BOYS']))
+        assert first is second
+
+    def test_memoizes_results(self):
+        normalize._canonical.cache_clear()
+        for _ in range(3):
+            normalize.canonical('The Courtneys')
+        info = normalize._canonical.cache_info()
+        assert (info.hits, info.misses) == (2, 1)
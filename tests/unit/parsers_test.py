@@ -1,7 +1,9 @@
 import datetime
 import pytest
+import types
 import fixtures
-from spin2spot import parsers
+from bs4 import BeautifulSoup
+from spin2spot import cache, parsers
 
 
 @pytest.fixture(scope='module')
@@ -37,8 +39,260 @@ class TestEnsureIsSoup:
     def test_returns_soup_for_soup(self, soup):
         assert parsers.ensure_is_soup(soup) == soup
 
-    def test_returns_soup_for_raw_html(self, soup, html):
-        assert parsers.ensure_is_soup(html) == soup
+    def test_returns_soup_for_raw_html(self, html):
+        expected = BeautifulSoup(html, parsers.FEATURES)
+        assert parsers.ensure_is_soup(html) == expected
+
+    def test_parses_only_given_sections(self, soup, html):
+        strained = parsers.ensure_is_soup(html, ['plhead'])
+        assert len(strained.find_all(True)) < len(soup.find_all(True))
+        assert strained.find('p', class_='plhead') is not None
+        assert strained.find('div', class_='f2row') is None
+
+    def test_parses_long_pages_whole(self, mocker, soup, html):
+        mocker.patch('spin2spot.parsers.STRAIN_LIMIT', len(html))
+        parsed = parsers.ensure_is_soup(html, ['plhead'])
+        assert len(parsed.find_all(True)) == len(soup.find_all(True))
+
+
+class TestStrainer:
+    def test_returns_none_without_sections(self):
+        assert parsers.strainer(()) is None
+
+    def test_matches_any_of_multiple_classes(self):
+        html = '<div class="panel panel-col-last">A</div><div>B</div>'
+        strainer = parsers.strainer(('panel-col-last',))
+        soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
+        assert soup.text == 'A'
+
+
+@pytest.mark.parametrize('features', ['lxml', 'html.parser'])
+@pytest.mark.parametrize('filename, parser', [
+    ('setlist_fm.html', parsers.SetlistFMParser),
+    ('spinitron_v1.html', parsers.SpinitronV1Parser),
+    ('spinitron_v2.html', parsers.SpinitronV2Parser),
+    ('spinitron_v1.html', parsers.SpinitronParser),
+    ('spinitron_v2.html', parsers.SpinitronParser),
+    ('wkdu.html', parsers.WKDUParser),
+    ('wprb.html', parsers.WPRBParser),
+    ])
+def test_parses_raw_html_like_full_soup(mocker, features, filename, parser):
+    if features == 'lxml':
+        pytest.importorskip('lxml')
+    mocker.patch('spin2spot.parsers.FEATURES', features)
+    html = fixtures.contents(filename)
+    assert parser(html) == parser(fixtures.soup(filename))
+
+
+class TestDefaultFeatures:
+    def test_prefers_lxml(self, mocker):
+        mocker.patch('spin2spot.parsers.importlib.util.find_spec')
+        assert parsers.default_features() == 'lxml'
+
+    def test_falls_back_to_html_parser(self, mocker):
+        find_spec = mocker.patch('spin2spot.parsers.importlib.util.find_spec')
+        find_spec.return_value = None
+        assert parsers.default_features() == 'html.parser'
+
+
+@pytest.mark.parametrize('filename, parser', [
+    ('setlist_fm.html', parsers.SetlistFMParser),
+    ('spinitron_v1.html', parsers.SpinitronParser),
+    ('spinitron_v2.html', parsers.SpinitronParser),
+    ('wkdu.html', parsers.WKDUParser),
+    ('wprb.html', parsers.WPRBParser),
+    ])
+def test_streams_same_tracks(filename, parser):
+    soup = fixtures.soup(filename)
+    streamed = parser(soup, stream=True)
+    assert list(streamed['tracks']) == parser(soup)['tracks']
+
+
+@pytest.mark.parametrize('encode', [False, True])
+@pytest.mark.parametrize('filename, parser', [
+    ('setlist_fm.html', parsers.SetlistFMParser),
+    ('spinitron_v1.html', parsers.SpinitronParser),
+    ('spinitron_v2.html', parsers.SpinitronParser),
+    ('wprb.html', parsers.WPRBParser),
+    ])
+def test_pulls_same_episode_from_raw_html(mocker, filename, parser, encode):
+    pytest.importorskip('lxml')
+    mocker.patch('spin2spot.parsers.FEATURES', 'lxml')
+    html = fixtures.contents(filename)
+    if encode:
+        html = html.encode('utf-8')
+    pulled = parser(html, stream=True)
+    assert pulled.replace(tracks=list(pulled.tracks)) == parser(
+        fixtures.soup(filename),
+        )
+
+
+class TestCanPull:
+    def test_pulls_raw_html_with_lxml(self, mocker, html):
+        mocker.patch('spin2spot.parsers.FEATURES', 'lxml')
+        assert parsers.can_pull(html)
+        assert parsers.can_pull(html.encode('utf-8'))
+
+    def test_needs_lxml(self, mocker, html):
+        mocker.patch('spin2spot.parsers.FEATURES', 'html.parser')
+        assert not parsers.can_pull(html)
+
+    def test_needs_raw_html(self, mocker, spinitron_v1):
+        mocker.patch('spin2spot.parsers.FEATURES', 'lxml')
+        assert not parsers.can_pull(spinitron_v1)
+
+
+class TestPulledPage:
+    @pytest.fixture(autouse=True)
+    def features(self, mocker):
+        pytest.importorskip('lxml')
+        mocker.patch('spin2spot.parsers.FEATURES', 'lxml')
+
+    @pytest.fixture
+    def html(self):
+        rows = ''.join(f'<tr class="row"><td>{i}</td></tr>'
+                       for i in range(100))
+        return (f'<html><body><div class="head"><h1>Title</h1></div>'
+                f'<table>{rows}</table><p class="foot">End</p>'
+                f'</body></html>')
+
+    def page(self, html):
+        return parsers.PulledPage(html, ['head', 'foot', 'row'],
+                                  [('tr', 'row')])
+
+    def test_reads_header_before_rows(self, html):
+        header = self.page(html).header()
+        assert header.find('h1').text == 'Title'
+        assert header.find('tr') is None
+
+    def test_yields_rows_in_order(self, html):
+        rows = [row.text for row in self.page(html).rows()]
+        assert rows == [str(i) for i in range(100)]
+
+    def test_reads_page_as_rows_are_taken(self, mocker, html):
+        from lxml import etree
+        fed = []
+
+        class Parser(etree.HTMLPullParser):
+            def feed(self, data):
+                fed.append(data)
+                super().feed(data)
+        mocker.patch('spin2spot.parsers.CHUNK_SIZE', 64)
+        mocker.patch.object(parsers.etree, 'HTMLPullParser', Parser)
+        rows = self.page(html).rows()
+        next(rows)
+        assert len(''.join(fed)) < len(html) // 10
+        list(rows)
+        assert ''.join(fed) == html
+
+    def test_drops_rows_once_taken(self, html):
+        page = self.page(html)
+        for _ in page.rows():
+            pass
+        tree = page._kept[0].getroottree()
+        assert tree.find('.//tr') is None
+        assert tree.find('.//p').text == 'End'
+
+    def test_finds_marked_elements(self, html):
+        page = self.page(html)
+        assert page.find({('div', 'head')}).get('class') == 'head'
+        assert page.find({('p', 'foot')}) is None
+        assert [row.text for row in page.rows()][0] == '0'
+
+    def test_reads_pages_without_rows(self):
+        page = self.page('<div class="head"><h1>Title</h1></div>')
+        assert page.header().find('h1').text == 'Title'
+        assert list(page.rows()) == []
+
+
+class TestPullingMultiparser:
+    def test_falls_back_without_markers(self, mocker):
+        pytest.importorskip('lxml')
+        mocker.patch('spin2spot.parsers.FEATURES', 'lxml')
+        with pytest.raises(ValueError):
+            parsers.SpinitronParser('<p>Nothing here</p>', stream=True)
+
+
+@pytest.mark.parametrize('filename, parser', [
+    ('setlist_fm.html', parsers.SetlistFMParser),
+    ('spinitron_v1.html', parsers.SpinitronParser),
+    ('spinitron_v2.html', parsers.SpinitronParser),
+    ('wkdu.html', parsers.WKDUParser),
+    ('wprb.html', parsers.WPRBParser),
+    ])
+def test_reads_dates_without_falling_back(mocker, filename, parser):
+    stats = mocker.patch('spin2spot.parsers.date_stats', parsers.DateStats())
+    parser(fixtures.soup(filename))
+    (counts,) = stats.report().values()
+    assert counts['parsed'] == 1
+    assert counts['fallbacks'] == 0
+
+
+class TestReadDatetime:
+    @pytest.fixture(autouse=True)
+    def stats(self, mocker):
+        parsers._guess_datetime.cache_clear()
+        yield mocker.patch('spin2spot.parsers.date_stats',
+                           parsers.DateStats())
+        parsers._guess_datetime.cache_clear()
+
+    @pytest.fixture
+    def mock_dateutil(self, mocker):
+        patch = mocker.patch('spin2spot.parsers.dateutil_parser')
+        patch.parse.return_value = datetime.datetime(2016, 8, 2)
+        return patch
+
+    def test_uses_format(self, stats, mock_dateutil):
+        result = parsers._read_datetime('\n Aug 2,  2016 2:00 PM\xa0',
+                                        '%b %d, %Y %I:%M %p', 'Site')
+        assert result == datetime.datetime(2016, 8, 2, 14, 0)
+        mock_dateutil.parse.assert_not_called()
+        assert stats.report()['Site']['fallbacks'] == 0
+
+    def test_falls_back_to_dateutil(self, stats, mock_dateutil):
+        result = parsers._read_datetime('2016-08-02', '%m/%d/%y', 'Site')
+        assert result == datetime.datetime(2016, 8, 2)
+        mock_dateutil.parse.assert_called_once_with('2016-08-02')
+        assert stats.report()['Site'] == {
+            'parsed': 1,
+            'fallbacks': 1,
+            'fallback_rate': 1.0,
+            }
+
+    def test_remembers_fallback_dates(self, stats, mock_dateutil):
+        for _ in range(3):
+            parsers._read_datetime('2016-08-02', '%m/%d/%y', 'Site')
+        mock_dateutil.parse.assert_called_once_with('2016-08-02')
+        assert stats.report()['Site']['fallbacks'] == 3
+
+    def test_surfaces_unreadable_dates(self):
+        with pytest.raises(ValueError):
+            parsers._read_datetime('no date here', '%m/%d/%y', 'Site')
+
+
+class TestDateStats:
+    def test_reports_fallback_rate(self):
+        stats = parsers.DateStats()
+        stats.record('Site', False)
+        stats.record('Site', True)
+        assert stats.report() == {
+            'Site': {'parsed': 2, 'fallbacks': 1, 'fallback_rate': 0.5},
+            }
+
+
+class TestIterElements:
+    def test_yields_matches_in_order(self):
+        soup = BeautifulSoup(
+            '<ol><li class="song">A</li><li class="tape">B</li></ol>'
+            '<ol><li class="song">C</li></ol>',
+            'html.parser',
+            )
+        elements = parsers.iter_elements(soup, 'li', 'song')
+        assert [element.text for element in elements] == ['A', 'C']
+
+    def test_yields_nothing_without_matches(self):
+        soup = BeautifulSoup('<ol></ol>', 'html.parser')
+        assert list(parsers.iter_elements(soup, 'li', 'song')) == []
 
 
 class TestSetlistFMParser:
@@ -196,12 +450,109 @@ class TestSpinitronParser:
         with pytest.raises(ValueError):
             parsers.SpinitronParser(wkdu)
 
+    @pytest.mark.parametrize('page, expected', [
+        ('spinitron_v1', parsers.SpinitronV1Parser),
+        ('spinitron_v2', parsers.SpinitronV2Parser),
+        ('wkdu', None),
+        ])
+    def test_detects_subparser(self, request, page, expected):
+        soup = request.getfixturevalue(page)
+        assert parsers.SpinitronParser.detect(soup) is expected
+
+    def test_parses_detected_page_in_one_pass(self, mocker, spinitron_v1):
+        spy = mocker.spy(parsers.SpinitronV2Parser, 'parse_title')
+        parsers.SpinitronParser(spinitron_v1)
+        spy.assert_not_called()
+
+    def test_surfaces_errors_in_detected_subparser(self, mocker,
+                                                   spinitron_v2):
+        patch = mocker.patch.object(parsers.SpinitronV2Parser, 'parse_dj')
+        patch.side_effect = AttributeError
+        with pytest.raises(AttributeError):
+            parsers.SpinitronParser(spinitron_v2)
+
+    def test_falls_back_for_unrecognized_pages(self, mocker, spinitron_v1):
+        mocker.patch.object(parsers.SpinitronParser, 'detect',
+                            return_value=None)
+        parser = parsers.SpinitronParser(spinitron_v1)
+        assert parser['title'] == 'Ruckus Radio'
+
 
 class TestParseEpisode:
     def test_parses_content(self, spinitron_v1):
         result = parsers.parse_episode('spinitron.com', spinitron_v1)
         assert result['title'] == 'Ruckus Radio'
 
+    def test_streams_tracks(self, spinitron_v1):
+        result = parsers.parse_episode('spinitron.com', spinitron_v1,
+                                       stream=True)
+        assert isinstance(result['tracks'], types.GeneratorType)
+
     def test_refuses_unconfigured_domains(self):
         with pytest.raises(KeyError):
             parsers.parse_episode('unknown.com', '<html />')
+
+
+class TestParseEpisodeCache:
+    @pytest.fixture
+    def episodes(self, tmp_path):
+        return cache.EpisodeCache(str(tmp_path / 'episodes.sqlite'))
+
+    @pytest.fixture
+    def url(self):
+        return 'http://spinitron.com/1'
+
+    @pytest.fixture
+    def stale(self):
+        return {'title': 'Old', 'datetime': datetime.datetime(2015, 1, 1),
+                'tracks': []}
+
+    def test_caches_parsed_episodes(self, episodes, url, spinitron_v1):
+        result = parsers.parse_episode('spinitron.com', spinitron_v1,
+                                       url=url, episodes=episodes)
+        digest = parsers.content_digest(spinitron_v1)
+        cached = episodes.get(url, digest, parsers.PARSER_VERSION)
+        assert cached['title'] == result['title']
+        assert cached['tracks'] == list(result['tracks'])
+
+    def test_skips_parsing_cached_episodes(self, mocker, episodes, url,
+                                           spinitron_v1):
+        parsers.parse_episode('spinitron.com', spinitron_v1, url=url,
+                              episodes=episodes)
+        spy = mocker.spy(parsers.SpinitronParser, '__init__')
+        result = parsers.parse_episode('spinitron.com', spinitron_v1,
+                                       url=url, episodes=episodes)
+        spy.assert_not_called()
+        assert result['title'] == 'Ruckus Radio'
+
+    def test_caches_streamed_episodes_once_read(self, episodes, url,
+                                                spinitron_v1):
+        result = parsers.parse_episode('spinitron.com', spinitron_v1,
+                                       stream=True, url=url,
+                                       episodes=episodes)
+        assert len(episodes) == 0
+        tracks = list(result['tracks'])
+        digest = parsers.content_digest(spinitron_v1)
+        cached = episodes.get(url, digest, parsers.PARSER_VERSION)
+        assert cached['tracks'] == tracks
+
+    def test_reparses_changed_content(self, episodes, url, stale,
+                                      spinitron_v1):
+        episodes.set(url, 'stale', parsers.PARSER_VERSION, stale)
+        result = parsers.parse_episode('spinitron.com', spinitron_v1,
+                                       url=url, episodes=episodes)
+        assert result['title'] == 'Ruckus Radio'
+
+    def test_reparses_after_parser_changes(self, mocker, episodes, url,
+                                           stale, spinitron_v1):
+        digest = parsers.content_digest(spinitron_v1)
+        episodes.set(url, digest, parsers.PARSER_VERSION, stale)
+        mocker.patch.object(parsers, 'PARSER_VERSION',
+                            parsers.PARSER_VERSION + 1)
+        result = parsers.parse_episode('spinitron.com', spinitron_v1,
+                                       url=url, episodes=episodes)
+        assert result['title'] == 'Ruckus Radio'
+
+    def test_hashes_text_and_bytes_alike(self):
+        assert (parsers.content_digest('<html />')
+                == parsers.content_digest(b'<html />'))
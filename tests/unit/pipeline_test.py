@@ -0,0 +1,180 @@
+import pytest
+import threading
+import time
+from spin2spot import journal
+from spin2spot import pipeline
+from spin2spot import spotify
+from spin2spot.models import Episode
+
+
+@pytest.fixture(autouse=True)
+def mock_create(mocker):
+    patch = mocker.patch('spin2spot.pipeline.create_playlist_from_parser')
+    patch.return_value = 'playlist'
+    return patch
+
+
+class TestStageLimits:
+    def test_fills_in_defaults(self):
+        assert pipeline.stage_limits() == pipeline.STAGE_LIMITS
+
+    def test_overrides_defaults(self):
+        assert pipeline.stage_limits(fetch=8)['fetch'] == 8
+
+    def test_refuses_unknown_stages(self):
+        with pytest.raises(ValueError):
+            pipeline.stage_limits(upload=2)
+
+    def test_refuses_empty_stages(self):
+        with pytest.raises(ValueError):
+            pipeline.stage_limits(parse=0)
+
+
+class TestProcessEpisodes:
+    @pytest.fixture
+    def urls(self):
+        return [f'http://spinitron.com/{i}' for i in range(5)]
+
+    def test_returns_result_per_url(self, mock_client, urls):
+        results = pipeline.process_episodes(mock_client, urls)
+        assert [result.url for result in results] == urls
+        assert all(result.playlist_id == 'playlist' for result in results)
+        assert all(result.error is None for result in results)
+
+    def test_creates_playlists_correctly(self, mock_client, mock_create):
+        url = 'http://spinitron.com/1'
+        pipeline.process_episodes(mock_client, [url], public=True)
+        args, kwargs = mock_create.call_args
+        assert args[0] == mock_client
+        assert args[1]['title'] == 'Ruckus Radio'
+        assert kwargs['public'] is True
+
+    def test_passes_sync(self, mock_client, mock_create):
+        url = 'http://spinitron.com/1'
+        pipeline.process_episodes(mock_client, [url], sync=True)
+        assert mock_create.call_args[1]['sync'] is True
+
+    def test_shares_playlist_index(self, mock_client, mock_create, urls):
+        pipeline.process_episodes(mock_client, urls, sync=True)
+        indexes = {id(call[1]['playlists'])
+                   for call in mock_create.call_args_list}
+        assert len(indexes) == 1
+        assert isinstance(mock_create.call_args[1]['playlists'],
+                          spotify.PlaylistIndex)
+
+    def test_caches_parsed_episodes(self, mocker, mock_client):
+        url = 'http://spinitron.com/1'
+        episodes = mocker.Mock()
+        episodes.get.return_value = None
+        pipeline.process_episodes(mock_client, [url], episodes=episodes)
+        episodes.get.assert_called_once()
+        assert episodes.get.call_args[0][0] == url
+
+    def test_shares_resolve_pool(self, mock_client, mock_create, urls):
+        pipeline.process_episodes(mock_client, urls, resolve=3)
+        calls = mock_create.call_args_list
+        executors = {call[1]['executor'] for call in calls}
+        assert len(executors) == 1
+        assert executors.pop()._max_workers == 3
+
+    def test_skips_finished_urls(self, mock_client, mock_create, urls,
+                                 tmp_path):
+        path = str(tmp_path / 'journal.jsonl')
+        with journal.Journal(path) as log:
+            checkpoint = log.checkpoint(urls[0])
+            checkpoint.created('finished')
+            checkpoint.finished()
+        with journal.Journal(path, resume=True) as log:
+            results = pipeline.process_episodes(mock_client, urls,
+                                                journal=log)
+        assert results[0].playlist_id == 'finished'
+        assert mock_create.call_count == len(urls) - 1
+
+    def test_passes_checkpoints(self, mock_client, mock_create, tmp_path):
+        url = 'http://spinitron.com/1'
+        with journal.Journal(str(tmp_path / 'journal.jsonl')) as log:
+            pipeline.process_episodes(mock_client, [url], journal=log)
+        assert mock_create.call_args[1]['checkpoint'].url == url
+
+    def test_limits_episodes_to_jobs(self, mock_client, mock_create, urls):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def create(*args, **kwargs):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+            return 'playlist'
+        mock_create.side_effect = create
+        pipeline.process_episodes(mock_client, urls, jobs=1, write=4)
+        assert max(peak) == 1
+
+    def test_reads_urls_lazily(self, mock_client, mock_create, urls):
+        def stream():
+            for read, url in enumerate(urls):
+                ahead = read - mock_create.call_count
+                assert ahead <= pipeline.READ_AHEAD
+                yield url
+        results = pipeline.process_episodes(mock_client, stream(), jobs=1)
+        assert all(result.error is None for result in results)
+
+    def test_isolates_failures(self, mock_client, mock_create, urls):
+        error = ValueError('Cannot parse')
+        mock_create.side_effect = ['playlist', error] + ['playlist'] * 3
+        results = pipeline.process_episodes(mock_client, urls, write=1)
+        assert [result.error for result in results].count(error) == 1
+        assert sum(1 for result in results if result.playlist_id) == 4
+
+    def test_overlaps_episodes(self, mock_client, mock_create, urls):
+        barrier = threading.Barrier(2, timeout=5)
+        mock_create.side_effect = lambda *args, **kwargs: barrier.wait()
+        results = pipeline.process_episodes(mock_client, urls[:4], write=1)
+        assert all(result.error is None for result in results)
+
+    @pytest.fixture
+    def peak(self):
+        running = []
+        peak = [0]
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running.append(1)
+                peak[0] = max(peak[0], len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+        return work, peak
+
+    def test_limits_writes(self, mock_client, mock_create, urls, peak):
+        work, highest = peak
+
+        def create(*args, write_limit, **kwargs):
+            with write_limit:
+                work()
+        mock_create.side_effect = create
+        pipeline.process_episodes(mock_client, urls, write=2)
+        assert highest[0] == 2
+
+    def test_limits_streamed_parsing(self, mocker, mock_client, mock_create,
+                                     urls, peak):
+        work, highest = peak
+
+        def tracks():
+            for track in range(3):
+                work()
+                yield track
+
+        def parse(*args, **kwargs):
+            return Episode(title='Show', datetime=None, tracks=tracks())
+        mocker.patch('spin2spot.pipeline.parse_episode', side_effect=parse)
+        mock_create.side_effect = lambda client, parser, **kwargs: list(
+            parser['tracks'],
+            )
+        results = pipeline.process_episodes(mock_client, urls, parse=1)
+        assert all(result.error is None for result in results)
+        assert highest[0] == 1
@@ -0,0 +1,114 @@
+import itertools
+import pytest
+from spin2spot import parsers
+from spin2spot import pipeline
+from spin2spot import profiling
+from spin2spot import retrieval
+from spin2spot import spotify
+from tests.unit import fixtures
+
+
+@pytest.fixture
+def profiler():
+    clock = itertools.count()
+    profiler = profiling.Profiler(clock=lambda: next(clock))
+    previous = profiling.install(profiler)
+    yield profiler
+    profiling.install(previous)
+
+
+class TestHooks:
+    def test_stage_does_nothing(self):
+        with profiling.Hooks().stage('fetch'):
+            pass
+
+    def test_iterate_returns_iterable(self):
+        tracks = ['track']
+        assert profiling.Hooks().iterate('parse', tracks) is tracks
+
+    def test_is_the_default(self):
+        assert type(profiling.hooks) is profiling.Hooks
+
+
+class TestInstall:
+    def test_returns_previous_hooks(self, profiler):
+        hooks = profiling.Hooks()
+        assert profiling.install(hooks) is profiler
+        assert profiling.hooks is hooks
+
+
+class TestProfiler:
+    def test_times_stages(self, profiler):
+        for _ in range(2):
+            with profiler.stage('search'):
+                pass
+        stages = profiler.report()['stages']
+        assert stages['search'] == {'calls': 2, 'seconds': 2, 'bytes': 0}
+
+    def test_times_failed_stages(self, profiler):
+        with pytest.raises(ValueError):
+            with profiler.stage('parse'):
+                raise ValueError()
+        assert profiler.report()['stages']['parse']['calls'] == 1
+
+    def test_times_each_item(self, profiler):
+        items = list(profiler.iterate('parse', ['a', 'b']))
+        assert items == ['a', 'b']
+        stages = profiler.report()['stages']
+        assert stages['parse'] == {'calls': 0, 'seconds': 3, 'bytes': 0}
+
+    def test_counts_bytes(self, profiler):
+        profiler.transferred('fetch', 10)
+        profiler.transferred('fetch', 5)
+        assert profiler.report()['stages']['fetch']['bytes'] == 15
+
+    def test_attributes_work_to_current_url(self, profiler):
+        token = profiling.current_url.set('url')
+        try:
+            with profiler.stage('search'):
+                pass
+        finally:
+            profiling.current_url.reset(token)
+        with profiler.stage('search'):
+            pass
+        report = profiler.report()
+        assert report['urls'] == {
+            'url': {'search': {'calls': 1, 'seconds': 1, 'bytes': 0}},
+            }
+        assert report['stages']['search']['calls'] == 2
+
+    def test_reports_elapsed_time(self, profiler):
+        with profiler.stage('fetch'):
+            pass
+        assert profiler.report()['seconds'] == 3
+
+
+class TestHookPoints:
+    def test_times_retrieval(self, profiler, html):
+        retrieval.retrieve_episode_html('https://spinitron.com/WZBC/pl/1')
+        fetch = profiler.report()['stages']['fetch']
+        assert fetch['calls'] == 1
+        assert fetch['bytes'] == len(html)
+
+    def test_times_parsing(self, profiler):
+        html = fixtures.contents('wkdu.html')
+        episode = parsers.parse_episode('wkdu.org', html, stream=True)
+        calls = profiler.report()['stages']['parse']['seconds']
+        list(episode['tracks'])
+        assert profiler.report()['stages']['parse']['seconds'] > calls
+
+    def test_profiles_playlist_per_url(self, profiler, mock_client):
+        url = 'https://spinitron.com/WZBC/pl/1'
+        spotify.create_playlist(mock_client, url, workers=2)
+        stages = profiler.report()['urls'][url]
+        assert {'fetch', 'parse', 'create', 'search'} <= set(stages)
+
+    def test_profiles_pipeline_per_url(self, profiler, mock_client):
+        urls = ['https://spinitron.com/WZBC/pl/1',
+                'https://spinitron.com/WZBC/pl/2']
+        pipeline.process_episodes(mock_client, urls)
+        report = profiler.report()
+        assert set(report['urls']) == set(urls)
+        searches = sum(stages['search']['calls']
+                       for stages in report['urls'].values())
+        assert searches == report['stages']['search']['calls']
@@ -0,0 +1,63 @@
+import pytest
+from spin2spot import queries
+
+
+class TestRewrites:
+    @pytest.mark.parametrize('tier, artist, title, expected', [
+        ('featuring', 'Drake feat. Rihanna', 'Take Care',
+         ('Drake', 'Take Care')),
+        ('featuring', 'Drake', 'Take Care (feat. Rihanna)',
+         ('Drake', 'Take Care')),
+        ('featuring', 'Drake', 'Take Care [ft. Rihanna]',
+         ('Drake', 'Take Care')),
+        ('version', 'The Beatles', 'Help! - Remastered 2009',
+         ('The Beatles', 'Help!')),
+        ('version', 'Neil Young', 'Ohio (Live)', ('Neil Young', 'Ohio')),
+        ('version', 'Pulp', 'Common People [Radio Edit]',
+         ('Pulp', 'Common People')),
+        ('version', 'Oasis', 'Live Forever', ('Oasis', 'Live Forever')),
+        ('ampersand', 'Simon & Garfunkel', 'Mrs. Robinson',
+         ('Simon and Garfunkel', 'Mrs. Robinson')),
+        ('first_artist', 'Bob Dylan, The Band', 'Tears of Rage',
+         ('Bob Dylan', 'Tears of Rage')),
+        ('first_artist', 'Run the Jewels x Zack de la Rocha', 'Legend',
+         ('Run the Jewels', 'Legend')),
+        ])
+    def test_rewrites_queries(self, tier, artist, title, expected):
+        assert queries.TIERS[tier](artist, title) == expected
+
+    def test_searches_covered_artist(self):
+        rewrites = list(queries.rewrites('Runk', 'Lost Boys', 'The Courtneys'))
+        assert rewrites == [
+            ('exact', 'Runk', 'Lost Boys'),
+            ('cover_of', 'The Courtneys', 'Lost Boys'),
+            ]
+
+    def test_skips_repeated_queries(self):
+        rewrites = list(queries.rewrites('Beach Slang', 'Kids'))
+        assert rewrites == [('exact', 'Beach Slang', 'Kids')]
+
+    def test_follows_given_tiers(self):
+        tiers = ('version', 'exact')
+        rewrites = queries.rewrites('Neil Young', 'Ohio (Live)', tiers=tiers)
+        assert [rewrite[0] for rewrite in rewrites] == ['version', 'exact']
+
+    def test_skips_empty_queries(self):
+        rewrites = list(queries.rewrites('Artist', '(Live)'))
+        assert [rewrite[0] for rewrite in rewrites] == ['exact']
+
+
+class TestTierStats:
+    @pytest.fixture
+    def stats(self):
+        stats = queries.TierStats()
+        stats.record('exact', ['track'])
+        stats.record('exact', [])
+        stats.record('version', [])
+        return stats
+
+    def test_reports_searches_and_hits(self, stats):
+        assert stats.report() == {
+            'exact': {'searches': 2, 'hits': 1, 'hit_rate': 0.5},
+            'version': {'searches': 1, 'hits': 0, 'hit_rate': 0.0},
+            }
@@ -1,4 +1,10 @@
+import asyncio
 import pytest
+import threading
+import time
+from requests import HTTPError
+from unittest.mock import MagicMock
+from spin2spot import cache
 from spin2spot import retrieval
 
 
@@ -19,17 +25,77 @@ class TestParseDomain:
         assert retrieval.parse_domain(url) == 'spinitron.com'
 
 
+class TestGetSession:
+    def test_reuses_session_per_domain(self):
+        session = retrieval.get_session('spinitron.com')
+        assert retrieval.get_session('spinitron.com') is session
+
+    def test_separates_domains(self, mock_requests):
+        mock_requests.Session.side_effect = MagicMock
+        session = retrieval.get_session('spinitron.com')
+        assert retrieval.get_session('wkdu.org') is not session
+
+    def test_pools_connections(self, mock_requests):
+        session = retrieval.get_session('spinitron.com')
+        adapter = mock_requests.adapters.HTTPAdapter.return_value
+        session.mount.assert_any_call('https://', adapter)
+        mock_requests.adapters.HTTPAdapter.assert_called_with(
+            pool_connections=1,
+            pool_maxsize=retrieval.POOL_SIZE,
+            )
+
+
 class TestRetrieveEpisodeHTML:
     @pytest.fixture
     def retrieve(self, url):
         return retrieval.retrieve_episode_html(url)
 
-    def test_calls_requests_correctly(self, retrieve, mock_requests, url):
-        mock_requests.get.assert_called_with(url)
+    @pytest.fixture
+    def pages(self, tmp_path):
+        return cache.PageCache(str(tmp_path / 'pages.sqlite'))
+
+    def test_calls_requests_correctly(self, retrieve, mock_session, url):
+        mock_session.get.assert_called_with(
+            url,
+            headers={},
+            timeout=retrieval.TIMEOUT,
+            )
 
     def test_returns_html(self, retrieve, html):
         assert retrieve == html
 
+    def test_raises_http_errors(self, mock_session, url):
+        response = mock_session.get.return_value
+        response.raise_for_status.side_effect = HTTPError
+        with pytest.raises(HTTPError):
+            retrieval.retrieve_episode_html(url)
+
+    def test_caches_validated_pages(self, mock_session, pages, url, html):
+        mock_session.get.return_value.headers = {'ETag': '"abc"'}
+        retrieval.retrieve_episode_html(url, pages=pages)
+        assert pages.get(url) == ('"abc"', None, html)
+
+    def test_skips_caching_unvalidated_pages(self, pages, url):
+        retrieval.retrieve_episode_html(url, pages=pages)
+        assert pages.get(url) is None
+
+    def test_revalidates_cached_pages(self, mock_session, pages, url):
+        pages.set(url, '"abc"', 'Tue, 10 Nov 2015 11:00:00 GMT', b'html')
+        retrieval.retrieve_episode_html(url, pages=pages)
+        mock_session.get.assert_called_with(
+            url,
+            headers={
+                'If-None-Match': '"abc"',
+                'If-Modified-Since': 'Tue, 10 Nov 2015 11:00:00 GMT',
+                },
+            timeout=retrieval.TIMEOUT,
+            )
+
+    def test_reuses_unmodified_pages(self, mock_session, pages, url):
+        pages.set(url, '"abc"', None, b'cached')
+        mock_session.get.return_value.status_code = 304
+        assert retrieval.retrieve_episode_html(url, pages=pages) == b'cached'
+
 
 class TestRetrieveEpisode:
     @pytest.fixture
@@ -41,3 +107,79 @@ class TestRetrieveEpisode:
 
     def test_returns_html(self, retrieve, html):
         assert retrieve[1] == html
+
+
+def collect(urls, **kwargs):
+    async def run():
+        return [
+            download
+            async for download in retrieval.retrieve_episodes(urls, **kwargs)
+            ]
+    return asyncio.run(run())
+
+
+class TestRetrieveEpisodeAsync:
+    def test_returns_domain_and_html(self, url, html):
+        result = asyncio.run(retrieval.retrieve_episode_async(url))
+        assert result == ('spinitron.com', html)
+
+
+class TestRetrieveEpisodes:
+    @pytest.fixture
+    def urls(self):
+        return [f'https://spinitron.com/WZBC/pl/{i}' for i in range(6)]
+
+    def test_returns_download_per_url(self, urls, html):
+        downloads = collect(urls)
+        assert sorted(download.url for download in downloads) == urls
+        assert all(download.html == html for download in downloads)
+        assert all(download.domain == 'spinitron.com'
+                   for download in downloads)
+
+    def test_streams_in_completion_order(self, mock_session, urls):
+        rest = threading.Semaphore(0)
+
+        def get(url, **kwargs):
+            if url == urls[0]:
+                for _ in urls[1:]:
+                    rest.acquire(timeout=5)
+                time.sleep(0.05)
+            else:
+                rest.release()
+            return MagicMock(status_code=200, headers={}, content=url)
+        mock_session.get.side_effect = get
+        downloads = collect(urls, per_domain=len(urls))
+        assert downloads[-1].url == urls[0]
+
+    def test_caps_downloads_per_domain(self, mock_session, urls):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def get(url, **kwargs):
+            with lock:
+                running.append(url)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(url)
+            return MagicMock(status_code=200, headers={}, content=url)
+        mock_session.get.side_effect = get
+        collect(urls, per_domain=2)
+        assert max(peak) <= 2
+
+    def test_spaces_out_requests(self, mock_session, urls):
+        starts = []
+
+        def get(url, **kwargs):
+            starts.append(time.monotonic())
+            return MagicMock(status_code=200, headers={}, content=url)
+        mock_session.get.side_effect = get
+        collect(urls[:3], delay=0.05)
+        assert max(starts) - min(starts) >= 0.09
+
+    def test_reports_failures(self, mock_session, urls):
+        mock_session.get.side_effect = ConnectionError('refused')
+        downloads = collect(urls[:1])
+        assert downloads[0].html is None
+        assert isinstance(downloads[0].error, ConnectionError)
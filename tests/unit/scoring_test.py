@@ -0,0 +1,96 @@
+import pytest
+import fixtures
+from spin2spot import scoring
+
+
+def candidate(id, name, artists, album='', duration=None):
+    track = {
+        'id': id,
+        'name': name,
+        'artists': [{'name': artist} for artist in artists],
+        'album': {'name': album},
+        }
+    if duration is not None:
+        track['duration_ms'] = duration
+    return track
+
+
+class TestSimilarity:
+    @pytest.mark.parametrize('a, b, expected', [
+        ('kids', 'kids', 1.0),
+        ('kids', '', 0.0),
+        ('', '', 0.0),
+        ('kids', 'future mixtape for the art kids', 0.0),
+        ])
+    def test_scores_similarity(self, a, b, expected):
+        assert scoring.similarity(a, b) == expected
+
+    def test_scores_near_matches_between_floor_and_one(self):
+        score = scoring.similarity('the courtneys', 'courtneys')
+        assert scoring.FLOOR <= score < 1
+
+
+class TestScoreCandidates:
+    @pytest.fixture
+    def results(self):
+        return fixtures.json('search_track.json')['tracks']['items']
+
+    def test_orders_best_first(self, results):
+        matches = scoring.score_candidates(results, 'The Courtneys',
+                                           'Lost Boys', 'Lost Boys')
+        assert [match.id for match in matches] == [
+            '4IssUgVW7mVUedc4agB4iW',
+            '6Ck7eSqoon2ZHIQZuYAlLf',
+            ]
+        assert matches[0].score > matches[1].score
+
+    def test_keeps_spotify_order_for_ties(self, results):
+        matches = scoring.score_candidates(results, 'The Courtneys',
+                                           'Lost Boys')
+        assert [match.id for match in matches] == [
+            '6Ck7eSqoon2ZHIQZuYAlLf',
+            '4IssUgVW7mVUedc4agB4iW',
+            ]
+        assert matches[0].score == matches[1].score == 1.0
+
+    def test_ignores_version_tags(self):
+        results = [candidate('a', 'Kids - Remastered', ['Beach Slang'])]
+        match, = scoring.score_candidates(results, 'Beach Slang', 'Kids')
+        assert match.score == 1.0
+
+    def test_matches_any_credited_artist(self):
+        results = [candidate('a', 'Legend', ['Run the Jewels', 'Zack'])]
+        match, = scoring.score_candidates(results, 'Zack', 'Legend')
+        assert match.score == 1.0
+
+    def test_scores_durations(self):
+        results = [
+            candidate('far', 'Song', ['Band'], duration=240000),
+            candidate('near', 'Song', ['Band'], duration=181000),
+            candidate('unknown', 'Song', ['Band']),
+            ]
+        matches = scoring.score_candidates(results, 'Band', 'Song',
+                                           duration=180000)
+        assert [match.id for match in matches] == ['near', 'far', 'unknown']
+        assert matches[1].score == matches[2].score
+
+    def test_returns_nothing_without_candidates(self):
+        assert scoring.score_candidates([], 'Band', 'Song') == []
+
+
+class TestBestMatch:
+    def test_returns_confident_match(self):
+        results = [candidate('a', 'Song', ['Band'])]
+        assert scoring.best_match(results, 'Band', 'Song') == ('a', 1.0)
+
+    def test_returns_none_below_threshold(self):
+        results = [candidate('a', 'Song', ['Another Group'])]
+        assert scoring.best_match(results, 'Band', 'Song') is None
+
+    def test_uses_given_threshold(self):
+        results = [candidate('a', 'Song', ['Another Group'])]
+        match = scoring.best_match(results, 'Band', 'Song', threshold=0.5)
+        assert match.id == 'a'
+
+    def test_returns_none_without_candidates(self):
+        assert scoring.best_match([], 'Band', 'Song') is None
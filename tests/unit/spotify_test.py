@@ -1,7 +1,18 @@
 import pytest
+import spotipy
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import fixtures
+import http_stub
+from unittest.mock import call
+from spin2spot import cache
+from spin2spot import journal
 from spin2spot import parsers
+from spin2spot import queries
+from spin2spot import scoring
 from spin2spot import spotify
+from spin2spot import throttle
 
 
 class TestGetUsername:
@@ -30,28 +41,53 @@ class TestBuildClient:
 
     def test_builds_spotipy_client_correctly(self, mock_spotipy, mock_util):
         auth = mock_util.prompt_for_user_token.return_value
-        mock_spotipy.assert_called_with(auth=auth)
+        kwargs = mock_spotipy.call_args[1]
+        assert kwargs['auth'] == auth
+        assert kwargs['status_forcelist'] == spotify.RETRY_STATUSES
+        assert kwargs['requests_session'] is not None
 
     def test_returns_spotipy_client(self, client, mock_spotipy):
         assert client == mock_spotipy.return_value
 
 
-class TestFormatQuery:
-    @pytest.mark.parametrize('string, expected', [
-        ('1 Samuel 15:23', '1 Samuel 15:23'),
-        ('5-4=Unity', '5-4=Unity'),
-        ('Avenues & Alleyways', 'Avenues  Alleyways'),
-        ('Earth A.D.', 'Earth A.D.'),
-        ('Kiwi Maddog 20/20', 'Kiwi Maddog 20/20'),
-        ('Neighborhood #1 (Tunnels)', 'Neighborhood #1 Tunnels'),
-        ('One last "Whoo-hoo!" for the Pullman', 'One last Whoo-hoo for the Pullman'),
-        ("Scott Get the Van, I'm Moving", 'Scott Get the Van, Im Moving'),
-        ("Scott Get the Van, I’m Moving", 'Scott Get the Van, Im Moving'),
-        ('Two-Headed Boy', 'Two-Headed Boy'),
-        ("What's My Sign Again?", 'Whats My Sign Again'),
-        ])
-    def test_reformats_strings_correctly(self, string, expected):
-        assert spotify._format_query(string) == expected
+def stub_client(server):
+    """Return a Spotipy client that talks to the stub server."""
+    client = spotipy.client.Spotify(
+        auth='token',
+        requests_session=spotify.build_session(backoff=0),
+        status_forcelist=spotify.RETRY_STATUSES,
+        )
+    client.prefix = f'{server.url}/v1/'
+    return client
+
+
+class TestBuildSession:
+    def test_leaves_throttling_to_scheduler(self):
+        scheduler = throttle.Scheduler(rate=1000, burst=1000, retries=2,
+                                       backoff=0)
+        with http_stub.serve(http_stub.error(429)) as server:
+            with pytest.raises(spotipy.SpotifyException) as error:
+                scheduler.call(stub_client(server).search, 'track:"B"')
+        assert error.value.http_status == 429
+        assert len(server.requests) == scheduler.retries + 1
+
+    def test_retries_server_errors(self):
+        with http_stub.serve(http_stub.error(503),
+                             (200, {'id': 'username'})) as server:
+            result = stub_client(server).current_user()
+        assert result == {'id': 'username'}
+        assert len(server.requests) == 2
+
+    def test_surfaces_persistent_server_errors(self, mock_scheduler):
+        rate = mock_scheduler.rate
+        with http_stub.serve(http_stub.error(503)) as server:
+            with pytest.raises(spotipy.SpotifyException) as error:
+                spotify._add_page(stub_client(server), 'username',
+                                  'playlist', ['a'])
+        assert error.value.http_status == 503
+        assert mock_scheduler.rate == rate
+        attempts = (spotify.CLIENT_RETRIES + 1) * (spotify.PAGE_RETRIES + 1)
+        assert len(server.requests) == attempts
 
 
 class TestGetTrackID:
@@ -106,6 +142,299 @@ class TestGetTrackID:
         expected = '6Ck7eSqoon2ZHIQZuYAlLf'
         assert spotify.get_track_id(mock_client, **track) == expected
 
+    def test_returns_none_below_threshold(self, track, mock_client):
+        track['artist'] = 'Someone Else Entirely'
+        assert spotify.get_track_id(mock_client, **track) is None
+
+    def test_uses_given_threshold(self, track, mock_client):
+        track['artist'] = 'Courtneys Band'
+        assert spotify.get_track_id(mock_client, **track) is not None
+        result = spotify.get_track_id(mock_client, threshold=0.99, **track)
+        assert result is None
+
+    def test_returns_match_with_score(self, track, mock_client):
+        match = spotify.get_track_match(mock_client, **track)
+        assert match.id == '4IssUgVW7mVUedc4agB4iW'
+        assert match.score == 1.0
+
+
+class TestGetTrackIDTiers:
+    @pytest.fixture(autouse=True)
+    def tier_stats(self, mocker):
+        patch = mocker.patch('spin2spot.spotify.stats', queries.TierStats())
+        return patch
+
+    def test_stops_at_first_hit(self, mock_client):
+        track = {'artist': 'The Courtneys', 'title': 'Lost Boys (Live)'}
+        spotify.get_track_id(mock_client, **track)
+        assert mock_client.search.call_count == 1
+
+    def test_tries_rewrites_after_misses(self, mock_client, search_track):
+        mock_client.search.side_effect = [
+            fixtures.json('search_empty.json'),
+            search_track,
+            ]
+        track = {'artist': 'The Courtneys', 'title': 'Lost Boys (Live)'}
+        track_id = spotify.get_track_id(mock_client, **track)
+        assert track_id == '6Ck7eSqoon2ZHIQZuYAlLf'
+        mock_client.search.assert_called_with(
+            q='artist:"The Courtneys" track:"Lost Boys"',
+            )
+
+    def test_uses_only_given_tiers(self, mock_client):
+        mock_client.search.return_value = fixtures.json('search_empty.json')
+        track = {'artist': 'The Courtneys', 'title': 'Lost Boys (Live)'}
+        spotify.get_track_id(mock_client, tiers=('exact',), **track)
+        assert mock_client.search.call_count == 1
+
+    def test_records_tier_stats(self, mock_client, tier_stats):
+        mock_client.search.side_effect = [
+            fixtures.json('search_empty.json'),
+            fixtures.json('search_track.json'),
+            ]
+        track = {'artist': 'The Courtneys', 'title': 'Lost Boys (Live)'}
+        spotify.get_track_id(mock_client, **track)
+        report = tier_stats.report()
+        assert report['exact']['hits'] == 0
+        assert report['version']['hits'] == 1
+
+    def test_tries_rewrites_after_unconfident_hits(self, mock_client,
+                                                   search_track):
+        track = {
+            'artist': 'Runk',
+            'title': 'Lost Boys',
+            'cover_of': 'The Courtneys',
+            }
+        track_id = spotify.get_track_id(mock_client, **track)
+        assert track_id == '6Ck7eSqoon2ZHIQZuYAlLf'
+        assert mock_client.search.call_count == 2
+
+
+class TestGetTrackIDCoalescing:
+    def test_shares_concurrent_searches(self, mock_client, search_track,
+                                        future_waiters):
+        started = threading.Event()
+        release = threading.Event()
+
+        def search(q):
+            started.set()
+            release.wait(5)
+            return search_track
+        mock_client.search.side_effect = search
+        track = {'artist': 'The Courtneys', 'title': 'Lost Boys'}
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(spotify.get_track_id, mock_client,
+                                    **track)
+            started.wait(5)
+            track['artist'] = 'THE COURTNEYS'
+            second = executor.submit(spotify.get_track_id, mock_client,
+                                     **track)
+            future_waiters.wait_for(1)
+            release.set()
+            assert first.result() == second.result()
+        assert mock_client.search.call_count == 1
+
+
+class TestGetTrackIDWithCache:
+    @pytest.fixture
+    def track(self):
+        return {
+            'artist': 'The Courtneys',
+            'title': 'Lost Boys',
+            'album': 'Lost Boys',
+            }
+
+    @pytest.fixture
+    def track_cache(self, tmp_path):
+        return cache.TrackCache(str(tmp_path / 'tracks.sqlite'))
+
+    def test_caches_hits(self, track, mock_client, track_cache):
+        spotify.get_track_id(mock_client, cache=track_cache, **track)
+        result = spotify.get_track_id(mock_client, cache=track_cache, **track)
+        assert result == '4IssUgVW7mVUedc4agB4iW'
+        assert mock_client.search.call_count == 1
+
+    def test_caches_misses(self, track, mock_client, track_cache):
+        mock_client.search.return_value = fixtures.json('search_empty.json')
+        spotify.get_track_id(mock_client, cache=track_cache, **track)
+        result = spotify.get_track_id(mock_client, cache=track_cache, **track)
+        assert result is None
+        assert mock_client.search.call_count == 1
+
+    def test_shares_normalized_keys(self, track, mock_client, track_cache):
+        spotify.get_track_id(mock_client, cache=track_cache, **track)
+        track['artist'] = '  the COURTNEYS '
+        spotify.get_track_id(mock_client, cache=track_cache, **track)
+        assert mock_client.search.call_count == 1
+
+    def test_searches_again_for_stricter_thresholds(self, track, mock_client,
+                                                    track_cache):
+        spotify.get_track_id(mock_client, cache=track_cache, **track)
+        spotify.get_track_id(mock_client, cache=track_cache, threshold=0.95,
+                             **track)
+        assert mock_client.search.call_count == 2
+
+
+class TestResolveTrackIDs:
+    @pytest.fixture
+    def tracks(self):
+        return [{'artist': 'Artist', 'title': str(i)} for i in range(20)]
+
+    @pytest.fixture(autouse=True)
+    def mock_get(self, mocker):
+        def get_track_id(client, artist, title, cache=None, tiers=None,
+                         threshold=None):
+            time.sleep(0.001 * (20 - int(title)))  # finish out of order
+            return f'id{title}'
+        patch = mocker.patch('spin2spot.spotify.get_track_id')
+        patch.side_effect = get_track_id
+        return patch
+
+    @pytest.mark.parametrize('workers', [1, 4])
+    def test_preserves_track_order(self, mock_client, tracks, workers):
+        expected = [f'id{i}' for i in range(20)]
+        result = spotify.resolve_track_ids(mock_client, tracks, workers)
+        assert list(result) == expected
+
+    def test_uses_shared_executor(self, mock_client, tracks):
+        expected = [f'id{i}' for i in range(20)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            result = spotify.resolve_track_ids(
+                mock_client,
+                tracks,
+                executor=executor,
+                )
+            assert list(result) == expected
+
+    @pytest.mark.parametrize('workers', [1, 4])
+    def test_reads_tracks_lazily(self, mock_client, tracks, workers):
+        read = []
+
+        def stream():
+            for track in tracks:
+                read.append(track)
+                yield track
+        result = spotify.resolve_track_ids(mock_client, stream(), workers)
+        assert next(result) == 'id0'
+        assert len(read) <= spotify.READ_AHEAD * workers
+        result.close()
+
+    @pytest.mark.parametrize('workers', [1, 4])
+    def test_resolves_every_track(self, mock_client, mock_get, tracks,
+                                  workers):
+        list(spotify.resolve_track_ids(mock_client, tracks, workers))
+        assert mock_get.call_count == 20
+
+
+class TestAddTracks:
+    @pytest.fixture
+    def track_ids(self):
+        return [f'id{i}' for i in range(250)]
+
+    def add(self, client, track_ids):
+        spotify.add_tracks(client, 'username', 'playlist', track_ids)
+
+    def test_adds_tracks_in_pages(self, mock_client, track_ids):
+        self.add(mock_client, track_ids)
+        pages = [
+            call[1]['tracks']
+            for call in mock_client.user_playlist_add_tracks.call_args_list
+            ]
+        assert [len(page) for page in pages] == [100, 100, 50]
+        assert sum(pages, []) == track_ids
+
+    def test_skips_unmatched_tracks(self, mock_client):
+        self.add(mock_client, ['id1', None, 'id2'])
+        mock_client.user_playlist_add_tracks.assert_called_once_with(
+            user='username',
+            playlist_id='playlist',
+            tracks=['id1', 'id2'],
+            )
+
+    def test_skips_empty_playlists(self, mock_client):
+        self.add(mock_client, [None])
+        mock_client.user_playlist_add_tracks.assert_not_called()
+
+    def test_reports_progress_per_page(self, mock_client):
+        progress = []
+        track_ids = ['id1', None, 'id2', None, 'id3']
+        spotify.add_tracks(mock_client, 'username', 'playlist', track_ids,
+                           page_size=2, progress=progress.append)
+        assert progress == [3, 2]
+
+    def test_writes_pages_before_resolution_finishes(self, mock_client):
+        def track_ids():
+            yield from (f'id{i}' for i in range(100))
+            assert mock_client.user_playlist_add_tracks.call_count == 1
+            yield 'id100'
+        self.add(mock_client, track_ids())
+        assert mock_client.user_playlist_add_tracks.call_count == 2
+
+    def test_retries_only_failed_page(self, mock_client, track_ids):
+        error = spotipy.SpotifyException(500, -1, 'error')
+        add = mock_client.user_playlist_add_tracks
+        add.side_effect = [None, error, None, None]
+        self.add(mock_client, track_ids)
+        pages = [call[1]['tracks'][0] for call in add.call_args_list]
+        assert pages == ['id0', 'id100', 'id100', 'id200']
+
+    def test_raises_error_after_retries(self, mock_client, track_ids):
+        error = spotipy.SpotifyException(500, -1, 'error')
+        mock_client.user_playlist_add_tracks.side_effect = error
+        with pytest.raises(spotipy.SpotifyException):
+            self.add(mock_client, track_ids)
+        assert mock_client.user_playlist_add_tracks.call_count == 3
+
+    def test_retries_page_after_session_gives_up(self, mock_scheduler):
+        outage = [http_stub.error(503)] * (spotify.CLIENT_RETRIES + 1)
+        added = (201, {'snapshot_id': 'snapshot'})
+        rate = mock_scheduler.rate
+        with http_stub.serve(*outage, added) as server:
+            self.add(stub_client(server), ['id0', 'id1'])
+        assert mock_scheduler.rate == rate
+        assert len(server.requests) == spotify.CLIENT_RETRIES + 2
+        assert set(server.requests) == {
+            ('POST', '/v1/playlists/playlist/items'),
+            }
+
+    @pytest.mark.parametrize('status', [400, 403, 404])
+    def test_raises_client_errors_at_once(self, mock_client, track_ids,
+                                          status):
+        error = spotipy.SpotifyException(status, -1, 'error')
+        mock_client.user_playlist_add_tracks.side_effect = error
+        with pytest.raises(spotipy.SpotifyException):
+            self.add(mock_client, track_ids)
+        assert mock_client.user_playlist_add_tracks.call_count == 1
+
+
+class TestThrottling:
+    @pytest.fixture
+    def throttled(self):
+        return spotipy.SpotifyException(429, -1, 'slow down',
+                                        headers={'Retry-After': '0'})
+
+    def test_retries_throttled_searches(self, mock_client, search_track,
+                                        throttled):
+        mock_client.search.side_effect = [throttled, search_track]
+        track_id = spotify.get_track_id(mock_client, 'The Courtneys',
+                                        'Lost Boys')
+        assert track_id == '6Ck7eSqoon2ZHIQZuYAlLf'
+        assert mock_client.search.call_count == 2
+
+    def test_retries_throttled_pages(self, mock_client, throttled):
+        add = mock_client.user_playlist_add_tracks
+        add.side_effect = [throttled, None]
+        spotify.add_tracks(mock_client, 'username', 'playlist', ['id'])
+        assert add.call_count == 2
+
+    def test_leaves_page_retries_to_scheduler(self, mock_client, throttled,
+                                              mock_scheduler):
+        add = mock_client.user_playlist_add_tracks
+        add.side_effect = throttled
+        with pytest.raises(spotipy.SpotifyException):
+            spotify.add_tracks(mock_client, 'username', 'playlist', ['id'])
+        assert add.call_count == mock_scheduler.retries + 1
+
 
 class TestCreatePlaylistFromParser:
     @pytest.fixture(scope='class')
@@ -139,6 +468,10 @@ class TestCreatePlaylistFromParser:
             description='Tuesday at 11:00am on KWVA with Ruckus the Red',
             )
 
+    def test_returns_playlist_id(self, mock_client, parser):
+        result = spotify.create_playlist_from_parser(mock_client, parser)
+        assert result == '407JxJeVQyNxgqy8hC1vTl'
+
     def test_adds_tracks_correctly(self, mock_client, parser, track_ids):
         spotify.create_playlist_from_parser(mock_client, parser)
         expected_tracks = [track for track in track_ids if track]
@@ -148,6 +481,274 @@ class TestCreatePlaylistFromParser:
             tracks=expected_tracks,
             )
 
+    def test_syncs_existing_playlist(self, mocker, mock_client, parser,
+                                     track_ids, tmp_path):
+        mocker.patch('spin2spot.spotify.list_playlists').return_value = {
+            'Ruckus Radio: November 10, 2015': 'old',
+            }
+        mock_sync = mocker.patch('spin2spot.spotify.sync_playlist')
+        log = journal.Journal(str(tmp_path / 'journal.jsonl'))
+        checkpoint = log.checkpoint('url')
+        result = spotify.create_playlist_from_parser(
+            mock_client, parser, sync=True, checkpoint=checkpoint)
+        assert result == 'old'
+        mock_client.user_playlist_create.assert_not_called()
+        mock_sync.assert_called_once_with(
+            mock_client, 'username', 'old',
+            [track for track in track_ids if track],
+            write_limit=None,
+            )
+        assert checkpoint.playlist_id == 'old'
+
+    def test_syncs_by_creating_missing_playlist(self, mocker, mock_client,
+                                                parser):
+        mocker.patch('spin2spot.spotify.list_playlists').return_value = {}
+        playlists = spotify.PlaylistIndex(mock_client)
+        result = spotify.create_playlist_from_parser(
+            mock_client, parser, sync=True, playlists=playlists)
+        assert result == '407JxJeVQyNxgqy8hC1vTl'
+        mock_client.user_playlist_create.assert_called_once()
+        assert (playlists.find('username', 'Ruckus Radio: November 10, 2015')
+                == '407JxJeVQyNxgqy8hC1vTl')
+
+    def test_shares_playlist_listing(self, mocker, mock_client, parser,
+                                     mock_get, track_ids):
+        mock_list = mocker.patch('spin2spot.spotify.list_playlists')
+        mock_list.return_value = {}
+        mocker.patch('spin2spot.spotify.sync_playlist')
+        mock_get.side_effect = track_ids * 2
+        playlists = spotify.PlaylistIndex(mock_client)
+        for _ in range(2):
+            spotify.create_playlist_from_parser(
+                mock_client, parser, sync=True, playlists=playlists)
+        mock_list.assert_called_once_with(mock_client, 'username')
+        mock_client.user_playlist_create.assert_called_once()
+
+    def test_holds_write_limit_only_while_writing(self, mock_client, parser,
+                                                  mock_get, track_ids):
+        write_limit = threading.BoundedSemaphore(1)
+
+        def search(*args, **kwargs):
+            assert write_limit.acquire(blocking=False)
+            write_limit.release()
+            return track_ids.pop(0)
+
+        def write(*args, **kwargs):
+            assert not write_limit.acquire(blocking=False)
+            return {'id': 'playlist'}
+        mock_get.side_effect = search
+        mock_client.user_playlist_create.side_effect = write
+        mock_client.user_playlist_add_tracks.side_effect = write
+        spotify.create_playlist_from_parser(mock_client, parser,
+                                            write_limit=write_limit)
+        mock_client.user_playlist_add_tracks.assert_called()
+
+    def test_journals_progress(self, mock_client, parser, tmp_path):
+        log = journal.Journal(str(tmp_path / 'journal.jsonl'))
+        checkpoint = log.checkpoint('url')
+        spotify.create_playlist_from_parser(mock_client, parser,
+                                            checkpoint=checkpoint)
+        assert checkpoint.playlist_id == '407JxJeVQyNxgqy8hC1vTl'
+        assert checkpoint.position == len(parser['tracks'])
+
+    def test_continues_partial_episode(self, mock_client, parser, mock_get,
+                                       track_ids, tmp_path):
+        log = journal.Journal(str(tmp_path / 'journal.jsonl'))
+        checkpoint = journal.Checkpoint(log, 'url', 'playlist', 10)
+        mock_get.side_effect = track_ids[10:]
+        result = spotify.create_playlist_from_parser(mock_client, parser,
+                                                     checkpoint=checkpoint)
+        assert result == 'playlist'
+        mock_client.user_playlist_create.assert_not_called()
+        mock_client.user_playlist_add_tracks.assert_called_with(
+            user='username',
+            playlist_id='playlist',
+            tracks=[track for track in track_ids[10:] if track],
+            )
+
+
+def playlists(*names, next=None):
+    return {
+        'items': [
+            {'id': f'id-{name}', 'name': name, 'owner': {'id': 'username'}}
+            for name in names
+            ],
+        'next': next,
+        }
+
+
+class TestListPlaylists:
+    def test_returns_ids_by_name(self, mock_client):
+        mock_client.user_playlists.return_value = playlists('a', 'b')
+        assert spotify.list_playlists(mock_client, 'username') == {
+            'a': 'id-a',
+            'b': 'id-b',
+            }
+
+    def test_pages_through_playlists(self, mock_client):
+        mock_client.user_playlists.side_effect = [
+            playlists('a', 'b', next='more'),
+            playlists('c'),
+            ]
+        result = spotify.list_playlists(mock_client, 'username')
+        assert result['c'] == 'id-c'
+        offsets = [call[1]['offset']
+                   for call in mock_client.user_playlists.call_args_list]
+        assert offsets == [0, 2]
+
+    def test_skips_followed_playlists(self, mock_client):
+        listing = playlists('a')
+        listing['items'][0]['owner']['id'] = 'someone'
+        mock_client.user_playlists.return_value = listing
+        assert spotify.list_playlists(mock_client, 'username') == {}
+
+    def test_keeps_first_of_repeated_names(self, mock_client):
+        listing = playlists('a', 'a')
+        listing['items'][1]['id'] = 'other'
+        mock_client.user_playlists.return_value = listing
+        assert spotify.list_playlists(mock_client, 'username') == {
+            'a': 'id-a',
+            }
+
+
+class TestPlaylistIndex:
+    def test_lists_playlists_once(self, mock_client):
+        mock_client.user_playlists.return_value = playlists('a', 'b')
+        index = spotify.PlaylistIndex(mock_client)
+        assert index.find('username', 'a') == 'id-a'
+        assert index.find('username', 'b') == 'id-b'
+        assert index.find('username', 'c') is None
+        mock_client.user_playlists.assert_called_once()
+
+    def test_adds_created_playlists(self, mock_client):
+        mock_client.user_playlists.return_value = playlists('a')
+        index = spotify.PlaylistIndex(mock_client)
+        index.add('username', 'c', 'id-c')
+        index.add('username', 'a', 'other')
+        assert index.find('username', 'c') == 'id-c'
+        assert index.find('username', 'a') == 'id-a'
+        mock_client.user_playlists.assert_called_once()
+
+
+class TestGetPlaylistTrackIDs:
+    def test_pages_through_tracks(self, mock_client):
+        track_ids = [f'id{i}' for i in range(150)]
+        mock_client.user_playlist_tracks.side_effect = [
+            {'items': [{'track': {'id': track_id}}
+                       for track_id in track_ids[:100]],
+             'next': 'more'},
+            {'items': [{'track': {'id': track_id}}
+                       for track_id in track_ids[100:]],
+             'next': None},
+            ]
+        result = spotify.get_playlist_track_ids(mock_client, 'username',
+                                                'playlist')
+        assert result == track_ids
+        offsets = [call[1]['offset'] for call
+                   in mock_client.user_playlist_tracks.call_args_list]
+        assert offsets == [0, 100]
+
+    def test_keeps_places_of_tracks_without_ids(self, mock_client):
+        mock_client.user_playlist_tracks.return_value = {
+            'items': [{'track': {'id': 'a'}}, {'track': None},
+                      {'track': {'id': None}}, {'track': {'id': 'b'}}],
+            'next': None,
+            }
+        result = spotify.get_playlist_track_ids(mock_client, 'username',
+                                                'playlist')
+        assert result == ['a', None, None, 'b']
+
+
+class TestPlaylistEdits:
+    def apply(self, current, wanted):
+        removals, insertions = spotify.playlist_edits(current, wanted)
+        result = [track for position, track in enumerate(current)
+                  if position not in removals]
+        for position, run in insertions:
+            result[position:position] = run
+        return result, removals, insertions
+
+    @pytest.mark.parametrize('current, wanted', [
+        ([], ['a', 'b']),
+        (['a', 'b'], []),
+        (['a', 'b', 'c'], ['a', 'x', 'c', 'd']),
+        (['a', 'b', 'c', 'd'], ['d', 'a', 'b', 'c']),
+        (['a', 'a', 'b'], ['a', 'b', 'a']),
+        ])
+    def test_edits_playlist_into_wanted(self, current, wanted):
+        assert self.apply(current, wanted)[0] == wanted
+
+    @pytest.mark.parametrize('current, wanted, expected', [
+        (['a', None, 'b', 'c'], ['a', 'x', 'c'], ['a', None, 'x', 'c']),
+        ([None, 'a', 'b'], ['b', 'a'], [None, 'b', 'a']),
+        (['a', None], ['a', 'b'], ['a', None, 'b']),
+        ([None, None], [], [None, None]),
+        ])
+    def test_leaves_tracks_without_ids_in_place(self, current, wanted,
+                                                expected):
+        result, removals, _ = self.apply(current, wanted)
+        assert result == expected
+        assert all(current[position] is not None for position in removals)
+
+    def test_leaves_unchanged_playlists_alone(self):
+        tracks = [f'id{i}' for i in range(500)]
+        assert spotify.playlist_edits(tracks, tracks) == ([], [])
+
+    def test_only_appends_new_tracks(self):
+        tracks = [f'id{i}' for i in range(500)]
+        edits = spotify.playlist_edits(tracks, tracks + ['new'])
+        assert edits == ([], [(500, ['new'])])
+
+
+class TestSyncPlaylist:
+    @pytest.fixture(autouse=True)
+    def mock_current(self, mocker):
+        patch = mocker.patch('spin2spot.spotify.get_playlist_track_ids')
+        patch.return_value = ['a', 'b', 'c', 'd']
+        return patch
+
+    @pytest.fixture
+    def remove(self, mock_client):
+        return mock_client.user_playlist_remove_specific_occurrences_of_tracks
+
+    def test_removes_and_inserts_changes(self, mock_client, remove):
+        spotify.sync_playlist(mock_client, 'username', 'playlist',
+                              ['a', 'x', 'c', 'd', 'e'])
+        remove.assert_called_once_with(
+            'username', 'playlist', [{'uri': 'b', 'positions': [1]}],
+            )
+        assert mock_client.user_playlist_add_tracks.call_args_list == [
+            call(user='username', playlist_id='playlist', tracks=['x'],
+                 position=1),
+            call(user='username', playlist_id='playlist', tracks=['e'],
+                 position=4),
+            ]
+
+    def test_removes_last_positions_first(self, mock_client, remove):
+        spotify.sync_playlist(mock_client, 'username', 'playlist', ['b'],
+                              page_size=2)
+        removed = [call[0][2] for call in remove.call_args_list]
+        assert removed == [
+            [{'uri': 'd', 'positions': [3]}, {'uri': 'c', 'positions': [2]}],
+            [{'uri': 'a', 'positions': [0]}],
+            ]
+
+    def test_inserts_long_runs_in_pages(self, mock_client, mock_current):
+        mock_current.return_value = []
+        spotify.sync_playlist(mock_client, 'username', 'playlist',
+                              ['a', 'b', 'c'], page_size=2)
+        calls = mock_client.user_playlist_add_tracks.call_args_list
+        assert [(c[1]['tracks'], c[1]['position']) for c in calls] == [
+            (['a', 'b'], 0),
+            (['c'], 2),
+            ]
+
+    def test_makes_no_writes_without_changes(self, mock_client, remove):
+        spotify.sync_playlist(mock_client, 'username', 'playlist',
+                              ['a', 'b', 'c', 'd'])
+        mock_client.user_playlist_add_tracks.assert_not_called()
+        remove.assert_not_called()
+
 
 class TestCreatePlaylist:
     @pytest.fixture(autouse=True)
@@ -164,12 +765,23 @@ class TestCreatePlaylist:
     def create_playlist(self, mock_client, mock_parse, mock_create):
         spotify.create_playlist(mock_client, 'http://spinitron.com')
 
-    def test_retrieves_episode(self, mock_requests):
-        mock_requests.get.assert_called_with('http://spinitron.com')
+    def test_retrieves_episode(self, mock_session):
+        assert mock_session.get.call_args[0] == ('http://spinitron.com',)
 
     def test_parses_episode(self, mock_parse, html):
-        mock_parse.assert_called_with('spinitron.com', html)
+        mock_parse.assert_called_with('spinitron.com', html, stream=True,
+                                      url='http://spinitron.com',
+                                      episodes=None)
 
     def test_builds_playlist(self, mock_create, mock_client, mock_parse):
         parser = mock_parse.return_value
-        mock_create.assert_called_with(mock_client, parser, public=False)
+        mock_create.assert_called_with(
+            mock_client,
+            parser,
+            public=False,
+            workers=1,
+            cache=None,
+            tiers=queries.DEFAULT_TIERS,
+            threshold=scoring.THRESHOLD,
+            sync=False,
+            )
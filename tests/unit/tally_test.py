@@ -0,0 +1,46 @@
+import threading
+import pytest
+from spin2spot import tally
+
+
+@pytest.fixture
+def counts():
+    counts = tally.Tally()
+    counts.record('a', True)
+    counts.record('a', [])
+    counts.record('b', None)
+    return counts
+
+
+class TestTally:
+    def test_reports_counts_and_rate(self, counts):
+        assert counts.report() == {
+            'a': {'count': 2, 'marked': 1, 'rate': 0.5},
+            'b': {'count': 1, 'marked': 0, 'rate': 0.0},
+            }
+
+    def test_names_fields_by_subclass(self):
+        class Sightings(tally.Tally):
+            FIELDS = ('seen', 'rare', 'rare_rate')
+        counts = Sightings()
+        counts.record('owl', True)
+        assert counts.report() == {
+            'owl': {'seen': 1, 'rare': 1, 'rare_rate': 1.0},
+            }
+
+    def test_resets(self, counts):
+        counts.reset()
+        assert counts.report() == {}
+
+    def test_counts_across_threads(self):
+        counts = tally.Tally()
+
+        def record():
+            for _ in range(1000):
+                counts.record('a', True)
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert counts.report()['a']['marked'] == 4000
@@ -0,0 +1,116 @@
+import pytest
+import spotipy
+from unittest.mock import MagicMock
+from spin2spot import throttle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def throttled(headers=None):
+    return spotipy.SpotifyException(429, -1, 'slow down', headers=headers)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return throttle.Scheduler(
+        rate=2,
+        burst=2,
+        backoff=1,
+        clock=clock,
+        sleep=clock.sleep,
+        )
+
+
+@pytest.fixture(autouse=True)
+def mock_random(mocker):
+    patch = mocker.patch('spin2spot.throttle.random')
+    patch.uniform.return_value = 0.5
+    return patch
+
+
+class TestRetryAfter:
+    @pytest.mark.parametrize('headers, expected', [
+        ({'Retry-After': '3'}, 3),
+        ({'Retry-After': 'soon'}, None),
+        ({}, None),
+        (None, None),
+        ])
+    def test_reads_header(self, headers, expected):
+        assert throttle.retry_after(throttled(headers)) == expected
+
+
+class TestScheduler:
+    def test_allows_bursts(self, scheduler, clock):
+        scheduler.acquire()
+        scheduler.acquire()
+        assert clock.sleeps == []
+
+    def test_waits_for_tokens(self, scheduler, clock):
+        for _ in range(4):
+            scheduler.acquire()
+        assert clock.now == pytest.approx(1.0)
+
+    def test_returns_result(self, scheduler):
+        function = MagicMock(return_value='result')
+        assert scheduler.call(function, 1, key='value') == 'result'
+        function.assert_called_once_with(1, key='value')
+
+    def test_honors_retry_after(self, scheduler, clock):
+        function = MagicMock()
+        function.side_effect = [throttled({'Retry-After': '7'}), 'result']
+        assert scheduler.call(function) == 'result'
+        assert clock.now >= 7.5
+
+    def test_backs_off_exponentially(self, scheduler):
+        assert scheduler.delay(throttled(), 0) == 1.5
+        assert scheduler.delay(throttled(), 3) == 8.5
+
+    def test_halves_rate_when_throttled(self, scheduler):
+        function = MagicMock(side_effect=[throttled(), 'result'])
+        scheduler.call(function)
+        assert scheduler.rate == pytest.approx(1.1)
+
+    def test_keeps_minimum_rate(self, scheduler):
+        for _ in range(10):
+            scheduler.throttled(0)
+        assert scheduler.rate == scheduler.min_rate
+
+    def test_recovers_rate_after_success(self, scheduler):
+        scheduler.throttled(0)
+        for _ in range(20):
+            scheduler.succeeded()
+        assert scheduler.rate == scheduler.max_rate
+
+    def test_pauses_every_caller(self, scheduler, clock):
+        scheduler.throttled(5)
+        scheduler.acquire()
+        assert clock.now >= 5
+
+    def test_raises_after_retries(self, scheduler):
+        function = MagicMock(side_effect=throttled())
+        with pytest.raises(spotipy.SpotifyException):
+            scheduler.call(function)
+        assert function.call_count == scheduler.retries + 1
+
+    def test_raises_other_errors_immediately(self, scheduler):
+        error = spotipy.SpotifyException(404, -1, 'not found')
+        function = MagicMock(side_effect=error)
+        with pytest.raises(spotipy.SpotifyException):
+            scheduler.call(function)
+        assert function.call_count == 1